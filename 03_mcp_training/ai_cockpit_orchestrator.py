@@ -1,17 +1,50 @@
 import json
 import asyncio
+import os
+import time
+from contextlib import aclosing
+from types import SimpleNamespace
 import urllib3
 from gen_ai_hub.proxy import get_proxy_client
 from gen_ai_hub.proxy.native.openai.clients import OpenAI
-from mcp import ClientSession
-from mcp.client.streamable_http import streamablehttp_client
 
 from mcp_tool_schema import get_all_schemas
+from mcp_session import McpSession
+from async_llm import AsyncChatClient
+from fast_router import FastRouter
+from response_cache import ResponseCache, context_hash
+from tool_compaction import CompactionStats, compact
+import json_codec
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 proxy_client = get_proxy_client()
 chat_client = OpenAI(proxy_client=proxy_client)
+# LLM turns run off the event loop, so MCP traffic and other queries keep going meanwhile
+llm = AsyncChatClient(chat_client)
+
+# Tool calls of one LLM answer run concurrently: at most TOOL_CONCURRENCY at
+# a time, each bounded by its TOOL_TIMEOUTS entry (default TOOL_TIMEOUT s).
+TOOL_CONCURRENCY = int(os.environ.get("TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "60"))
+TOOL_TIMEOUTS = {"cockpit_get_views_by_sids": 180}
+
+# Clear-cut queries ("status of ADL") skip the tool-selection LLM turn (FAST_ROUTER=0 to disable)
+router = FastRouter.from_env()
+
+# Repeated questions are answered from a cache of both LLM turns (LLM_CACHE=0 to disable);
+# LLM_CACHE_EMBED_MODEL (e.g. text-embedding-3-small) adds embedding-similarity matching.
+EMBED_MODEL = os.environ.get("LLM_CACHE_EMBED_MODEL")
+
+
+def embed(text: str) -> list[float]:
+    return chat_client.embeddings.create(model=EMBED_MODEL, input=text).data[0].embedding
+
+
+response_cache = ResponseCache.from_env(embed=embed if EMBED_MODEL else None)
+
+# Stream LLM answers token by token (ORCHESTRATOR_STREAM=0: wait for whole answers).
+STREAM = os.environ.get("ORCHESTRATOR_STREAM", "1") != "0"
 
 SYSTEM_PROMPT = """
 You are a routing-capable assistant for SAP landscape queries.
@@ -22,14 +55,18 @@ TOOL-CHOICE POLICY:
   CALL: cockpit_get_view_by_sid with {"sid": "<SID>"}.
   Return the normalized sections in your final answer.
 
+- If the user asks for an OVERVIEW of SEVERAL systems named by SID
+  (e.g., “overview of ERX, ADL and CC3”),
+  CALL: cockpit_get_views_by_sids with {"sids": ["<SID>", ...]} — one call for all SIDs.
+
 - If the user asks to LIST or SEARCH systems by FILTERS/ATTRIBUTES (e.g., cluster, status,
-  landscape, system type) or asks for multiple systems, CALL: search_system_flexi
+  landscape, system type), CALL: search_system_flexi
   with proper fields + filters.
 
 Never call both tools for the same request unless explicitly necessary. Prefer exactly one tool.
 """
 
-async def mcp_invoke(session: ClientSession, tool_name: str, args: dict):
+async def mcp_invoke(session: McpSession, tool_name: str, args: dict):
     """Invoke an MCP tool and return the first json/text result as a Python object."""
     result = await session.call_tool(tool_name, args)
 
@@ -46,89 +83,310 @@ async def mcp_invoke(session: ClientSession, tool_name: str, args: dict):
         if getattr(part, "type", "") == "text":
             txt = getattr(part, "text", "")
             try:
-                return json.loads(txt)  # sometimes JSON is serialized as text
+                return json_codec.loads(txt)  # sometimes JSON is serialized as text
             except Exception:
                 return {"text": txt}
 
     return {"warning": "No json/text content in MCP result"}
 
-async def run_once(user_prompt: str):
-    # 1) Connect to MCP server
-    async with streamablehttp_client("http://localhost:8050/mcp") as (read_stream, write_stream, _):
-        async with ClientSession(read_stream, write_stream) as session:
-            await session.initialize()
-            tools_list = await session.list_tools()
-            available = [t.name for t in tools_list.tools]
-            print("MCP tools available:", available)
-
-            # 2) Provide both tool schemas to the LLM
-            tools = get_all_schemas()
-
-            messages = [
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ]
-
-            # 3) First LLM turn -> choose a tool
-            first = chat_client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                tools=tools,
-            )
-
-            msg = first.choices[0].message
-            tool_calls = getattr(msg, "tool_calls", None)
-
-            if not tool_calls:
-                # No tool was chosen -> just return LLM text
-                print("Assistant:", msg.content)
-                return msg.content
-
-            # ✅ Append the assistant message that *contains* the tool_calls
-            messages.append({
-                "role": "assistant",
-                "content": msg.content or "",
-                "tool_calls": [
-                    {
-                        "id": tc.id,
-                        "type": "function",
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments,
-                        },
-                    }
-                    for tc in tool_calls
-                ],
-            })
-
-            # 4) Execute each tool call via MCP and feed results back
-            for tc in tool_calls:
-                name = tc.function.name
-                args = json.loads(tc.function.arguments or "{}")
-                print(f"Calling MCP tool: {name} with {args}")
-                result_obj = await mcp_invoke(session, name, args)
-                
-                # Append as a 'tool' message using tool_call_id (newer format)
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tc.id,
-                    "name": name,
-                    "content": json.dumps(result_obj)
-                })
-
-            # 5) Second LLM turn -> produce final answer
-            second = chat_client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                tools=tools,
-            )
-            final = second.choices[0].message.content
-            print("Final:", final)
-            return final
+def llm_tool_schemas(mcp_tools: list) -> list:
+    """The hand-written LLM tool schemas of the tools the MCP server currently offers."""
+    offered = {t.name for t in mcp_tools}
+    return [schema for schema in get_all_schemas() if schema["function"]["name"] in offered]
+
+
+def message_to_cache(msg) -> dict:
+    """An LLM assistant message as plain data for the response cache."""
+    return {"content": msg.content or "",
+            "tool_calls": [{"id": tc.id, "name": tc.function.name, "arguments": tc.function.arguments}
+                           for tc in (getattr(msg, "tool_calls", None) or [])]}
+
+
+def message_from_cache(data: dict):
+    calls = [SimpleNamespace(id=c["id"], type="function",
+                             function=SimpleNamespace(name=c["name"], arguments=c["arguments"]))
+             for c in data["tool_calls"]]
+    return SimpleNamespace(content=data["content"], tool_calls=calls or None)
+
+
+def print_timing(timing: dict, session: McpSession, tokens: dict | None = None):
+    """One line per query: where the time went, what the reused MCP session and tool-result compaction saved."""
+    parts = [f"{k} {v * 1000:.0f} ms" for k, v in timing.items()]
+    if tokens and tokens["messages"]:
+        parts.append(f"tool results {tokens['tokens_before']} -> {tokens['tokens_after']} tokens "
+                     f"(saved {tokens['saved']}, {tokens['saved_pct']:.0f}%, {tokens['tokenizer']})")
+    st = session.stats()
+    if "router" in timing and router:
+        rs = router.stats()
+        if rs["avg_llm_turn_ms"] is None:
+            parts.append(f"fast-routed (LLM turn skipped; hit rate {rs['hit_rate']:.0%})")
+        else:
+            parts.append(f"fast-routed (LLM turn skipped, ~{rs['avg_llm_turn_ms']:.0f} ms saved; "
+                         f"hit rate {rs['hit_rate']:.0%}, ~{rs['saved_ms_estimate']:.0f} ms saved in total)")
+    cached = [turn for turn in ("llm_1", "llm_2") if f"{turn}_cache" in timing]
+    if cached and response_cache:
+        cs = response_cache.stats()
+        parts.append(f"cached {', '.join(cached)} (hit ratio {cs['hit_ratio']:.0%}, "
+                     f"~{cs['saved_ms']:.0f} ms saved in total)")
+    if timing.get("mcp_connect"):
+        parts.append(f"new MCP session, tools: {', '.join(t.name for t in session.tools)}")
+    else:
+        parts.append(f"MCP session reused (saved ~{st['handshake_ms']:.0f} ms, {st['saved_ms']:.0f} ms in total)")
+    print("⏱", " | ".join(parts))
+
+
+def tool_args(tc) -> dict | None:
+    """The parsed arguments of an LLM tool call, or None when they are not a JSON object."""
+    try:
+        args = json.loads(tc.function.arguments or "{}")
+    except ValueError:
+        return None
+    return args if isinstance(args, dict) else None
+
+
+async def invoke_tool_calls(session: McpSession, tool_calls, arguments: list | None = None) -> list:
+    """
+    Run the LLM's tool calls concurrently over the session. Returns one
+    result object per call, in the order of `tool_calls`; a call that fails,
+    times out or has invalid arguments yields {"error": ...} so the LLM can
+    still answer. `arguments` are the calls' parsed arguments (tool_args),
+    parsed here when not given.
+    """
+    sem = asyncio.Semaphore(max(TOOL_CONCURRENCY, 1))
+    if arguments is None:
+        arguments = [tool_args(tc) for tc in tool_calls]
+
+    async def one(tc, args):
+        name = tc.function.name
+        if args is None:
+            return {"error": f"invalid arguments for {name}: {tc.function.arguments!r} is not a JSON object"}
+        timeout = TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT)
+        async with sem:
+            print(f"Calling MCP tool: {name} with {args}")
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(mcp_invoke(session, name, args), timeout)
+            except asyncio.TimeoutError:
+                result = {"error": f"tool {name} timed out after {timeout:g}s"}
+            except Exception as e:
+                result = {"error": f"tool {name} failed: {e!r}"}
+            print(f"MCP tool {name} done in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return result
+
+    return await asyncio.gather(*(one(tc, args) for tc, args in zip(tool_calls, arguments)))
+
+
+async def stream_turn(messages: list, tools: list, timing: dict, turn: str):
+    """
+    One streamed chat completion turn. Yields {"type": "token", "text"} as
+    content deltas arrive and, last, {"type": "message", "message"} with the
+    reassembled assistant message: content plus tool calls, whose id, name
+    and argument fragments arrive spread over many chunks, keyed by index.
+    Records f"{turn}_ttft" (first delta) and f"{turn}" (whole turn) in `timing`.
+    """
+    start = time.perf_counter()
+    content, calls = [], {}
+    # closed as soon as this generator is (consumer stopped early), not when it is collected
+    async with aclosing(llm.stream(model="gpt-4o", messages=messages, tools=tools)) as chunks:
+        async for chunk in chunks:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if f"{turn}_ttft" not in timing and (delta.content or delta.tool_calls):
+                timing[f"{turn}_ttft"] = time.perf_counter() - start
+            if delta.content:
+                content.append(delta.content)
+                yield {"type": "token", "text": delta.content}
+            for tc in delta.tool_calls or []:
+                call = calls.setdefault(tc.index, {"id": None, "name": "", "arguments": []})
+                call["id"] = tc.id or call["id"]
+                if tc.function is not None:
+                    call["name"] += tc.function.name or ""
+                    call["arguments"].append(tc.function.arguments or "")
+    timing[turn] = time.perf_counter() - start
+
+    tool_calls = [
+        SimpleNamespace(id=c["id"], type="function",
+                        function=SimpleNamespace(name=c["name"], arguments="".join(c["arguments"])))
+        for _, c in sorted(calls.items())
+    ]
+    yield {"type": "message", "message": SimpleNamespace(content="".join(content), tool_calls=tool_calls or None)}
+
+
+async def _turn(messages: list, tools: list, timing: dict, turn: str, stream: bool):
+    """A chat completion turn as events, streamed or not (then the whole text is one token)."""
+    if stream:
+        async for event in stream_turn(messages, tools, timing, turn):
+            yield event
+        return
+    start = time.perf_counter()
+    response = await llm.create(model="gpt-4o", messages=messages, tools=tools)
+    msg = response.choices[0].message
+    timing[turn] = time.perf_counter() - start
+    if msg.content and not getattr(msg, "tool_calls", None):
+        yield {"type": "token", "text": msg.content}
+    yield {"type": "message", "message": msg}
+
+
+async def run_events(user_prompt: str, session: McpSession, stream: bool = STREAM):
+    """
+    Answer one query as an async iterator of events, for embedding:
+
+        {"type": "token", "text"}                  answer text as it is generated
+        {"type": "routed", "tool", "arguments", ...}  the fast-path router chose the tool (no first LLM turn)
+        {"type": "cached", "turn"}                 an LLM turn was answered from the response cache
+        {"type": "tool_calls", "calls"}            the tools the LLM chose (name, arguments)
+        {"type": "tool_results", "results", "tokens"}  their results, in call order, and their
+                                                   token counts before/after compaction
+        {"type": "final", "text", "timing", ...}   the complete answer, per-stage seconds and,
+                                                   when tools ran, the same "tokens"
+
+    With stream=True both LLM turns are streamed; timing then also has the
+    time to first token per turn (llm_1_ttft, llm_2_ttft).
+    """
+    timing = {}
+    start = time.perf_counter()
+    # 1) Connect to MCP server (no-op when the session is already connected)
+    _, timing["mcp_connect"] = await session.session()
+
+    # 2) Provide the tool schemas of the tools the server offers (cached with the tool catalog)
+    catalog = await session.tool_catalog()
+    tools = catalog.render("llm_tools", llm_tool_schemas)
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+    # 3) First LLM turn -> choose a tool (or answer directly), unless the fast-path router is sure
+    #    or the same question was already answered over the same tool schemas
+    t = time.perf_counter()
+    route = router.route(user_prompt, {t.name for t in catalog.tools}) if router else None
+    tools_key = catalog.render("llm_tools_hash", lambda _: context_hash(tools))
+    if route is not None:
+        msg = route.as_message()
+        timing["router"] = time.perf_counter() - t
+        yield {"type": "routed", "tool": route.tool, "arguments": route.arguments,
+               "confidence": route.confidence, "rule": route.rule}
+    elif (cached := await response_cache.aget("llm_1", user_prompt, tools_key) if response_cache else None) is not None:
+        msg = message_from_cache(cached)
+        timing["llm_1_cache"] = time.perf_counter() - t
+        yield {"type": "cached", "turn": "llm_1"}
+    else:
+        async for event in _turn(messages, tools, timing, "llm_1", stream):
+            if event["type"] == "message":
+                msg = event["message"]
+            else:
+                yield event
+        if router:
+            router.observe_llm_turn(timing["llm_1"])
+        if response_cache:
+            await response_cache.aput("llm_1", user_prompt, tools_key, message_to_cache(msg), timing["llm_1"])
+    tool_calls = getattr(msg, "tool_calls", None)
+
+    if not tool_calls:
+        # No tool was chosen -> the LLM text is the answer
+        timing["total"] = time.perf_counter() - start
+        yield {"type": "final", "text": msg.content, "timing": timing}
+        return
+
+    # ✅ Append the assistant message that *contains* the tool_calls
+    messages.append({
+        "role": "assistant",
+        "content": msg.content or "",
+        "tool_calls": [
+            {
+                "id": tc.id,
+                "type": "function",
+                "function": {
+                    "name": tc.function.name,
+                    "arguments": tc.function.arguments,
+                },
+            }
+            for tc in tool_calls
+        ],
+    })
+    yield {"type": "tool_calls", "calls": [{"name": tc.function.name, "arguments": tc.function.arguments}
+                                           for tc in tool_calls]}
+
+    # 4) Execute the tool calls via MCP (concurrently) and feed results back in call order
+    t = time.perf_counter()
+    arguments = [tool_args(tc) for tc in tool_calls]
+    results = await invoke_tool_calls(session, tool_calls, arguments)
+    tokens = CompactionStats()
+    for tc, args, result_obj in zip(tool_calls, arguments, results):
+        if router and args is not None:
+            router.learn(tc.function.name, args, result_obj)
+        # compacted (projection, tables, truncation) to the per-message token budget
+        content, stats = compact(result_obj)
+        tokens.add(stats)
+        # Append as a 'tool' message using tool_call_id (newer format)
+        messages.append({
+            "role": "tool",
+            "tool_call_id": tc.id,
+            "name": tc.function.name,
+            "content": content
+        })
+    timing["tools"] = time.perf_counter() - t
+    yield {"type": "tool_results", "results": results, "tokens": tokens.as_dict()}
+
+    # 5) Second LLM turn -> produce final answer (cached per question *and* tool results,
+    #    so a cached answer is never served over changed data)
+    t = time.perf_counter()
+    results_key = context_hash([[tc.function.name, tc.function.arguments, r] for tc, r in zip(tool_calls, results)])
+    if (cached := await response_cache.aget("llm_2", user_prompt, results_key) if response_cache else None) is not None:
+        msg = SimpleNamespace(content=cached, tool_calls=None)
+        timing["llm_2_cache"] = time.perf_counter() - t
+        yield {"type": "cached", "turn": "llm_2"}
+        if stream:
+            yield {"type": "token", "text": cached}
+    else:
+        async for event in _turn(messages, tools, timing, "llm_2", stream):
+            if event["type"] == "message":
+                msg = event["message"]
+            else:
+                yield event
+        # answers over failed tool calls are not reused: the next attempt may succeed
+        if response_cache and msg.content and not any(isinstance(r, dict) and r.get("error") for r in results):
+            await response_cache.aput("llm_2", user_prompt, results_key, msg.content, timing["llm_2"])
+    timing["total"] = time.perf_counter() - start
+    yield {"type": "final", "text": msg.content, "timing": timing, "tokens": tokens.as_dict()}
+
+
+async def run_once(user_prompt: str, session: McpSession | None = None, stream: bool = STREAM):
+    """
+    Answer one query, printing the answer (token by token when streaming).
+    Pass a long-lived McpSession to reuse its connection across queries;
+    without one, a session is opened and closed for this query.
+    """
+    if session is None:
+        session = McpSession()
+        try:
+            return await run_once(user_prompt, session, stream)
+        finally:
+            await session.close()
+
+    streaming = False
+    async for event in run_events(user_prompt, session, stream):
+        if event["type"] == "token":
+            if not streaming:
+                print("Final: ", end="", flush=True)
+                streaming = True
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "final":
+            if streaming:
+                print()
+            else:
+                print("Final:", event["text"])
+            print_timing(event["timing"], session, event.get("tokens"))
+            return event["text"]
 
 if __name__ == "__main__":
     # Interactive console loop: enter a query to run, empty input or 'quit' to exit
     print("Interactive console. Type your question and press Enter. Empty input or 'quit' to exit.")
+    # one event loop and one MCP session for the whole console session
+    loop = asyncio.new_event_loop()
+    session = McpSession()
     try:
         while True:
             try:
@@ -145,11 +403,14 @@ if __name__ == "__main__":
                 break
 
             print("\n=== USER:", user_input)
-            # run the request (each call creates its own MCP session)
+            # run the request on the shared session (reconnects if the server went away)
             try:
-                asyncio.run(run_once(user_input))
+                loop.run_until_complete(run_once(user_input, session))
             except Exception as e:
                 # Keep the console alive on errors so the user can try again
                 print("Error while processing the request:", repr(e))
     except KeyboardInterrupt:
         print("\nInterrupted — exiting.")
+    finally:
+        loop.run_until_complete(session.close())
+        loop.close()
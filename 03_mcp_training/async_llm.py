@@ -0,0 +1,74 @@
+# async_llm.py
+"""
+Async adapter for the synchronous GenAI Hub OpenAI client.
+
+chat_client.chat.completions.create blocks for the whole LLM turn; called
+inside a coroutine it freezes the event loop: MCP traffic, other queries,
+streamed tokens. AsyncChatClient runs the call (and, when streaming, the
+pull of every chunk) in its own thread pool, so one process can hold many
+conversations in flight. The pool is sized by LLM_CONCURRENCY, which caps
+how many LLM calls are outstanding at once. A stream is closed (on a worker
+thread) when the iteration ends, also when the consumer stops early.
+
+    llm = AsyncChatClient(OpenAI(proxy_client=proxy_client))
+    message = (await llm.create(model="gpt-4o", messages=messages)).choices[0].message
+    async for chunk in llm.stream(model="gpt-4o", messages=messages):
+        ...
+
+Configuration (env vars):
+    LLM_CONCURRENCY   LLM calls in flight at once (default 16)
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "16"))
+
+_DONE = object()
+
+
+class AsyncChatClient:
+    """Awaitable chat.completions.create / streaming on top of a blocking client."""
+
+    def __init__(self, client, max_concurrency: int = LLM_CONCURRENCY):
+        self.client = client
+        self.max_concurrency = max(max_concurrency, 1)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        self.counts = {"calls": 0, "streams": 0, "in_flight": 0}
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    async def create(self, **kwargs):
+        """chat.completions.create(**kwargs) without blocking the event loop."""
+        self.counts["calls"] += 1
+        self.counts["in_flight"] += 1
+        try:
+            return await self._run(lambda: self.client.chat.completions.create(**kwargs))
+        finally:
+            self.counts["in_flight"] -= 1
+
+    async def stream(self, **kwargs):
+        """Async iterator over the chunks of chat.completions.create(stream=True, **kwargs)."""
+        self.counts["streams"] += 1
+        self.counts["in_flight"] += 1
+        stream = None
+        try:
+            stream = await self._run(lambda: self.client.chat.completions.create(stream=True, **kwargs))
+            chunks = iter(stream)
+            while (chunk := await self._run(next, chunks, _DONE)) is not _DONE:
+                yield chunk
+        finally:
+            try:
+                # a consumer that stops early (break, cancel, tool-call cutoff) would otherwise
+                # keep the HTTP connection checked out; submitted first, so it runs even if
+                # this await is cancelled
+                if stream is not None and hasattr(stream, "close"):
+                    await asyncio.wrap_future(self._pool.submit(stream.close))
+            except Exception:
+                pass
+            finally:
+                self.counts["in_flight"] -= 1
+
+    def stats(self) -> dict:
+        return {**self.counts, "max_concurrency": self.max_concurrency}
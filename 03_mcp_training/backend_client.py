@@ -0,0 +1,346 @@
+# backend_client.py
+"""
+Shared HTTP client layer for all DLM/SLIM backend calls.
+
+Every Flexi / Cockpit request made by the MCP server goes through one pooled
+requests.Session, so TCP+TLS connections to dlm.wdf.sap.corp are kept alive
+and reused across tool invocations instead of being re-opened per call.
+The async tools use AsyncBackendClient, the same idea on top of
+httpx.AsyncClient, so requests from many MCP sessions can be in flight at once.
+Each GET is hedged, retried and guarded by a per-endpoint circuit breaker
+(see resilience.py), and can be recorded to / replayed from a fixture
+archive (see fixtures.py). SingleFlight collapses identical concurrent
+lookups (same SID, same Flexi query) into one backend request whose result
+every caller receives.
+
+Configuration (env vars, read when the client is first created):
+    DLM_POOL_CONNECTIONS  number of per-host pools to keep (default 4)
+    DLM_POOL_MAXSIZE      max keep-alive connections per host (default 16)
+    DLM_POOL_BLOCK        "1" = wait for a free connection when a host is at
+                          its limit, "0" = open a throw-away extra (default 1)
+"""
+import asyncio
+import os
+import threading
+import time
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+import fixtures
+import metrics
+import resilience
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class BackendClient:
+    """Keep-alive HTTP client with per-host connection limits and pool statistics."""
+
+    def __init__(self, pool_connections: int | None = None, pool_maxsize: int | None = None,
+                 pool_block: bool | None = None, verify: bool = False):
+        self.pool_connections = pool_connections or _env_int("DLM_POOL_CONNECTIONS", 4)
+        self.pool_maxsize = pool_maxsize or _env_int("DLM_POOL_MAXSIZE", 16)
+        if pool_block is None:
+            pool_block = os.environ.get("DLM_POOL_BLOCK", "1") != "0"
+        self.pool_block = pool_block
+        self.verify = verify
+
+        self._adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        # Pools evicted from the pool manager are closed; keep their counters so
+        # the totals stay monotonic.
+        self._lock = threading.Lock()
+        self._retired = {"opened": 0, "requests": 0}
+        pools = self._adapter.poolmanager.pools
+        original_dispose = pools.dispose_func
+
+        def _dispose(pool):
+            with self._lock:
+                self._retired["opened"] += getattr(pool, "num_connections", 0)
+                self._retired["requests"] += getattr(pool, "num_requests", 0)
+            if original_dispose:
+                original_dispose(pool)
+
+        pools.dispose_func = _dispose
+
+    def get(self, url: str, params: dict | None = None, timeout: float = 20, **kwargs) -> requests.Response:
+        """
+        GET through the shared session (connections are reused when possible).
+        `timeout` is the deadline for the whole call, hedges and retries included.
+        """
+        kwargs.setdefault("verify", self.verify)
+
+        def attempt(remaining: float) -> requests.Response:
+            with metrics.backend_request(url) as info:
+                if fixtures.MODE == "replay":
+                    resp = fixtures.replay(url, params, kwargs.get("headers"))
+                else:
+                    start = time.perf_counter()
+                    resp = self.session.get(url, params=params, timeout=remaining, **kwargs)
+                    if fixtures.MODE == "record":
+                        fixtures.record(url, params, resp, time.perf_counter() - start)
+                info["status"] = resp.status_code
+                info["bytes"] = len(resp.content)
+            return resp
+
+        return resilience.call(url, attempt, deadline=timeout)
+
+    def pool_stats(self) -> dict:
+        """Connections opened vs. reused, in total and per host."""
+        pools = self._adapter.poolmanager.pools
+        with pools.lock:
+            keys = list(pools.keys())
+
+        hosts = []
+        with self._lock:
+            opened = self._retired["opened"]
+            served = self._retired["requests"]
+        for key in keys:
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            p_opened = pool.num_connections
+            p_served = pool.num_requests
+            opened += p_opened
+            served += p_served
+            hosts.append({
+                "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+                "opened": p_opened,
+                "requests": p_served,
+                "reused": max(p_served - p_opened, 0),
+                # the pool queue is pre-filled with None placeholders
+                "idle": sum(1 for c in list(pool.pool.queue) if c is not None) if pool.pool is not None else 0,
+            })
+
+        return {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "pool_block": self.pool_block,
+            "requests": served,
+            "connections_opened": opened,
+            "connections_reused": max(served - opened, 0),
+            "hosts": hosts,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_client: BackendClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> BackendClient:
+    """Return the process-wide backend client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = BackendClient()
+    return _client
+
+
+def configure_client(**kwargs) -> BackendClient:
+    """Replace the process-wide client (e.g. to change pool sizes at startup)."""
+    global _client
+    with _client_lock:
+        old, _client = _client, BackendClient(**kwargs)
+    if old is not None:
+        old.close()
+    return _client
+
+
+class AsyncBackendClient:
+    """
+    httpx.AsyncClient with the same pool settings as BackendClient.
+    httpx has no per-host pool, so DLM_POOL_MAXSIZE bounds keep-alive
+    connections and DLM_POOL_MAXSIZE * DLM_POOL_CONNECTIONS bounds all
+    open connections.
+    """
+
+    def __init__(self, pool_connections: int | None = None, pool_maxsize: int | None = None,
+                 verify: bool = False):
+        self.pool_connections = pool_connections or _env_int("DLM_POOL_CONNECTIONS", 4)
+        self.pool_maxsize = pool_maxsize or _env_int("DLM_POOL_MAXSIZE", 16)
+        self.client = httpx.AsyncClient(
+            verify=verify,
+            limits=httpx.Limits(
+                max_connections=self.pool_connections * self.pool_maxsize,
+                max_keepalive_connections=self.pool_maxsize,
+            ),
+        )
+        self.requests = 0
+        self.opened = 0
+
+    async def _trace(self, event_name: str, info: dict):
+        # httpcore reports a TCP connect only when a new connection is opened
+        if event_name == "connection.connect_tcp.complete":
+            self.opened += 1
+
+    async def get(self, url: str, params: dict | None = None, timeout: float = 20, **kwargs) -> httpx.Response:
+        """`timeout` is the deadline for the whole call, hedges and retries included."""
+        extensions = kwargs.pop("extensions", {})
+        extensions.setdefault("trace", self._trace)
+
+        async def attempt(remaining: float) -> httpx.Response:
+            self.requests += 1
+            with metrics.backend_request(url) as info:
+                if fixtures.MODE == "replay":
+                    resp = await fixtures.replay_async(url, params, kwargs.get("headers"))
+                else:
+                    start = time.perf_counter()
+                    resp = await self.client.get(url, params=params, timeout=remaining,
+                                                 extensions=extensions, **kwargs)
+                    if fixtures.MODE == "record":
+                        fixtures.record(url, params, resp, time.perf_counter() - start)
+                info["status"] = resp.status_code
+                info["bytes"] = len(resp.content)
+            return resp
+
+        return await resilience.call_async(url, attempt, deadline=timeout)
+
+    def pool_stats(self) -> dict:
+        return {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "requests": self.requests,
+            "connections_opened": self.opened,
+            "connections_reused": max(self.requests - self.opened, 0),
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_async_clients: dict = {}
+
+
+def get_async_client() -> AsyncBackendClient:
+    """
+    Return the async backend client for the running event loop. httpx
+    connections are bound to the loop that opened them, so each loop
+    (normally just the server's) gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        # forget clients of loops that have been closed in the meantime
+        for old in [lp for lp in _async_clients if lp.is_closed()]:
+            del _async_clients[old]
+        client = _async_clients[loop] = AsyncBackendClient()
+    return client
+
+
+@metrics.REGISTRY.register_collector
+def _pool_metrics():
+    samples = {"opened": [], "reused": []}
+    clients = [("sync", _client)] + [("async", c) for c in list(_async_clients.values())]
+    for kind, client in clients:
+        if client is None:
+            continue
+        stats = client.pool_stats()
+        samples["opened"].append(({"client": kind}, stats["connections_opened"]))
+        samples["reused"].append(({"client": kind}, stats["connections_reused"]))
+    yield ("dlm_pool_connections_opened_total", "counter",
+           "Backend connections opened (TCP+TLS handshakes).", samples["opened"])
+    yield ("dlm_pool_connections_reused_total", "counter",
+           "Backend requests served on a kept-alive connection.", samples["reused"])
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Request coalescing: while a call for `key` is in flight, further calls
+    with the same key wait for it and get its result (or exception) instead
+    of issuing their own. Results are shared, so callers must not mutate them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict = {}       # key -> _Call (threads)
+        self._tasks: dict = {}       # (loop, key) -> asyncio.Task
+        self._counts = {"calls": 0, "coalesced": 0}
+
+    def _count(self, coalesced: bool):
+        with self._lock:
+            self._counts["calls"] += 1
+            if coalesced:
+                self._counts["coalesced"] += 1
+        if coalesced:
+            metrics.BACKEND_COALESCED.inc(group=self.name)
+
+    def do(self, key, fn):
+        """Run `fn()` for `key` unless an identical call is in flight in another thread."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._count(not leader)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, fn):
+        """
+        Await `fn()` for `key`, sharing one task among concurrent callers on
+        the same event loop. A cancelled caller does not cancel the request
+        for the others; it is only cancelled once every caller has gone.
+        """
+        loop_key = (asyncio.get_running_loop(), key)
+        flight = self._tasks.get(loop_key)     # [task, waiting callers]
+        self._count(flight is not None)
+        if flight is None:
+            task = asyncio.ensure_future(fn())
+            flight = self._tasks[loop_key] = [task, 0]
+
+            def _done(t):
+                if self._tasks.get(loop_key) is flight:
+                    del self._tasks[loop_key]
+                if not t.cancelled():
+                    t.exception()   # retrieved, even if every caller went away
+            task.add_done_callback(_done)
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                task.cancel()
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, "in_flight": len(self._calls) + len(self._tasks)}
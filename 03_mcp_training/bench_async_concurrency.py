@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Concurrency benchmark: blocking vs. async cockpit/Flexi tools against a local stub backend.
+
+The stub answers /report/flexi and /API/UI5CockpitDataProvider after a fixed
+delay (default 100 ms), so throughput is bound by how many requests the tool
+implementation can keep in flight at the same time.
+
+    python bench_async_concurrency.py [--latency 0.1] [--calls 64] [--levels 1,4,16,64]
+"""
+import argparse
+import asyncio
+import contextlib
+import http.server
+import io
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+import cockpit_utils
+import server
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.1
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.endswith("/report/flexi"):
+            sid = next((p.split("|", 1)[1] for p in query.get("query", [""])[0].split(",") if p.startswith("sid|")), "AAA")
+            body = {"data": {"Entries": [{"id": 1000, "sid": sid, "systemtype": "ABAPSystem",
+                                          "landscape": "Bench", "status": "Live"}]}}
+        else:
+            body = {"SID": "AAA", "Description": "stub", "Main System Info": {"System Type": "ABAP"},
+                    "Clients": [{"Client": f"{i:03d}"} for i in range(20)]}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256   # the default backlog of 5 stalls bursts of new connections
+
+
+def start_stub(latency: float):
+    _StubHandler.latency = latency
+    httpd = _StubServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+async def run_blocking(calls: int, concurrency: int) -> float:
+    """Sync tool called from coroutines: every call blocks the event loop."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            with contextlib.redirect_stdout(io.StringIO()):
+                server.cockpit_get_view_by_sid(f"S{i:02d}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return time.perf_counter() - start
+
+
+async def run_async(calls: int, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            await server.cockpit_get_view_by_sid_async(f"S{i:02d}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1, help="stub backend latency per request (s)")
+    parser.add_argument("--calls", type=int, default=64, help="tool calls per measurement")
+    parser.add_argument("--levels", default="1,4,16,64", help="comma-separated concurrency levels")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    httpd = start_stub(args.latency)
+    base = f"http://127.0.0.1:{httpd.server_port}/slim"
+    cockpit_utils.FLEXI_BASE = base
+    cockpit_utils.COCKPIT_BASE = f"{base}/API/UI5CockpitDataProvider"
+
+    print(f"stub backend at {base}, latency {args.latency * 1000:.0f} ms, {args.calls} calls per run")
+    print(f"{'concurrency':>11} | {'blocking calls/s':>16} | {'async calls/s':>13} | speedup")
+    for level in (int(x) for x in args.levels.split(",")):
+        cockpit_utils.invalidate_resolve_cache()
+        t_block = asyncio.run(run_blocking(args.calls, level))
+        cockpit_utils.invalidate_resolve_cache()
+        t_async = asyncio.run(run_async(args.calls, level))
+        print(f"{level:>11} | {args.calls / t_block:>16.1f} | {args.calls / t_async:>13.1f} | {t_block / t_async:6.1f}x")
+
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Throughput benchmark: blocking LLM calls inside coroutines vs. the AsyncChatClient adapter.
+
+Runs N concurrent simulated conversations on one event loop, shaped like
+ai_cockpit_orchestrator.run_once: LLM turn, async MCP tool call, LLM turn.
+The LLM is a stub with the blocking interface of the GenAI Hub OpenAI client
+(--llm-latency seconds per turn, or streamed in chunks with --stream); the
+tool is an asyncio.sleep. Reports conversations/s, latency percentiles and
+the worst event loop stall seen by a 10 ms heartbeat.
+
+    python bench_async_llm.py [--llm-latency 0.5] [--tool-latency 0.05] [--levels 1,4,16,64] [--stream]
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from async_llm import AsyncChatClient
+
+
+class StubChatClient:
+    """Blocking stand-in for OpenAI(proxy_client=...): sleeps like a remote LLM turn."""
+
+    def __init__(self, latency: float, chunks: int = 20):
+        self.latency, self.n_chunks = latency, chunks
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **kwargs):
+        if not stream:
+            time.sleep(self.latency)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="answer"))])
+        return self._chunks()
+
+    def _chunks(self):
+        for _ in range(self.n_chunks):
+            time.sleep(self.latency / self.n_chunks)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="tok", tool_calls=None))])
+
+
+async def blocking_turn(client, stream: bool):
+    # what the orchestrators did: the sync SDK call straight inside the coroutine
+    if stream:
+        return "".join(c.choices[0].delta.content for c in client.chat.completions.create(model="m", messages=[], stream=True))
+    return client.chat.completions.create(model="m", messages=[]).choices[0].message.content
+
+
+async def adapter_turn(llm: AsyncChatClient, stream: bool):
+    if stream:
+        return "".join([c.choices[0].delta.content async for c in llm.stream(model="m", messages=[])])
+    return (await llm.create(model="m", messages=[])).choices[0].message.content
+
+
+async def conversation(turn, tool_latency: float) -> float:
+    start = time.perf_counter()
+    await turn()                          # LLM chooses a tool
+    await asyncio.sleep(tool_latency)     # MCP tool call
+    await turn()                          # LLM writes the answer
+    return time.perf_counter() - start
+
+
+async def heartbeat(lags: list, stop: asyncio.Event, period: float = 0.01):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(period)
+        lags.append(time.perf_counter() - t - period)
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(p * len(ordered)), len(ordered) - 1)]
+
+
+async def run_level(mode: str, n: int, args) -> dict:
+    client = StubChatClient(args.llm_latency)
+    if mode == "blocking":
+        turn = lambda: blocking_turn(client, args.stream)
+    else:
+        llm = AsyncChatClient(client, max_concurrency=args.llm_concurrency)
+        turn = lambda: adapter_turn(llm, args.stream)
+    lags: list = []
+    stop = asyncio.Event()
+    beat = asyncio.ensure_future(heartbeat(lags, stop))
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(conversation(turn, args.tool_latency) for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return {"throughput": n / elapsed, "p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95),
+            "max_lag": max(lags, default=0.0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per LLM turn")
+    parser.add_argument("--tool-latency", type=float, default=0.05, help="seconds per MCP tool call")
+    parser.add_argument("--levels", default="1,4,16,64", help="comma-separated concurrent conversations")
+    parser.add_argument("--llm-concurrency", type=int, default=64, help="adapter thread pool size")
+    parser.add_argument("--stream", action="store_true", help="stream the LLM turns in chunks")
+    args = parser.parse_args()
+
+    print(f"LLM turn {args.llm_latency * 1000:.0f} ms{' (streamed)' if args.stream else ''}, "
+          f"tool {args.tool_latency * 1000:.0f} ms, adapter pool {args.llm_concurrency}")
+    print(f"{'conv':>5} | {'mode':<8} | {'conv/s':>7} | {'p50 s':>6} | {'p95 s':>6} | {'max loop stall ms':>17}")
+    for n in (int(x) for x in args.levels.split(",")):
+        for mode in ("blocking", "adapter"):
+            r = asyncio.run(run_level(mode, n, args))
+            print(f"{n:>5} | {mode:<8} | {r['throughput']:>7.2f} | {r['p50']:>6.2f} | {r['p95']:>6.2f} | "
+                  f"{r['max_lag'] * 1000:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
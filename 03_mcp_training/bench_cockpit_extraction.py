@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Memory/latency benchmark: full json.loads vs. lazy section extraction of Cockpit payloads.
+
+Feed it payload files or the Cockpit responses of a fixture archive recorded
+with DLM_FIXTURES_MODE=record (see fixtures.py); without either a synthetic
+payload with large client and software component lists is generated.
+
+    python bench_cockpit_extraction.py [payload.json ...] [--fixtures dlm_fixtures.sqlite] [--repeat 5]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from cockpit_utils import _normalize_cockpit
+from fixtures import FixtureStore
+from lazy_json import LazyObject
+
+SECTION_SETS = {
+    "system_details": ["system_details"],
+    "details+availability": ["system_details", "availability"],
+    "all (default)": None,
+}
+
+
+def synthetic_payload(clients: int = 20000, components: int = 20000) -> str:
+    doc = {
+        "SID": "BIG", "Description": "synthetic large system", "Availability Tooltip": "Available",
+        "Main System Info": {"System Type": "ABAP", "DB Type": "HDB", "Basis Release": "758"},
+        "Sysmon Notes": "none", "Open SNOW Tickets": 2, "LandscapeName": "Bench",
+        "Clients": [{f"field{j}": f"client {i} value {j}" for j in range(15)} for i in range(clients)],
+        "Software Components": [{"Component": f"SAP_C{i}", "Release": "758", "SP": str(i % 12),
+                                 "Description": f"component {i} [x]"} for i in range(components)],
+    }
+    return json.dumps(doc)
+
+
+def measure(fn, repeat: int) -> tuple[float, float]:
+    """Best wall time (ms) over `repeat` runs, and peak traced memory (MB) of one run."""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 1e6
+
+
+def bench(name: str, text: str, repeat: int):
+    print(f"\n{name}: {len(text) / 1e6:.1f} MB")
+    print(f"  {'sections':<22} | {'full ms':>8} | {'full MB':>8} | {'lazy ms':>8} | {'lazy MB':>8}")
+    for label, sections in SECTION_SETS.items():
+        full_ms, full_mb = measure(lambda: _normalize_cockpit(json.loads(text), sections), repeat)
+        lazy_ms, lazy_mb = measure(lambda: _normalize_cockpit(LazyObject(text), sections), repeat)
+        print(f"  {label:<22} | {full_ms:>8.1f} | {full_mb:>8.1f} | {lazy_ms:>8.1f} | {lazy_mb:>8.1f}")
+
+    # a cache hit: the LazyObject is already indexed, only reads remain
+    cached = LazyObject(text)
+    hit_ms, _ = measure(lambda: _normalize_cockpit(cached, ["system_details"]), repeat)
+    print(f"  cached LazyObject, system_details: {hit_ms:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("payloads", nargs="*", help="recorded Cockpit JSON payload files")
+    parser.add_argument("--fixtures", help="fixture archive; every recorded Cockpit response is benchmarked")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not args.payloads and not args.fixtures:
+        bench("synthetic", synthetic_payload(), args.repeat)
+    if args.fixtures:
+        for params, body in FixtureStore(args.fixtures).bodies():
+            bench(f"{args.fixtures} objectid={params.get('objectid')}", body.decode("utf-8"), args.repeat)
+    for path in args.payloads:
+        with open(path, encoding="utf-8") as fh:
+            bench(path, fh.read(), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
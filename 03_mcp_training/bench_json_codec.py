@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Microbenchmark: stdlib json vs. json_codec on Cockpit payloads and tool results.
+
+Measures the three JSON steps of a cockpit tool call: decoding the backend
+response, encoding the normalized view as MCP text content (FastMCP's
+default indent=2 vs. compact json_codec), and the orchestrator's
+parse + re-serialize of that text. Feed it payload files or a fixture
+archive (DLM_FIXTURES_MODE=record); otherwise a synthetic payload is used.
+
+    python bench_json_codec.py [payload.json ...] [--fixtures dlm_fixtures.sqlite] [--repeat 20]
+"""
+import argparse
+import json
+import time
+
+import pydantic_core
+
+import json_codec
+from bench_cockpit_extraction import synthetic_payload
+from cockpit_utils import _normalize_cockpit
+from fixtures import FixtureStore
+
+
+def best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+
+def bench(name: str, body: bytes, repeat: int):
+    text = body.decode("utf-8")
+    view = _normalize_cockpit(json.loads(text))
+    mcp_default = pydantic_core.to_json(view, fallback=str, indent=2).decode()
+    compact = json_codec.dumps(view)
+
+    rows = [
+        ("decode backend response", lambda: json.loads(text), lambda: json_codec.loads(body)),
+        ("encode tool result", lambda: pydantic_core.to_json(view, fallback=str, indent=2).decode(),
+         lambda: json_codec.dumps(view)),
+        ("client parse + re-dump", lambda: json.dumps(json.loads(mcp_default)),
+         lambda: json_codec.dumps(json_codec.loads(compact))),
+    ]
+    print(f"\n{name}: payload {len(body) / 1e6:.2f} MB, codec {json_codec.BACKEND}")
+    print(f"  {'step':<26} | {'stdlib ms':>9} | {'codec ms':>9} | {'speedup':>7}")
+    for label, old, new in rows:
+        old_ms, new_ms = best_ms(old, repeat), best_ms(new, repeat)
+        print(f"  {label:<26} | {old_ms:>9.2f} | {new_ms:>9.2f} | {old_ms / new_ms:>6.1f}x")
+    print(f"  tool result size: {len(mcp_default.encode()):,} B (indent=2) -> {len(compact.encode()):,} B (compact)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("payloads", nargs="*", help="recorded Cockpit JSON payload files")
+    parser.add_argument("--fixtures", help="fixture archive; every recorded Cockpit response is benchmarked")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if not args.payloads and not args.fixtures:
+        bench("synthetic", synthetic_payload(clients=2000, components=5000).encode("utf-8"), args.repeat)
+    if args.fixtures:
+        for params, body in FixtureStore(args.fixtures).bodies():
+            bench(f"{args.fixtures} objectid={params.get('objectid')}", body, args.repeat)
+    for path in args.payloads:
+        with open(path, "rb") as fh:
+            bench(path, fh.read(), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
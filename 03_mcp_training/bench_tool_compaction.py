@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Prompt tokens of tool results fed back verbatim vs. compacted (tool_compaction.compact).
+
+Builds the results the orchestrator feeds back from the DLM stand-in's
+synthetic landscape: cockpit views with increasing numbers of clients and
+software components, multi-SID views and Flexi pages. Prints tokens before
+and after compaction, the steps that were needed and the compaction time
+per result.
+
+    python bench_tool_compaction.py [--budget 3000] [--sizes 10,50,200]
+"""
+import argparse
+import time
+
+import dlm_standin
+import tool_compaction
+from cockpit_utils import _normalize_cockpit
+
+FLEXI_FIELDS = ["sid", "status", "systemtype", "landscape", "cluster"]
+
+
+def view(row: dict, size: int) -> dict:
+    v = _normalize_cockpit(dlm_standin.cockpit_payload(row, clients=size, components=size * 4), None)
+    v["_resolved"] = {"objectid": row["id"], "sid": row["sid"]}
+    v["_cache"] = {"age_seconds": 12.5, "fetched_at": 1760000000.0}
+    return v
+
+
+def results(sizes: list[int]) -> list[tuple[str, object]]:
+    rows = dlm_standin.build_landscape(max(sizes) * 2)
+    out = []
+    for n in sizes:
+        out.append((f"view_by_sid, {n} clients", view(rows[0], n)))
+        out.append((f"views_by_sids x5, {n} clients", {"views": {r["sid"]: view(r, n) for r in rows[:5]},
+                                                       "failed": []}))
+        entries = [{k: r[k] for k in FLEXI_FIELDS} for r in rows[:n]]
+        out.append((f"flexi page, {n} rows", {"entries": entries, "total": len(rows), "offset": 0,
+                                              "returned": n, "truncated": n < len(rows), "next_cursor": None}))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=int, default=tool_compaction.TOKEN_BUDGET, help="tokens per tool message")
+    parser.add_argument("--sizes", default="10,50,200", help="comma-separated clients / rows per result")
+    args = parser.parse_args()
+
+    cases = results([int(x) for x in args.sizes.split(",")])
+    total = tool_compaction.CompactionStats()
+    print(f"{'result':<32} | {'before':>7} | {'after':>6} | {'saved':>5} | {'ms':>5} | steps")
+    for name, result in cases:
+        start = time.perf_counter()
+        _, stats = tool_compaction.compact(result, budget=args.budget)
+        ms = (time.perf_counter() - start) * 1000
+        total.add(stats)
+        saved = stats["saved"] / stats["tokens_before"] if stats["tokens_before"] else 0.0
+        print(f"{name:<32} | {stats['tokens_before']:>7} | {stats['tokens_after']:>6} | {saved:>5.0%} | "
+              f"{ms:>5.1f} | {', '.join(stats['steps'][2:]) or '-'}")
+    t = total.as_dict()
+    print(f"total: {t['tokens_before']} -> {t['tokens_after']} tokens, saved {t['saved']} ({t['saved_pct']}%), "
+          f"budget {args.budget}, tokenizer {t['tokenizer']}")
+
+
+if __name__ == "__main__":
+    main()
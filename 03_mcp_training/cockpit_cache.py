@@ -0,0 +1,214 @@
+# cockpit_cache.py
+"""
+Small in-process caches for backend lookups.
+
+TTLCache: bounded LRU with a per-entry TTL. Negative results (e.g. "No system
+found") can be stored with a shorter TTL than positive ones.
+
+PayloadCache: LRU bounded by total payload bytes, for full Cockpit documents.
+The caller states each payload's size; an entry whose payload grows in
+memory (a LazyObject decoding sections) is charged more with grow().
+Entries keep their ETag / Last-Modified validators so expired entries can be
+revalidated with a conditional GET, and can be served stale for a grace
+window while a refresh runs in the background.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache with TTL, negative-result TTL and hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, negative_ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._data: OrderedDict = OrderedDict()   # key -> (expires_at, negative, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return (found, negative, value). Expired entries count as a miss."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return False, False, None
+            expires_at, negative, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, negative, value
+
+    def set(self, key, value, negative: bool = False, ttl: float | None = None):
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, negative, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None, predicate=None) -> int:
+        """Drop one key, all keys matching `predicate(key)`, or everything. Returns count removed."""
+        with self._lock:
+            if key is not None:
+                return 1 if self._data.pop(key, None) is not None else 0
+            if predicate is not None:
+                doomed = [k for k in self._data if predicate(k)]
+            else:
+                doomed = list(self._data)
+            for k in doomed:
+                del self._data[k]
+            return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "negative_ttl": self.negative_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class PayloadEntry:
+    __slots__ = ("payload", "size", "stored_at", "wall_time", "etag", "last_modified")
+
+    def __init__(self, payload, size: int, etag: str | None, last_modified: str | None):
+        self.payload = payload
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.touch()
+
+    def touch(self):
+        self.stored_at = time.monotonic()
+        self.wall_time = time.time()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+
+class PayloadCache:
+    """Thread-safe, byte-size-bounded LRU of backend payloads with TTL and stale window."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 60, stale_ttl: float = 0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: OrderedDict = OrderedDict()   # key -> PayloadEntry
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def lookup(self, key) -> tuple[str, PayloadEntry | None]:
+        """
+        Classify the entry for `key`:
+          "fresh"  - younger than ttl, serve it
+          "stale"  - expired but inside the stale window, serve it and refresh
+          "expired"- too old to serve, but its validators allow a conditional GET
+          "miss"   - nothing cached
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return "miss", None
+            self._data.move_to_end(key)
+            age = entry.age
+            if age < self.ttl:
+                self.hits += 1
+                return "fresh", entry
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                return "stale", entry
+            self.misses += 1
+            return "expired", entry
+
+    def put(self, key, payload, size: int, etag: str | None = None, last_modified: str | None = None) -> PayloadEntry:
+        entry = PayloadEntry(payload, size, etag, last_modified)
+        if size > self.max_bytes:
+            return entry   # never cacheable; hand it back uncached
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._data[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._data:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+        return entry
+
+    def grow(self, key, entry: PayloadEntry, size: int):
+        """Charge `size` more bytes to `entry` (if still cached), evicting to stay in bounds."""
+        with self._lock:
+            entry.size += size
+            if self._data.get(key) is not entry:
+                return
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._data:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def mark_revalidated(self, entry: PayloadEntry):
+        """The backend answered 304 Not Modified: the entry is fresh again."""
+        with self._lock:
+            entry.touch()
+            self.revalidated += 1
+
+    def invalidate(self, key=None) -> int:
+        with self._lock:
+            if key is not None:
+                old = self._data.pop(key, None)
+                if old is None:
+                    return 0
+                self._bytes -= old.size
+                return 1
+            n = len(self._data)
+            self._data.clear()
+            self._bytes = 0
+            return n
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -1,69 +1,439 @@
 # cockpit_utils.py
-import requests
+import asyncio
 import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from backend_client import get_client, get_async_client, SingleFlight
+from cockpit_cache import TTLCache, PayloadCache
+from lazy_json import LazyObject
+import json_codec
+import metrics
 
-FLEXI_BASE = "https://dlm.wdf.sap.corp/slim"
-COCKPIT_BASE = "https://dlm.wdf.sap.corp/slim/API/UI5CockpitDataProvider"
+# Overridable to point the server at a stand-in (dlm_standin.py) or another DLM instance.
+FLEXI_BASE = os.environ.get("DLM_FLEXI_BASE", "https://dlm.wdf.sap.corp/slim").rstrip("/")
+COCKPIT_BASE = os.environ.get("DLM_COCKPIT_BASE", f"{FLEXI_BASE}/API/UI5CockpitDataProvider")
+
+# SID -> objectid resolution cache, keyed by (SID, systype). A SID's objectid
+# almost never changes, so positive results live long; "not found" / "all
+# canceled" answers are cached for a shorter time.
+_resolve_cache = TTLCache(
+    maxsize=int(os.environ.get("DLM_RESOLVE_CACHE_MAX", "1024")),
+    ttl=float(os.environ.get("DLM_RESOLVE_CACHE_TTL", "3600")),
+    negative_ttl=float(os.environ.get("DLM_RESOLVE_CACHE_NEGATIVE_TTL", "60")),
+)
+
+# Identical concurrent lookups (same Flexi query, same SID, same cockpit)
+# share one backend call instead of each sending their own.
+_flexi_flight = SingleFlight("flexi")
+_resolve_flight = SingleFlight("resolve")
+_cockpit_flight = SingleFlight("cockpit")
+
+# Full Cockpit payloads keyed by (objectid, systype), bounded by an estimate of
+# their memory: the body bytes of a LazyObject plus DECODED_SIZE_FACTOR times the
+# JSON text of each section it has decoded; a parsed dict is charged in full.
+# DLM_COCKPIT_CACHE_STALE > 0 enables stale-while-revalidate: an expired entry
+# younger than TTL + STALE is served immediately and refreshed in the background.
+_cockpit_cache = PayloadCache(
+    max_bytes=int(os.environ.get("DLM_COCKPIT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.environ.get("DLM_COCKPIT_CACHE_TTL", "60")),
+    stale_ttl=float(os.environ.get("DLM_COCKPIT_CACHE_STALE", "0")),
+)
+_cockpit_refreshing: set = set()
+# Python objects decoded from Cockpit JSON take about this many bytes per byte of
+# text (measured with tracemalloc on the stand-in's payloads).
+DECODED_SIZE_FACTOR = 6
+
+logger = logging.getLogger("cockpit_utils")
+
+REFRESH_ERRORS = metrics.REGISTRY.counter(
+    "dlm_cache_refresh_errors_total", "Failed background refreshes of stale cache entries, by cache.")
+
+# Keep cached Cockpit payloads as LazyObjects (indexed text, values decoded on
+# first read) instead of fully parsed dicts. DLM_COCKPIT_LAZY=0 switches back.
+COCKPIT_LAZY = os.environ.get("DLM_COCKPIT_LAZY", "1") != "0"
+_background_tasks: set = set()
+
+
+# Optional local LandscapeSnapshot (see landscape_snapshot.py), wired in by the
+# server. When fresh, SID resolution is answered from it before going live.
+_landscape_snapshot = None
+
+
+def set_landscape_snapshot(snapshot):
+    global _landscape_snapshot
+    _landscape_snapshot = snapshot
+
+
+def _snapshot_rows(sid: str) -> list | None:
+    if _landscape_snapshot is None:
+        return None
+    try:
+        return _landscape_snapshot.lookup_sid(sid) or None
+    except Exception:
+        return None   # a broken snapshot must never break resolution
+
+
+class SidNotFoundError(RuntimeError):
+    """Flexi answered, but there is no (active) system for the SID. Safe to cache."""
+
+
+def _resolve_cache_key(sid: str, systype: str | None) -> tuple:
+    return (sid.strip().upper(), (systype or "").strip().lower())
 
 
 def _resolve_objectid_from_sid(sid: str, systype: str | None = None) -> dict:
+    """
+    Resolve a Cockpit objectid based on SID, answering from the resolution
+    cache when possible and falling back to the Flexi Report.
+    """
+    key = _resolve_cache_key(sid, systype)
+    found, negative, value = _resolve_cache.get(key)
+    if found:
+        if negative:
+            raise SidNotFoundError(value)
+        return dict(value)
+
+    def resolve():
+        try:
+            res = _resolve_objectid_uncached(sid, systype)
+        except SidNotFoundError as e:
+            _resolve_cache.set(key, str(e), negative=True)
+            raise
+        _resolve_cache.set(key, dict(res))
+        return res
+
+    return dict(_resolve_flight.do(key, resolve))
+
+
+async def _resolve_objectid_from_sid_async(sid: str, systype: str | None = None) -> dict:
+    """Async variant of _resolve_objectid_from_sid; shares the same resolution cache."""
+    key = _resolve_cache_key(sid, systype)
+    found, negative, value = _resolve_cache.get(key)
+    if found:
+        if negative:
+            raise SidNotFoundError(value)
+        return dict(value)
+
+    async def resolve():
+        try:
+            res = await _resolve_objectid_uncached_async(sid, systype)
+        except SidNotFoundError as e:
+            _resolve_cache.set(key, str(e), negative=True)
+            raise
+        _resolve_cache.set(key, dict(res))
+        return res
+
+    return dict(await _resolve_flight.do_async(key, resolve))
+
+
+async def _resolve_objectids_from_sids_async(sids: list[str], systype: str | None = None) -> dict:
+    """
+    Resolve many SIDs at once: cached SIDs are answered from the resolution
+    cache, the rest with a single Flexi query carrying one `sid|` filter per
+    SID. SIDs missing from that answer fall back to the per-SID resolver.
+    Returns {sid: resolver result dict | Exception}.
+    """
+    results: dict = {}
+    missing = []
+    for sid in sids:
+        found, negative, value = _resolve_cache.get(_resolve_cache_key(sid, systype))
+        if not found:
+            rows = _snapshot_rows(sid)
+            if rows:
+                try:
+                    results[sid] = _pick_active_system(sid, systype, rows)
+                except SidNotFoundError as e:
+                    results[sid] = e
+            else:
+                missing.append(sid)
+        elif negative:
+            results[sid] = SidNotFoundError(value)
+        else:
+            results[sid] = dict(value)
+
+    if missing:
+        query = ",".join(["id", "sid", "systemtype", "landscape", "status"] + [f"sid|{sid}" for sid in missing])
+        try:
+            entries = await call_flexi_async(query)
+        except Exception:
+            entries = []
+        by_sid: dict = {}
+        for e in entries:
+            by_sid.setdefault(str(e.get("sid") or e.get("SID") or "").upper(), []).append(e)
+
+        fallback = []
+        for sid in missing:
+            if not by_sid.get(sid.upper()):
+                fallback.append(sid)
+                continue
+            key = _resolve_cache_key(sid, systype)
+            try:
+                res = _pick_active_system(sid, systype, by_sid[sid.upper()])
+            except SidNotFoundError as e:
+                _resolve_cache.set(key, str(e), negative=True)
+                results[sid] = e
+                continue
+            _resolve_cache.set(key, dict(res))
+            results[sid] = res
+
+        async def one(sid):
+            try:
+                results[sid] = await _resolve_objectid_from_sid_async(sid, systype)
+            except Exception as e:
+                results[sid] = e
+
+        await asyncio.gather(*(one(sid) for sid in fallback))
+
+    return {sid: results[sid] for sid in sids}
+
+
+def invalidate_resolve_cache(sid: str | None = None, systype: str | None = None) -> int:
+    """Drop cached resolutions: one (sid, systype), every systype of a SID, or all."""
+    if sid is None:
+        return _resolve_cache.invalidate()
+    if systype is not None:
+        return _resolve_cache.invalidate(key=_resolve_cache_key(sid, systype))
+    wanted = sid.strip().upper()
+    return _resolve_cache.invalidate(predicate=lambda k: k[0] == wanted)
+
+
+def resolve_cache_stats() -> dict:
+    return _resolve_cache.stats()
+
+
+def _flexi_entries(resp) -> list:
+    """Parse a Flexi response (requests or httpx) into a list of entries."""
+    resp.raise_for_status()
+    try:
+        data = json_codec.loads(resp.content)
+    except ValueError:
+        text = resp.text
+        preview = text[:1000] + ("..." if len(text) > 1000 else "")
+        raise RuntimeError(f"Flexi API returned non-JSON response. Preview: {preview}")
+
+    # If API returned a list directly
+    if isinstance(data, list):
+        return data
+    # If API returned a JSON string, try to parse
+    if isinstance(data, str):
+        try:
+            parsed = json_codec.loads(data)
+            return parsed if isinstance(parsed, list) else []
+        except Exception:
+            return []
+
+    # Normal dict case: try known nested locations
+    entries = data.get("data", {}).get("variable", {}).get("Entries") or data.get("data", {}).get("Entries") or data.get("Entries")
+    if isinstance(entries, list):
+        return entries
+    return []
+
+
+def call_flexi(query_string: str, timeout: float = 20) -> list:
+    """Call the Flexi report with a constructed query string and return parsed entries."""
+    url = f"{FLEXI_BASE}/report/flexi"
+    params = {"sw": "f", "otype": "json", "query": query_string}
+    return _flexi_flight.do(
+        (url, query_string), lambda: _flexi_entries(get_client().get(url, params=params, timeout=timeout)))
+
+
+async def call_flexi_async(query_string: str, timeout: float = 20) -> list:
+    """Async variant of call_flexi on the shared httpx client."""
+    url = f"{FLEXI_BASE}/report/flexi"
+    params = {"sw": "f", "otype": "json", "query": query_string}
+
+    async def fetch():
+        return _flexi_entries(await get_async_client().get(url, params=params, timeout=timeout))
+
+    return await _flexi_flight.do_async((url, query_string), fetch)
+
+
+# Candidate Flexi query forms, most detailed first. The resolver learns which
+# form usually answers and tries (or prioritizes) that one first.
+_CANDIDATE_FORMS = {
+    "detailed": lambda sid: f"id,sid,systemtype,landscape,status,sid|{sid}",
+    "id_sid": lambda sid: f"id,sid|{sid}",
+    "sid_only": lambda sid: f"sid|{sid}",
+}
+_candidate_wins = {label: 0 for label in _CANDIDATE_FORMS}
+_candidate_lock = threading.Lock()
+
+# "sequential": try candidates one after another (learned best first).
+# "race": send all candidates concurrently, take the highest-priority
+# non-empty answer and stop waiting for the rest.
+RESOLVE_MODE = os.environ.get("DLM_RESOLVE_MODE", "sequential")
+_race_pool: ThreadPoolExecutor | None = None
+
+
+def _candidate_queries(sid: str) -> list[tuple[str, str]]:
+    """(label, query) pairs in priority order: most successful form first, ties keep the default order."""
+    with _candidate_lock:
+        wins = dict(_candidate_wins)
+    labels = sorted(_CANDIDATE_FORMS, key=lambda label: -wins[label])
+    return [(label, _CANDIDATE_FORMS[label](sid)) for label in labels]
+
+
+def _record_candidate_win(label: str):
+    with _candidate_lock:
+        _candidate_wins[label] += 1
+
+
+def resolver_stats() -> dict:
+    with _candidate_lock:
+        wins = dict(_candidate_wins)
+    return {"mode": RESOLVE_MODE, "candidate_wins": wins}
+
+
+def _query_candidates_sequential(candidates: list[tuple[str, str]]) -> tuple[list, list]:
+    entries = []
+    errors = []
+    for label, q in candidates:
+        try:
+            entries = call_flexi(q)
+        except Exception as e:
+            errors.append(e)
+            entries = []
+        if entries:
+            _record_candidate_win(label)
+            break
+    return entries, errors
+
+
+def _query_candidates_race(candidates: list[tuple[str, str]]) -> tuple[list, list]:
+    """
+    Send all candidate queries at once. The answer of candidate i is taken as
+    soon as it is non-empty and every higher-priority candidate has come back
+    empty or failed. Queued candidates are cancelled; in-flight ones finish in
+    the background and their results are ignored.
+    """
+    global _race_pool
+    if _race_pool is None:
+        with _candidate_lock:
+            if _race_pool is None:
+                _race_pool = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("DLM_RESOLVE_RACE_WORKERS", "8")),
+                    thread_name_prefix="flexi-race",
+                )
+
+    futures = [_race_pool.submit(call_flexi, q) for _, q in candidates]
+    index = {f: i for i, f in enumerate(futures)}
+    outcomes: dict[int, list | Exception] = {}
+    winner = None
+    try:
+        for fut in as_completed(futures):
+            try:
+                outcomes[index[fut]] = fut.result()
+            except Exception as e:
+                outcomes[index[fut]] = e
+            # walk the priority order while answers are known
+            for i in range(len(futures)):
+                if i not in outcomes:
+                    break
+                if isinstance(outcomes[i], list) and outcomes[i]:
+                    winner = i
+                    break
+            if winner is not None:
+                break
+    finally:
+        for fut in futures:
+            fut.cancel()
+
+    errors = [o for o in outcomes.values() if isinstance(o, Exception)]
+    if winner is None:
+        return [], errors
+    _record_candidate_win(candidates[winner][0])
+    return outcomes[winner], errors
+
+
+def _resolve_objectid_uncached(sid: str, systype: str | None = None, mode: str | None = None) -> dict:
     """
     Resolve a Cockpit objectid based on SID via Flexi Report.
     Ignores entries with status 'Canceled'.
     """
-    fields = ["id", "sid", "systemtype", "landscape", "status"]
     # Only query Flexi by SID; system type is not required by the Flexi API and
     # historically caused empty results. If a systype is provided, we'll filter
     # returned entries client-side.
-    filters = [f"sid|{sid}"]
+    rows = _snapshot_rows(sid)
+    if rows:
+        return _pick_active_system(sid, systype, rows)
 
-    url = f"{FLEXI_BASE}/report/flexi"
+    candidates = _candidate_queries(sid)
+    if (mode or RESOLVE_MODE) == "race":
+        entries, errors = _query_candidates_race(candidates)
+    else:
+        entries, errors = _query_candidates_sequential(candidates)
+    return _pick_active_system(sid, systype, entries, errors)
 
-    # Helper to call Flexi with a constructed query string and return parsed entries
-    def call_flexi(query_string: str):
-        params = {"sw": "f", "otype": "json", "query": query_string}
-        resp = requests.get(url, params=params, timeout=20, verify=False)
-        resp.raise_for_status()
-        try:
-            data = resp.json()
-        except ValueError:
-            text = resp.text
-            preview = text[:1000] + ("..." if len(text) > 1000 else "")
-            raise RuntimeError(f"Flexi API returned non-JSON response. Preview: {preview}")
-
-        # If API returned a list directly
-        if isinstance(data, list):
-            return data
-        # If API returned a JSON string, try to parse
-        if isinstance(data, str):
-            try:
-                parsed = json.loads(data)
-                return parsed if isinstance(parsed, list) else []
-            except Exception:
-                return []
-
-        # Normal dict case: try known nested locations
-        entries = data.get("data", {}).get("variable", {}).get("Entries") or data.get("data", {}).get("Entries") or data.get("Entries")
-        if isinstance(entries, list):
-            return entries
-        return []
-
-    # Build query candidates to try (start with the more detailed, then simpler)
-    candidate_queries = [
-        ",".join(fields + filters),
-        f"id,sid|{sid}",
-        f"sid|{sid}",
-    ]
 
+async def _query_candidates_sequential_async(candidates: list[tuple[str, str]]) -> tuple[list, list]:
     entries = []
-    for q in candidate_queries:
+    errors = []
+    for label, q in candidates:
         try:
-            entries = call_flexi(q)
-        except Exception:
+            entries = await call_flexi_async(q)
+        except Exception as e:
+            errors.append(e)
             entries = []
         if entries:
+            _record_candidate_win(label)
             break
+    return entries, errors
+
+
+async def _query_candidates_race_async(candidates: list[tuple[str, str]]) -> tuple[list, list]:
+    """Same priority rule as _query_candidates_race, but losers are really cancelled."""
+    tasks = [asyncio.ensure_future(call_flexi_async(q)) for _, q in candidates]
+    index = {t: i for i, t in enumerate(tasks)}
+    outcomes: dict[int, list | BaseException] = {}
+    winner = None
+    pending = set(tasks)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.cancelled():
+                    # cancelled from outside (e.g. a shared in-flight query): a failed
+                    # candidate for this SID, not a reason to abort the caller's batch
+                    label = candidates[index[t]][0]
+                    outcomes[index[t]] = RuntimeError(f"Flexi query for candidate '{label}' was cancelled")
+                else:
+                    outcomes[index[t]] = t.exception() or t.result()
+            for i in range(len(tasks)):
+                if i not in outcomes:
+                    break
+                if isinstance(outcomes[i], list) and outcomes[i]:
+                    winner = i
+                    break
+    finally:
+        for t in pending:
+            t.cancel()
+
+    errors = [o for o in outcomes.values() if isinstance(o, BaseException)]
+    if winner is None:
+        return [], errors
+    _record_candidate_win(candidates[winner][0])
+    return outcomes[winner], errors
+
 
+async def _resolve_objectid_uncached_async(sid: str, systype: str | None = None, mode: str | None = None) -> dict:
+    """Async variant of _resolve_objectid_uncached."""
+    rows = _snapshot_rows(sid)
+    if rows:
+        return _pick_active_system(sid, systype, rows)
+
+    candidates = _candidate_queries(sid)
+    if (mode or RESOLVE_MODE) == "race":
+        entries, errors = await _query_candidates_race_async(candidates)
+    else:
+        entries, errors = await _query_candidates_sequential_async(candidates)
+    return _pick_active_system(sid, systype, entries, errors)
+
+
+def _pick_active_system(sid: str, systype: str | None, entries: list, errors: list | None = None) -> dict:
+    """Apply the systype filter, drop canceled systems and return the resolver result."""
     # If a systype filter was provided, filter returned entries client-side
     if systype and entries:
         filtered = []
@@ -75,7 +445,10 @@ def _resolve_objectid_from_sid(sid: str, systype: str | None = None) -> dict:
             entries = filtered
 
     if not entries:
-        raise RuntimeError(f"No system found for SID '{sid}'.")
+        if errors:
+            # Backend trouble is not an answer; don't let it be cached as "not found".
+            raise RuntimeError(f"No system found for SID '{sid}' (last error: {errors[-1]}).")
+        raise SidNotFoundError(f"No system found for SID '{sid}'.")
 
     # Normalize casing
     norm = []
@@ -92,7 +465,7 @@ def _resolve_objectid_from_sid(sid: str, systype: str | None = None) -> dict:
     active = [e for e in norm if e["status"].lower() not in ("canceled", "cancelled")]
 
     if not active:
-        raise RuntimeError(f"All systems for SID '{sid}' are canceled.")
+        raise SidNotFoundError(f"All systems for SID '{sid}' are canceled.")
 
     best = active[0]
     return {
@@ -104,16 +477,21 @@ def _resolve_objectid_from_sid(sid: str, systype: str | None = None) -> dict:
     }
 
 
-def _fetch_cockpit(objectid: str, systype: str = "ABAPSystem") -> dict:
-    """Fetch the full Cockpit JSON for a given objectid."""
-    params = {"systype": systype, "objectid": objectid}
-    resp = requests.get(COCKPIT_BASE, params=params, timeout=30, verify=False)
+def _cockpit_payload(resp, objectid: str, systype: str, lazy: bool = False):
+    """
+    Validate a Cockpit response (requests or httpx) and return the JSON object.
+    With lazy=True a LazyObject is returned: the document is only indexed and
+    top-level values are decoded when read.
+    """
     resp.raise_for_status()
     # Try to return JSON; if the endpoint returns plain text or unexpected payload,
     # raise a clear error so callers can handle it.
     try:
-        data = resp.json()
-        print("Cockpit API returned JSON data",data)
+        if lazy:
+            text = resp.text
+            if text.lstrip().startswith("{"):
+                return LazyObject(text)
+        data = json_codec.loads(resp.content)
     except ValueError:
         # Not JSON — include a truncated preview to help debugging
         text = resp.text
@@ -132,9 +510,147 @@ def _fetch_cockpit(objectid: str, systype: str = "ABAPSystem") -> dict:
     return data
 
 
-def _normalize_cockpit(raw: dict, sections: list[str] | None = None) -> dict:
-    """Normalize Cockpit JSON into a compact, structured response."""
-    sections = set(sections or ["system_details", "availability", "program_landscape" , "Clients", "Software_Components"])
+def _fetch_cockpit(objectid: str, systype: str = "ABAPSystem") -> dict:
+    """Fetch the full Cockpit JSON for a given objectid."""
+    params = {"systype": systype, "objectid": objectid}
+
+    def fetch():
+        resp = get_client().get(COCKPIT_BASE, params=params, timeout=30)
+        data = _cockpit_payload(resp, objectid, systype)
+        logger.info("fetched cockpit %s (%s): %d bytes, %d keys", objectid, systype, len(resp.content), len(data))
+        return data
+
+    return _cockpit_flight.do((objectid, systype), fetch)
+
+
+async def _fetch_cockpit_async(objectid: str, systype: str = "ABAPSystem") -> dict:
+    """Async variant of _fetch_cockpit."""
+    params = {"systype": systype, "objectid": objectid}
+    resp = await get_async_client().get(COCKPIT_BASE, params=params, timeout=30)
+    return _cockpit_payload(resp, objectid, systype)
+
+
+@metrics.REGISTRY.register_collector
+def _cache_metrics():
+    caches = {"sid_resolve": resolve_cache_stats(), "cockpit_payload": cockpit_cache_stats()}
+    lookups = []
+    for cache, st in caches.items():
+        lookups.append(({"cache": cache, "result": "hit"}, st["hits"]))
+        lookups.append(({"cache": cache, "result": "miss"}, st["misses"]))
+        if "stale_hits" in st:
+            lookups.append(({"cache": cache, "result": "stale"}, st["stale_hits"]))
+    yield ("dlm_cache_lookups_total", "counter", "Cache lookups by result.", lookups)
+    yield ("dlm_cache_hit_ratio", "gauge", "Share of cache lookups answered from the cache.",
+           [({"cache": c}, st["hit_ratio"]) for c, st in caches.items()])
+    yield ("dlm_cache_evictions_total", "counter", "Entries evicted by the size bound.",
+           [({"cache": c}, st["evictions"]) for c, st in caches.items()])
+    yield ("dlm_cache_bytes", "gauge", "Bytes held by the cockpit payload cache.",
+           [({"cache": "cockpit_payload"}, caches["cockpit_payload"]["bytes"])])
+
+
+async def _fetch_cockpit_conditional_async(objectid: str, systype: str, entry=None):
+    """
+    GET the cockpit, sending the validators of `entry` (if any). Returns the
+    cache entry: the revalidated old one on 304, a new one otherwise.
+    """
+    key = (objectid, systype)
+    headers = {}
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+    params = {"systype": systype, "objectid": objectid}
+    resp = await get_async_client().get(COCKPIT_BASE, params=params, timeout=30, headers=headers)
+    if entry is not None and resp.status_code == 304:
+        _cockpit_cache.mark_revalidated(entry)
+        return entry
+    data = _cockpit_payload(resp, objectid, systype, lazy=COCKPIT_LAZY)
+    lazy = isinstance(data, LazyObject)
+    size = len(resp.content) if lazy else len(resp.content) * DECODED_SIZE_FACTOR
+    entry = _cockpit_cache.put(key, data, size,
+                               etag=resp.headers.get("ETag"),
+                               last_modified=resp.headers.get("Last-Modified"))
+    if lazy:
+        data.on_decode = lambda chars: _cockpit_cache.grow(key, entry, chars * DECODED_SIZE_FACTOR)
+    return entry
+
+
+async def _refresh_cockpit_in_background(objectid: str, systype: str, entry):
+    key = (objectid, systype)
+    try:
+        await _fetch_cockpit_conditional_async(objectid, systype, entry)
+    except Exception as e:
+        # keep serving the stale entry; the next request past the window refetches
+        REFRESH_ERRORS.inc(cache="cockpit")
+        logger.warning("background refresh of cockpit %s (%s) failed, serving the stale entry: %s",
+                       objectid, systype, e)
+    finally:
+        _cockpit_refreshing.discard(key)
+
+
+async def _fetch_cockpit_cached_async(objectid: str, systype: str = "ABAPSystem") -> tuple[dict, dict]:
+    """
+    Cockpit JSON through the payload cache. Returns (payload, cache_info) where
+    cache_info = {"status": hit|stale|revalidated|miss|stale_on_error, "age_seconds",
+    "fetched_at"}. When DLM fails and an expired entry is still cached, that
+    entry is served ("stale_on_error", with "backend_error") instead of failing.
+    The payload is shared with the cache and must not be mutated; with
+    COCKPIT_LAZY it is a LazyObject, so only the sections that are read get
+    decoded (once per cache entry).
+    """
+    key = (objectid, systype)
+    state, entry = _cockpit_cache.lookup(key)
+    if state == "fresh":
+        status = "hit"
+    elif state == "stale":
+        status = "stale"
+        if key not in _cockpit_refreshing:
+            _cockpit_refreshing.add(key)
+            task = asyncio.ensure_future(_refresh_cockpit_in_background(objectid, systype, entry))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+    else:
+        try:
+            fetched = await _cockpit_flight.do_async(
+                key, lambda: _fetch_cockpit_conditional_async(objectid, systype, entry))
+        except Exception as e:
+            if entry is None:
+                raise
+            # DLM failing (or its circuit breaker open): an old answer beats none
+            return entry.payload, {**_cache_info("stale_on_error", entry), "backend_error": str(e)}
+        status = "revalidated" if fetched is entry else "miss"
+        entry = fetched
+
+    return entry.payload, _cache_info(status, entry)
+
+
+def _cache_info(status: str, entry) -> dict:
+    return {
+        "status": status,
+        "age_seconds": round(entry.age, 3),
+        "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(entry.wall_time)),
+    }
+
+
+def coalescing_stats() -> dict:
+    """Calls and coalesced calls per single-flight group."""
+    return {f.name: f.stats() for f in (_flexi_flight, _resolve_flight, _cockpit_flight)}
+
+
+def cockpit_cache_stats() -> dict:
+    return _cockpit_cache.stats()
+
+
+def invalidate_cockpit_cache(objectid: str | None = None, systype: str = "ABAPSystem") -> int:
+    return _cockpit_cache.invalidate(key=(objectid, systype) if objectid else None)
+
+
+DEFAULT_SECTIONS = ["system_details", "availability", "program_landscape" , "Clients", "Software_Components"]
+
+def _normalize_cockpit(raw, sections: list[str] | None = None) -> dict:
+    """Normalize Cockpit JSON (dict or LazyObject) into a compact, structured response."""
+    sections = set(sections or DEFAULT_SECTIONS)
     out = {}
 
     if "system_details" in sections:
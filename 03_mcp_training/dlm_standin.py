@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""Local stand-in for the DLM/SLIM endpoints the MCP server calls, for load tests.
+
+Serves /report/flexi and /API/UI5CockpitDataProvider (under /slim, like
+dlm.wdf.sap.corp) over a synthetic landscape of --systems systems, with
+injectable latency, slow requests and errors. Point the server at it with
+
+    python dlm_standin.py --systems 5000 --latency 0.05 --slow-rate 0.01 --error-rate 0.005
+    DLM_FLEXI_BASE=http://127.0.0.1:8700/slim python server.py
+
+Flexi queries follow the real syntax: comma-separated fields plus
+'field|value' filters (OR within a field, AND across fields, '*' wildcards,
+'field|>value' for "greater than"). Cockpit payloads carry every key
+_normalize_cockpit reads, sized by --clients / --components, with an ETag.
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SYSTEM_TYPES = ["ABAPSystem"] * 6 + ["HANADatabase"] * 2 + ["JavaSystem"]
+STATUSES = ["Live"] * 8 + ["Parked", "Canceled"]
+_ALNUM = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def sid_for(i: int) -> str:
+    """Unique SID per index: a letter and two alphanumerics (A00, A01, ...), longer past 33696."""
+    letter, rest = divmod(i, 36 * 36)
+    sid = chr(ord("A") + letter % 26) + _ALNUM[rest // 36] + _ALNUM[rest % 36]
+    return sid if letter < 26 else sid + str(letter // 26)
+
+
+def build_landscape(systems: int, seed: int = 42) -> list[dict]:
+    """Synthetic Flexi rows. Every 20th SID also has a canceled predecessor, as in the real report."""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(systems):
+        sid = sid_for(i)
+        row = {
+            "id": 100000 + i,
+            "sid": sid,
+            "status": rnd.choice(STATUSES),
+            "systemtype": rnd.choice(SYSTEM_TYPES),
+            "landscape": f"LS{i % 50:02d}",
+            "cluster": f"Core {i % 4 + 1}",
+            "customer.name": f"Customer {i % 37}",
+            "changedon": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:00Z",
+        }
+        rows.append(row)
+        if i % 20 == 0:
+            rows.append({**row, "id": 900000 + i, "status": "Canceled", "changedon": "2025-01-01T00:00:00Z"})
+    return rows
+
+
+def cockpit_payload(row: dict, clients: int, components: int) -> dict:
+    sid = row["sid"]
+    return {
+        "SID": sid,
+        "Description": f"Synthetic {row['systemtype']} {sid}",
+        "Availability Tooltip": "Available" if row["status"] == "Live" else row["status"],
+        "FLPConnections": [f"https://{sid.lower()}.flp.example/{n}" for n in range(2)],
+        "LPDConnections": [],
+        "R3Logon Link": f"sapgui://{sid.lower()}.example",
+        "Main System Info": {
+            "System Type": row["systemtype"], "Product Version": "S/4HANA 2023", "DB_host": f"{sid.lower()}db",
+            "HDB Instance": "00", "DB Type": "HDB", "HANA Version": "2.00.070", "HANA Release": "2.0",
+            "Basis Release": "758", "AppServer": f"{sid.lower()}app", "CreatedOn": "2024-03-01",
+            "ProgramLead": "Lead Person", "PLO": "PLO Person",
+        },
+        "Assigned Programs": {"Prog Lead": "Lead Person"},
+        "PLO": "PLO Person",
+        "Sysmon Notes": "",
+        "SNOW Landscape Down Tickets": 0,
+        "Open SNOW Tickets": row["id"] % 3,
+        "LandscapeName": row["landscape"],
+        "Upcoming Milestones": [{"name": "Upgrade", "date": "2026-12-01"}],
+        "Clients": [{"Client": f"{n:03d}", "Description": f"client {n} of {sid}", "Role": "Test"}
+                    for n in range(clients)],
+        "Software Components": [{"Component": f"SAP_C{n}", "Release": "758", "SP": str(n % 12)}
+                                for n in range(components)],
+    }
+
+
+def _value(row: dict, field: str):
+    wanted = field.lower()
+    return next((v for k, v in row.items() if k.lower() == wanted), None)
+
+
+def _matches(value, pattern: str) -> bool:
+    text = "" if value is None else str(value)
+    if pattern.startswith(">="):
+        return text >= pattern[2:]
+    if pattern.startswith(">"):
+        return text > pattern[1:]
+    return fnmatch.fnmatchcase(text.lower(), pattern.lower())
+
+
+def flexi_query(rows: list[dict], query: str) -> list[dict]:
+    fields, filters = [], {}
+    for part in filter(None, (p.strip() for p in query.split(","))):
+        field, sep, value = part.partition("|")
+        if sep:
+            filters.setdefault(field.strip(), []).append(value.strip())
+        else:
+            fields.append(part)
+    hits = [r for r in rows
+            if all(any(_matches(_value(r, f), v) for v in values) for f, values in filters.items())]
+    if not fields:
+        return hits
+    return [{f: _value(r, f) for f in fields} for r in hits]
+
+
+class StandIn:
+    """Landscape, fault settings and request counters shared by the handler threads."""
+
+    def __init__(self, rows: list[dict], latency: float, jitter: float, slow_rate: float, slow: float,
+                 error_rate: float, clients: int, components: int, seed: int = 42):
+        self.rows = rows
+        self.by_id = {str(r["id"]): r for r in rows}
+        self.latency, self.jitter = latency, jitter
+        self.slow_rate, self.slow = slow_rate, slow
+        self.error_rate = error_rate
+        self.clients, self.components = clients, components
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._payloads: dict = {}
+        self.counts = {"flexi": 0, "cockpit": 0, "errors": 0, "slow": 0}
+
+    def delay_and_fault(self, endpoint: str) -> bool:
+        """Sleep the injected latency; True when this request should fail."""
+        with self._lock:
+            self.counts[endpoint] += 1
+            slow = self._rnd.random() < self.slow_rate
+            fail = self._rnd.random() < self.error_rate
+            jitter = self._rnd.uniform(-self.jitter, self.jitter)
+            self.counts["slow"] += slow
+            self.counts["errors"] += fail
+        time.sleep(max(self.slow if slow else self.latency + jitter, 0))
+        return fail
+
+    def cockpit(self, objectid: str) -> tuple[bytes, str] | None:
+        with self._lock:
+            cached = self._payloads.get(objectid)
+        if cached is None:
+            row = self.by_id.get(objectid)
+            if row is None:
+                return None
+            body = json.dumps(cockpit_payload(row, self.clients, self.components)).encode("utf-8")
+            cached = (body, '"' + hashlib.sha1(body).hexdigest()[:16] + '"')
+            with self._lock:
+                self._payloads[objectid] = cached
+        return cached
+
+
+def make_handler(standin: StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code: int, body: bytes, headers: dict | None = None):
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path.endswith("/report/flexi"):
+                if standin.delay_and_fault("flexi"):
+                    return self._send(503, b'{"error": "injected failure"}')
+                entries = flexi_query(standin.rows, params.get("query", ""))
+                return self._send(200, json.dumps({"data": {"Entries": entries}}).encode("utf-8"))
+            if url.path.endswith("/API/UI5CockpitDataProvider"):
+                if standin.delay_and_fault("cockpit"):
+                    return self._send(503, b'{"error": "injected failure"}')
+                found = standin.cockpit(params.get("objectid", ""))
+                if found is None:
+                    return self._send(404, b'{"error": "unknown objectid"}')
+                body, etag = found
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, b"", {"ETag": etag})
+                return self._send(200, body, {"ETag": etag})
+            if url.path.endswith("/stats"):
+                return self._send(200, json.dumps(standin.counts).encode("utf-8"))
+            self._send(404, b'{"error": "not found"}')
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    # the default backlog of 5 stalls new connections under load
+    request_queue_size = 512
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients drop connections on purpose (hedged duplicates, timeouts)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(standin: StandIn, host: str = "127.0.0.1", port: int = 8700) -> ThreadingHTTPServer:
+    """Start the stand-in in a daemon thread and return the server (port 0 = any free port)."""
+    server = _Server((host, port), make_handler(standin))
+    threading.Thread(target=server.serve_forever, name="dlm-standin", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--systems", type=int, default=2000, help="systems in the synthetic landscape")
+    parser.add_argument("--latency", type=float, default=0.05, help="base response latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="+/- latency jitter (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that are slow")
+    parser.add_argument("--slow", type=float, default=2.0, help="latency of a slow request (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--clients", type=int, default=50, help="clients per cockpit payload")
+    parser.add_argument("--components", type=int, default=200, help="software components per cockpit payload")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    standin = StandIn(build_landscape(args.systems, args.seed), args.latency, args.jitter, args.slow_rate,
+                      args.slow, args.error_rate, args.clients, args.components, args.seed)
+    server = serve(standin, args.host, args.port)
+    print(f"DLM stand-in with {len(standin.rows)} rows on http://{args.host}:{server.server_port}/slim")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# fast_router.py
+"""
+Deterministic fast path for the orchestrator's tool-selection turn.
+
+The routing policy in SYSTEM_PROMPT is simple enough to apply locally for
+the common cases ("status of ADL", "overview of ERX, ADL and CC3", "list
+live HANA systems in cluster Core 2"): FastRouter matches intent patterns,
+SIDs and filter words and, when it is confident, returns the tool call the
+LLM would have chosen, so the first gpt-4o round trip is skipped. Anything
+else ("why", "compare", follow-ups, unknown words) falls back to the LLM, and
+so does every prompt with more than one intent ("status of ERX vs ADL",
+"status of ADL, ERX: any P1 tickets?"), since one tool call would answer
+only part of it.
+
+SIDs are three-character tokens (letter + two letters/digits). Uppercase
+ones count unless they are common acronyms; lowercase ones only when they
+are in the SID vocabulary, which is seeded from FAST_ROUTER_SIDS (a file,
+one SID per line) and grows with every SID a cockpit tool answered for.
+A route naming a SID outside the vocabulary stays below the default
+threshold (an uppercase word such as "KPI" looks just like a SID), so it
+goes to the LLM until a cockpit tool has answered for that SID once.
+
+An optional local intent classifier (multinomial naive Bayes, no extra
+dependencies) trained on FAST_ROUTER_EXAMPLES (JSON lines with "prompt"
+and "tool") can confirm or veto the pattern intent.
+
+Configuration (env vars):
+    FAST_ROUTER                 1 (default) = on, 0 = every query goes to the LLM
+    FAST_ROUTER_MIN_CONFIDENCE  confidence needed to skip the LLM (default 0.85)
+    FAST_ROUTER_SIDS            file with known SIDs
+    FAST_ROUTER_EXAMPLES        labelled prompts for the intent classifier
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+ENABLED = os.environ.get("FAST_ROUTER", "1") != "0"
+MIN_CONFIDENCE = float(os.environ.get("FAST_ROUTER_MIN_CONFIDENCE", "0.85"))
+
+_WORD = re.compile(r"[A-Za-z0-9_.\-]+")
+_SID = re.compile(r"\b([A-Za-z][A-Za-z0-9]{2})\b")
+# uppercase three-letter tokens in landscape questions that are not SIDs
+_ACRONYMS = {"SAP", "API", "DEV", "QAS", "PRD", "TST", "CPU", "RAM", "SLA", "FLP", "LPD", "DLM", "HDB",
+             "ERP", "CRM", "BTP", "AWS", "GCP", "ALL", "AND", "THE", "FOR", "NOT", "ANY", "HOW", "WHO",
+             "WHY", "ARE", "MCP", "LLM", "URL", "SID", "IDS", "KPI", "FAQ", "ETA", "SQL", "PDF", "CSV",
+             "SSO", "VPN", "DNS", "TLS", "SSL", "RFC", "UTC", "CET", "JVM", "OSS", "BOM", "UAT", "SLO"}
+
+_OVERVIEW = re.compile(r"\b(overview|status|detail|details|availability|available|info|information|health|"
+                       r"show|summary|summari[sz]e|describe|state|clients?|components?|landscape of|how is|"
+                       r"what about|tell me about)\b", re.I)
+_LIST = re.compile(r"\b(list|search|find|which|all|show all|how many|count|systems)\b", re.I)
+# intents the fast path does not handle: reasoning, comparison, follow-ups, actions
+_OPEN_ENDED = re.compile(r"\b(why|compare|comparison|difference|explain|recommend|should|could|would|"
+                         r"instead|previous|last time|again|same|it|they|them|those|these|restart|"
+                         r"create|delete|change|update)\b", re.I)
+
+_STATUSES = {"live": "Live", "parked": "Parked", "canceled": "Canceled", "cancelled": "Canceled"}
+_SYSTEM_TYPES = {"abap": "ABAPSystem", "hana": "HANADatabase", "java": "JavaSystem"}
+_CLUSTER = re.compile(r"\bcluster\s+(core\s*\d+|[A-Za-z0-9_\-]+)", re.I)
+_LANDSCAPE = re.compile(r"\blandscape\s+([A-Za-z0-9_\-]+)", re.I)
+# more than one intent in one prompt: comparisons, or a second clause/question
+# ("status of ADL, ERX: any P1 tickets?") -- one tool call would answer only part of it
+_MULTI_INTENT = re.compile(r"\b(vs|versus|than|compared?|as well as|also|plus|then)\b|"
+                           r"\band\s+(what|which|who|how|why|when|where|is|are|any|show|list|tell|give)\b|"
+                           r"[:;?]\s*\w", re.I)
+_COUNT = re.compile(r"\b(how many|count|number of)\b", re.I)
+_GROUP_BY = re.compile(r"\b(?:per|by)\s+(status|systemtype|system type|cluster|landscape)\b", re.I)
+SEARCH_FIELDS = ["sid", "status", "systemtype", "landscape", "cluster"]
+
+
+@dataclass
+class Route:
+    """A tool call chosen without the LLM."""
+    tool: str
+    arguments: dict
+    confidence: float
+    rule: str
+    notes: list = field(default_factory=list)
+
+    def as_message(self):
+        """The route in the shape of an LLM assistant message with one tool call."""
+        call = SimpleNamespace(id="fast-route-1", type="function",
+                               function=SimpleNamespace(name=self.tool, arguments=json.dumps(self.arguments)))
+        return SimpleNamespace(content="", tool_calls=[call])
+
+
+class IntentClassifier:
+    """Multinomial naive Bayes over lowercased words: prompt -> tool name with a probability."""
+
+    def __init__(self, examples: list[tuple[str, str]]):
+        self.word_counts: dict = {}
+        self.label_counts = Counter(label for _, label in examples)
+        self.vocab = set()
+        for prompt, label in examples:
+            words = self._words(prompt)
+            self.word_counts.setdefault(label, Counter()).update(words)
+            self.vocab.update(words)
+
+    @staticmethod
+    def _words(text: str) -> list[str]:
+        # SIDs would only teach the classifier specific systems: map them to one token
+        return ["<sid>" if _SID.fullmatch(w) and w.isupper() else w.lower() for w in _WORD.findall(text)]
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentClassifier":
+        with open(path, encoding="utf-8") as fh:
+            rows = [json.loads(line) for line in fh if line.strip()]
+        return cls([(r["prompt"], r["tool"]) for r in rows])
+
+    def predict(self, prompt: str) -> tuple[str | None, float]:
+        if not self.label_counts:
+            return None, 0.0
+        words = self._words(prompt)
+        total = sum(self.label_counts.values())
+        scores = {}
+        for label, n in self.label_counts.items():
+            counts = self.word_counts[label]
+            denom = sum(counts.values()) + len(self.vocab) + 1
+            scores[label] = math.log(n / total) + sum(math.log((counts[w] + 1) / denom) for w in words)
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
+
+
+class FastRouter:
+    """Pattern + SID-vocabulary router with hit-rate and saved-latency accounting."""
+
+    def __init__(self, min_confidence: float = MIN_CONFIDENCE, sids: set | None = None,
+                 classifier: IntentClassifier | None = None):
+        self.min_confidence = min_confidence
+        self.sids = {s.upper() for s in (sids or ())}
+        self.classifier = classifier
+        self._lock = threading.Lock()
+        self.counts = {"queries": 0, "routed": 0, "fallback": 0}
+        self.rules: Counter = Counter()
+        self._llm_turns = 0
+        self._llm_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "FastRouter | None":
+        if not ENABLED:
+            return None
+        sids = set()
+        path = os.environ.get("FAST_ROUTER_SIDS")
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                sids = {line.strip().upper() for line in fh if line.strip() and not line.startswith("#")}
+        examples = os.environ.get("FAST_ROUTER_EXAMPLES")
+        classifier = IntentClassifier.from_file(examples) if examples and os.path.exists(examples) else None
+        return cls(sids=sids, classifier=classifier)
+
+    # -- matching ------------------------------------------------------------
+
+    def find_sids(self, prompt: str) -> list[str]:
+        found = []
+        explicit = {m.group(1).upper() for m in re.finditer(r"\bsids?[:\s]+([A-Za-z][A-Za-z0-9]{2})\b", prompt, re.I)}
+        for token in _SID.findall(prompt):
+            sid = token.upper()
+            if sid in explicit or sid in self.sids or (token.isupper() and sid not in _ACRONYMS):
+                found.append(sid)
+        return list(dict.fromkeys(found))
+
+    @staticmethod
+    def find_filters(prompt: str) -> list[str]:
+        words = {w.lower() for w in _WORD.findall(prompt)}
+        filters = [f"status|{v}" for k, v in _STATUSES.items() if k in words]
+        filters += [f"systemtype|{v}" for k, v in _SYSTEM_TYPES.items() if k in words]
+        if m := _CLUSTER.search(prompt):
+            value = re.sub(r"(?i)core\s*(\d+)", r"Core \1", m.group(1))
+            filters.append(f"cluster|{value}")
+        if m := _LANDSCAPE.search(prompt):
+            filters.append(f"landscape|{m.group(1)}")
+        return list(dict.fromkeys(filters))
+
+    def candidate(self, prompt: str) -> Route | None:
+        """The best rule-based route with its confidence (whatever the threshold), or None."""
+        if _MULTI_INTENT.search(prompt):
+            return None
+        sids = self.find_sids(prompt)
+        known = sum(1 for s in sids if s in self.sids)
+        open_ended = bool(_OPEN_ENDED.search(prompt))
+        filters = self.find_filters(prompt)
+
+        if len(sids) == 1 and not filters:
+            confidence = 0.95 if known else 0.80
+            if not _OVERVIEW.search(prompt):
+                confidence -= 0.15      # a bare SID: probably, but not certainly, an overview
+            route = Route("cockpit_get_view_by_sid", {"sid": sids[0]}, confidence, "single_sid")
+        elif len(sids) > 1 and not filters:
+            confidence = 0.92 if known == len(sids) else 0.80
+            if not _OVERVIEW.search(prompt):
+                confidence -= 0.15
+            route = Route("cockpit_get_views_by_sids", {"sids": sids}, confidence, "multi_sid")
+        elif not sids and filters and _LIST.search(prompt):
+            arguments = {"fields": SEARCH_FIELDS, "filters": filters}
+            if _COUNT.search(prompt):
+                arguments["count_only"] = True
+                if m := _GROUP_BY.search(prompt):
+                    arguments["group_by"] = m.group(1).lower().replace(" ", "")
+            route = Route("search_system_flexi", arguments, 0.86 + 0.03 * min(len(filters) - 1, 2),
+                          "filter_search")
+        else:
+            return None
+
+        if open_ended:
+            route.confidence -= 0.3
+            route.notes.append("open-ended wording")
+        if self.classifier is not None:
+            label, p = self.classifier.predict(prompt)
+            if label == route.tool and known < len(sids):
+                route.notes.append(f"classifier agrees ({p:.2f}), but a SID is unknown")
+            elif label == route.tool:
+                route.confidence = max(route.confidence, min(0.99, (route.confidence + p) / 2 + 0.05))
+                route.notes.append(f"classifier agrees ({p:.2f})")
+            elif p > 0.7:
+                route.confidence -= 0.3
+                route.notes.append(f"classifier says {label} ({p:.2f})")
+        return route
+
+    def route(self, prompt: str, offered: set | None = None) -> Route | None:
+        """A route to take instead of the LLM turn, or None to ask the LLM."""
+        route = self.candidate(prompt)
+        if route is not None and offered is not None and route.tool not in offered:
+            route = None
+        with self._lock:
+            self.counts["queries"] += 1
+            if route is None or route.confidence < self.min_confidence:
+                self.counts["fallback"] += 1
+                return None
+            self.counts["routed"] += 1
+            self.rules[route.rule] += 1
+        return route
+
+    # -- feedback ------------------------------------------------------------
+
+    def observe_llm_turn(self, seconds: float):
+        """Latency of a tool-selection LLM turn; the average is what a routed query saves."""
+        with self._lock:
+            self._llm_turns += 1
+            self._llm_seconds += seconds
+
+    def learn(self, tool: str, arguments: dict, result):
+        """Add the SIDs of a successful cockpit call to the vocabulary."""
+        if not tool.startswith("cockpit_get_view") or not isinstance(result, dict) or result.get("error"):
+            return
+        sids = [arguments.get("sid")] if "sid" in arguments else arguments.get("sids", [])
+        failed = set(result.get("failed", []))
+        with self._lock:
+            self.sids.update(s.strip().upper() for s in sids if s and s.strip().upper() not in failed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            avg = self._llm_seconds / self._llm_turns if self._llm_turns else None
+            queries = self.counts["queries"]
+            return {**self.counts, "hit_rate": round(self.counts["routed"] / queries, 3) if queries else 0.0,
+                    "rules": dict(self.rules), "known_sids": len(self.sids),
+                    "avg_llm_turn_ms": round(avg * 1000, 1) if avg is not None else None,
+                    "saved_ms_estimate": round(self.counts["routed"] * avg * 1000, 1) if avg is not None else None}
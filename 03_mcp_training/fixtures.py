@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# fixtures.py
+"""
+Record/replay of DLM/SLIM backend traffic for offline load tests.
+
+    record   every Flexi / Cockpit response the backend clients receive is
+             captured (request, status, validators, zlib-compressed body,
+             latency) into a SQLite fixture archive by a background writer
+             thread; the request path only enqueues
+    replay   the backend clients answer from the archive instead of the
+             network, after a delay derived from the recorded latency, so
+             the server can be benchmarked and profiled repeatably offline
+
+Fixtures are keyed by endpoint (flexi, cockpit) and query parameters, not
+by host or base path, so a recording made against production replays under
+any FLEXI_BASE / COCKPIT_BASE. Several recordings of the same request
+replay round-robin. 304 Not Modified answers to revalidations carry no
+body and are not recorded; replay synthesizes them from the recorded ETag.
+This is separate from DEBUG_COCKPIT_SAVE (server.py), which still dumps
+single raw Cockpit payloads to cockpit_debug_*.json files.
+
+Configuration (env vars):
+    DLM_FIXTURES_MODE         off | record | replay (default off)
+    DLM_FIXTURES_PATH         archive file (default dlm_fixtures.sqlite)
+    DLM_REPLAY_LATENCY        "recorded" (default) or a fixed number of seconds
+    DLM_REPLAY_LATENCY_SCALE  multiplier applied to the replayed latency (default 1.0)
+    DLM_REPLAY_JITTER         random +/- fraction added to it (default 0.1)
+
+    python fixtures.py [archive]      # what an archive contains
+"""
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from urllib.parse import urlencode, urlsplit
+
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import metrics
+
+MODE = os.environ.get("DLM_FIXTURES_MODE", "off")
+PATH = os.environ.get("DLM_FIXTURES_PATH", "dlm_fixtures.sqlite")
+REPLAY_LATENCY = os.environ.get("DLM_REPLAY_LATENCY", "recorded")
+REPLAY_LATENCY_SCALE = float(os.environ.get("DLM_REPLAY_LATENCY_SCALE", "1.0"))
+REPLAY_JITTER = float(os.environ.get("DLM_REPLAY_JITTER", "0.1"))
+
+# only these response headers are kept: what the server reads, nothing sensitive
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+FIXTURE_EVENTS = metrics.REGISTRY.counter(
+    "dlm_fixture_events_total", "Backend fixtures recorded, dropped (writer queue full), replayed or missed.")
+
+
+def fixture_key(url: str, params: dict | None) -> str:
+    endpoint = metrics.backend_endpoint(url)
+    if endpoint == "other":
+        endpoint = urlsplit(url).path
+    query = urlencode(sorted((params or {}).items()))
+    return hashlib.sha1(f"{endpoint}?{query}".encode("utf-8")).hexdigest()
+
+
+class FixtureStore:
+    """SQLite fixture archive: one row per recorded response, indexed by request key."""
+
+    def __init__(self, path: str, queue_size: int = 1000):
+        self.path = path
+        self._local = threading.local()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._writer: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._round_robin: dict = {}
+        self.counts = {"recorded": 0, "dropped": 0, "replayed": 0, "missed": 0}
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS fixtures (
+            id INTEGER PRIMARY KEY, key TEXT NOT NULL, path TEXT, params TEXT,
+            status INTEGER, headers TEXT, body BLOB, size INTEGER,
+            elapsed REAL, recorded_at REAL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_fixtures_key ON fixtures (key, id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _count(self, event: str):
+        with self._lock:
+            self.counts[event] += 1
+        FIXTURE_EVENTS.inc(event=event)
+
+    # -- recording ---------------------------------------------------------
+
+    def record(self, url: str, params: dict | None, status: int, headers, body: bytes, elapsed: float):
+        """Queue one response for the writer thread; never blocks (drops when the queue is full)."""
+        if status == 304:
+            # no body: replayed to an unconditional request it would look like an empty payload
+            return
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="fixture-writer", daemon=True)
+                    self._writer.start()
+        kept = {h: headers.get(h) for h in _KEPT_HEADERS if headers.get(h) is not None}
+        try:
+            self._queue.put_nowait((url, params, status, kept, body, elapsed, time.time()))
+        except queue.Full:
+            self._count("dropped")
+
+    def _write_loop(self):
+        conn = self._conn()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                conn.executemany(
+                    "INSERT INTO fixtures (key, path, params, status, headers, body, size, elapsed, recorded_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(fixture_key(url, params), urlsplit(url).path, json.dumps(params or {}, sort_keys=True),
+                      status, json.dumps(headers), zlib.compress(body, 6), len(body), elapsed, at)
+                     for url, params, status, headers, body, elapsed, at in batch])
+                conn.commit()
+                for _ in batch:
+                    self._count("recorded")
+            except sqlite3.Error:
+                for _ in batch:
+                    self._count("dropped")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Wait until everything queued so far is written."""
+        if self._writer is not None:
+            self._queue.join()
+
+    # -- replay ------------------------------------------------------------
+
+    def lookup(self, url: str, params: dict | None) -> dict | None:
+        """The next recording for this request (round-robin, 304s from older archives skipped), or None."""
+        key = fixture_key(url, params)
+        conn = self._conn()
+        # choose the recording by id first, then read (and decompress) only its body
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM fixtures WHERE key = ? AND status != 304 ORDER BY id", [key])]
+        if not ids:
+            self._count("missed")
+            return None
+        with self._lock:
+            n = self._round_robin.get(key, 0)
+            self._round_robin[key] = n + 1
+        row = conn.execute("SELECT status, headers, body, elapsed FROM fixtures WHERE id = ?",
+                           [ids[n % len(ids)]]).fetchone()
+        self._count("replayed")
+        return {"status": row["status"], "headers": json.loads(row["headers"]),
+                "body": zlib.decompress(row["body"]), "elapsed": row["elapsed"]}
+
+    def bodies(self, path_contains: str = "UI5CockpitDataProvider"):
+        """(params, body) of every recorded 200 response whose path contains `path_contains`."""
+        rows = self._conn().execute(
+            "SELECT params, body FROM fixtures WHERE status = 200 AND path LIKE ? ORDER BY id",
+            [f"%{path_contains}%"])
+        for row in rows:
+            yield json.loads(row["params"]), zlib.decompress(row["body"])
+
+    def summary(self) -> list[dict]:
+        rows = self._conn().execute(
+            "SELECT path, COUNT(*) AS responses, COUNT(DISTINCT key) AS requests, SUM(size) AS bytes,"
+            " SUM(LENGTH(body)) AS stored, AVG(elapsed) AS avg_elapsed FROM fixtures GROUP BY path")
+        return [dict(r) for r in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"path": self.path, "mode": MODE, "queued": self._queue.qsize(), **self.counts}
+
+
+_store: FixtureStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> FixtureStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FixtureStore(PATH)
+            atexit.register(_store.flush)
+        return _store
+
+
+def record(url: str, params: dict | None, resp, elapsed: float):
+    """Capture a requests or httpx response (record mode)."""
+    get_store().record(url, params, resp.status_code, resp.headers, resp.content, elapsed)
+
+
+def _replay_fixture(url: str, params: dict | None, headers: dict | None) -> tuple[dict, float]:
+    """The fixture to answer with (404 body on a miss, 304 when validators match) and the delay."""
+    fixture = get_store().lookup(url, params)
+    if fixture is None:
+        body = json.dumps({"error": f"no fixture recorded for {urlsplit(url).path} {params}"}).encode("utf-8")
+        return {"status": 404, "headers": {"Content-Type": "application/json"}, "body": body}, 0.0
+
+    if REPLAY_LATENCY == "recorded":
+        delay = fixture["elapsed"] or 0.0
+    else:
+        delay = float(REPLAY_LATENCY)
+    delay *= REPLAY_LATENCY_SCALE * (1 + random.uniform(-REPLAY_JITTER, REPLAY_JITTER))
+
+    etag = fixture["headers"].get("ETag")
+    if headers and etag and headers.get("If-None-Match") == etag:
+        fixture = {**fixture, "status": 304, "body": b""}
+    return fixture, max(delay, 0.0)
+
+
+def replay(url: str, params: dict | None, headers: dict | None = None) -> requests.Response:
+    """Blocking replay for BackendClient: sleeps the replay latency, returns a requests.Response."""
+    fixture, delay = _replay_fixture(url, params, headers)
+    time.sleep(delay)
+    resp = requests.Response()
+    resp.status_code = fixture["status"]
+    resp.headers = CaseInsensitiveDict(fixture["headers"])
+    resp._content = fixture["body"]
+    resp.encoding = "utf-8"
+    resp.url = requests.Request("GET", url, params=params).prepare().url
+    return resp
+
+
+async def replay_async(url: str, params: dict | None, headers: dict | None = None) -> httpx.Response:
+    """Async replay for AsyncBackendClient: awaits the replay latency, returns an httpx.Response."""
+    fixture, delay = _replay_fixture(url, params, headers)
+    await asyncio.sleep(delay)
+    return httpx.Response(fixture["status"], headers=fixture["headers"], content=fixture["body"],
+                          request=httpx.Request("GET", url, params=params))
+
+
+def main():
+    store = FixtureStore(sys.argv[1] if len(sys.argv) > 1 else PATH)
+    for row in store.summary():
+        print(f"{row['path']}: {row['responses']} responses for {row['requests']} distinct requests, "
+              f"{row['bytes'] / 1e6:.1f} MB ({row['stored'] / 1e6:.1f} MB stored), "
+              f"avg latency {row['avg_elapsed'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
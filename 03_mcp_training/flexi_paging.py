@@ -0,0 +1,133 @@
+# flexi_paging.py
+"""
+Server-side paging and size budgets for Flexi search results.
+
+The Flexi report has no paging of its own, so a broad query returns every
+row. page_entries() cuts a page out of the full list under a row and byte
+budget and returns an opaque cursor for the next page; aggregate() returns
+only counts. Full result sets are kept briefly so follow-up pages do not
+re-query DLM.
+"""
+import base64
+import hashlib
+import json
+import os
+from collections import Counter
+
+from cockpit_cache import TTLCache
+import json_codec
+
+DEFAULT_MAX_ROWS = int(os.environ.get("FLEXI_MAX_ROWS", "200"))
+DEFAULT_MAX_BYTES = int(os.environ.get("FLEXI_MAX_BYTES", str(64 * 1024)))
+
+# query key -> full entry list, for cursor follow-ups
+_result_sets = TTLCache(
+    maxsize=int(os.environ.get("FLEXI_RESULT_SETS_MAX", "32")),
+    ttl=float(os.environ.get("FLEXI_RESULT_SETS_TTL", "120")),
+)
+
+
+def query_key(*parts) -> str:
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def remember(key: str, entries: list):
+    _result_sets.set(key, entries)
+
+
+def recall(key: str) -> list | None:
+    found, _, entries = _result_sets.get(key)
+    return entries if found else None
+
+
+def encode_cursor(key: str, offset: int, limit: int | None) -> str:
+    raw = json.dumps({"k": key, "o": offset, "l": limit}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def check_limit(limit: int | None, max_rows: int | None = None) -> int | None:
+    """`limit` if it is None or 1..max_rows (max_rows 0 = no upper bound), else ValueError."""
+    max_rows = DEFAULT_MAX_ROWS if max_rows is None else max_rows
+    if limit is None:
+        return None
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1 or (max_rows and limit > max_rows):
+        bound = f"1..{max_rows}" if max_rows else ">= 1"
+        raise ValueError(f"limit must be an integer in {bound}, got {limit!r}")
+    return limit
+
+
+def decode_cursor(cursor: str, key: str, max_rows: int | None = None) -> tuple[int, int | None]:
+    """Return (offset, limit) from a cursor; it must belong to the same query and carry a valid limit."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        offset, limit = int(data["o"]), data.get("l")
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if data.get("k") != key:
+        raise ValueError("Cursor belongs to a different query (fields/filters changed).")
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: negative offset {offset}")
+    try:
+        return offset, check_limit(limit, max_rows)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def page_entries(entries: list, key: str, offset: int = 0, limit: int | None = None,
+                 max_rows: int | None = None, max_bytes: int | None = None) -> dict:
+    """
+    Cut one page out of `entries`. The page ends at `limit`, at `max_rows`
+    or before the row that would push the compact JSON size past
+    `max_bytes` (at least one row is always returned). A `limit` outside
+    1..max_rows raises ValueError: an empty page with a cursor to the same
+    offset would send a client following next_cursor round in circles.
+    """
+    check_limit(limit, max_rows)
+    total = len(entries)
+    offset = max(offset, 0)
+    max_rows = DEFAULT_MAX_ROWS if max_rows is None else max_rows
+    max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+
+    rows_cap, cut_by = total - offset, None
+    if limit is not None and limit < rows_cap:
+        rows_cap, cut_by = limit, "limit"
+    if max_rows and max_rows < rows_cap:
+        rows_cap, cut_by = max_rows, "max_rows"
+
+    page, size = [], 2   # "[]"
+    for row in entries[offset:offset + max(rows_cap, 0)]:
+        row_size = len(json_codec.dumps_bytes(row)) + 1
+        if max_bytes and page and size + row_size > max_bytes:
+            cut_by = "max_bytes"
+            break
+        page.append(row)
+        size += row_size
+
+    next_offset = offset + len(page)
+    has_more = next_offset < total
+    return {
+        "entries": page,
+        "total": total,
+        "offset": offset,
+        "returned": len(page),
+        "truncated": has_more,
+        "truncated_by": cut_by if has_more else None,
+        "next_cursor": encode_cursor(key, next_offset, limit) if has_more else None,
+    }
+
+
+def aggregate(entries: list, group_by: str | None = None) -> dict:
+    """Only counts: the total and, with `group_by`, rows per value of that field (case-insensitive key)."""
+    out = {"total": len(entries)}
+    if group_by:
+        wanted = group_by.lower()
+        counts = Counter()
+        for row in entries:
+            value = None
+            if isinstance(row, dict):
+                value = next((v for k, v in row.items() if k.lower() == wanted), None)
+            counts[str(value)] += 1
+        out["group_by"] = group_by
+        out["counts"] = dict(counts.most_common())
+    return out
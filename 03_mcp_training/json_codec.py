@@ -0,0 +1,53 @@
+# json_codec.py
+"""
+One JSON codec for the hot paths: backend responses, MCP tool results and
+tool results fed back to the LLM.
+
+Uses orjson when it is installed and the stdlib json module otherwise. The
+output is always compact (no indentation, no spaces after separators) and
+keeps non-ASCII characters as they are, so it is smaller on the wire and in
+the LLM context than `json.dumps(..., indent=2)`.
+
+    JSON_CODEC=stdlib   force the stdlib codec (e.g. to compare)
+"""
+import json
+import os
+
+try:
+    import orjson
+except ImportError:   # optional dependency
+    orjson = None
+
+if os.environ.get("JSON_CODEC", "auto") == "stdlib":
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "stdlib"
+
+_stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def loads(data: str | bytes | bytearray | memoryview):
+    """Parse a JSON document (str or UTF-8 bytes)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> str:
+    """Compact JSON text; objects the codec cannot encode natively fall back to str()."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            pass   # e.g. integers beyond 64 bit: the stdlib handles them
+    return _stdlib_encoder.encode(obj)
+
+
+def dumps_bytes(obj) -> bytes:
+    """Compact JSON as UTF-8 bytes (what goes on the wire)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return _stdlib_encoder.encode(obj).encode("utf-8")
@@ -0,0 +1,523 @@
+# landscape_snapshot.py
+"""
+Local SQLite snapshot of the Flexi landscape report.
+
+The snapshot bulk-loads one Flexi query (SNAPSHOT_FIELDS) into a table with
+an index per column, so the common searches (sid, status, systemtype,
+landscape, cluster) and SID resolution are answered locally in milliseconds.
+A background refresher keeps it current.
+
+Full reloads are atomic: rows go into a side table which then replaces the
+live one with DROP + RENAME inside a single transaction (WAL mode), so
+readers see either the old or the new table, never a half-loaded one.
+
+sync() refreshes incrementally instead, so the snapshot can be refreshed
+often without pulling the whole report each time:
+
+    delta       with a change field (e.g. changedOn), only rows changed at or
+                after the stored high-water mark are fetched and upserted (the
+                bound is inclusive, so rows sharing the high-water timestamp
+                that arrived after the last sync are not missed; re-fetched
+                unchanged rows are skipped by the upsert); deletes are found
+                by comparing the key column alone every few cycles
+    partition   without one, a few partitions (distinct values of e.g.
+                landscape) are fetched per cycle and hashed; only partitions
+                whose hash changed are rewritten. Each round starts by listing
+                the partitions from the backend (key and partition field
+                only): new partitions are picked up, vanished ones dropped,
+                and rows without a partition value are re-fetched by key.
+                Freshness is tracked per partition: the snapshot counts as
+                loaded when its least recently checked partition was
+    full        neither configured: a full reload
+
+Every cycle logs and exports rows fetched/changed/deleted and its duration.
+
+Configuration (env vars):
+    LANDSCAPE_SNAPSHOT_DB       path of the SQLite file; the snapshot is off when unset
+    LANDSCAPE_SNAPSHOT_FIELDS   Flexi fields to load (default id,sid,status,systemtype,landscape,cluster)
+    LANDSCAPE_SNAPSHOT_MAX_AGE  seconds a snapshot is trusted (default 900)
+    LANDSCAPE_SNAPSHOT_REFRESH  seconds between background syncs (default 600)
+    LANDSCAPE_SNAPSHOT_KEY      unique row key among the fields (default id)
+    LANDSCAPE_SNAPSHOT_CHANGE_FIELD      enables delta sync on this field
+    LANDSCAPE_SNAPSHOT_DELTA_FILTER      Flexi filter for "changed since" (default "{field}|>={since}")
+    LANDSCAPE_SNAPSHOT_DELETE_CHECK_EVERY  delta cycles between key-only delete checks (default 6)
+    LANDSCAPE_SNAPSHOT_PARTITION_FIELD   enables partition-hash sync on this field
+    LANDSCAPE_SNAPSHOT_PARTITIONS_PER_SYNC  partitions checked per cycle (default 4)
+    LANDSCAPE_SNAPSHOT_FULL_EVERY        force a full reload every N syncs (default 0 = never)
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import cockpit_utils
+import json_codec
+import metrics
+
+DEFAULT_FIELDS = ["id", "sid", "status", "systemtype", "landscape", "cluster"]
+_COLUMN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+logger = logging.getLogger("landscape_snapshot")
+
+SYNC_SECONDS = metrics.REGISTRY.histogram(
+    "landscape_snapshot_sync_seconds", "Duration of one landscape snapshot sync cycle.")
+SYNC_ROWS = metrics.REGISTRY.counter(
+    "landscape_snapshot_sync_rows_total", "Rows fetched, changed and deleted by landscape snapshot syncs.")
+
+
+def _row_value(row: dict, field: str):
+    """Flexi is not consistent about key casing ('sid' vs 'SID')."""
+    if field in row:
+        return row[field]
+    wanted = field.lower()
+    return next((v for k, v in row.items() if k.lower() == wanted), None)
+
+
+def _row_json(row: dict) -> str:
+    # sorted keys so an unchanged row always serializes to the same text
+    return json.dumps(row, ensure_ascii=False, sort_keys=True)
+
+
+def _partition_digest(rows: list[dict]) -> str:
+    return hashlib.sha1("\n".join(sorted(_row_json(r) for r in rows)).encode("utf-8")).hexdigest()
+
+
+class LandscapeSnapshot:
+    def __init__(self, path: str, fields: list[str] | None = None, max_age: float = 900,
+                 key_field: str = "id", change_field: str | None = None,
+                 delta_filter: str = "{field}|>={since}", delete_check_every: int = 6,
+                 partition_field: str | None = None, partitions_per_sync: int = 4,
+                 full_every: int = 0):
+        self.path = path
+        self.fields = [f.lower() for f in (fields or DEFAULT_FIELDS)]
+        self.key_field = key_field.lower()
+        self.change_field = change_field.lower() if change_field else None
+        self.partition_field = partition_field.lower() if partition_field else None
+        for extra in (self.change_field, self.partition_field):
+            if extra and extra not in self.fields:
+                self.fields.append(extra)
+        bad = [f for f in self.fields if not _COLUMN.match(f)]
+        if bad:
+            raise ValueError(f"Snapshot fields must be plain column names: {bad}")
+        if self.key_field not in self.fields:
+            raise ValueError(f"Snapshot key field {self.key_field!r} must be one of the fields")
+        self.max_age = max_age
+        self.delta_filter = delta_filter
+        self.delete_check_every = delete_check_every
+        self.partitions_per_sync = max(partitions_per_sync, 1)
+        self.full_every = full_every
+        self._local = threading.local()
+        self._refresh_lock = threading.RLock()
+        self.last_error: str | None = None
+        self.last_refresh_seconds: float | None = None
+        self.last_sync: dict | None = None
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @property
+    def mode(self) -> str:
+        if self.change_field:
+            return "delta"
+        if self.partition_field:
+            return "partition"
+        return "full"
+
+    def _row_params(self, row: dict) -> list:
+        values = [_row_value(row, f) for f in self.fields]
+        return [None if v is None else str(v) for v in values] + [_row_json(row)]
+
+    def _set_meta(self, conn: sqlite3.Connection, **values):
+        conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                         [(k, str(v)) for k, v in values.items()])
+
+    # -- loading -----------------------------------------------------------
+
+    def refresh(self, timeout: float = 120) -> int:
+        """Reload the whole report from Flexi and swap it in atomically. Returns the row count."""
+        with self._refresh_lock:
+            start = time.time()
+            try:
+                rows = cockpit_utils.call_flexi(",".join(self.fields), timeout=timeout)
+                count = self.load(rows, source_query=",".join(self.fields))
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            self.last_error = None
+            self.last_refresh_seconds = round(time.time() - start, 3)
+            logger.info("landscape snapshot reloaded: %d rows in %.1fs", count, self.last_refresh_seconds)
+            return count
+
+    def load(self, rows: list, source_query: str = "") -> int:
+        conn = self._conn()
+        gen = int(time.time() * 1000)
+        cols = ", ".join(f"{f} TEXT COLLATE NOCASE" for f in self.fields)
+        conn.execute("DROP TABLE IF EXISTS systems_new")
+        conn.execute(f"CREATE TABLE systems_new ({cols}, data TEXT NOT NULL)")
+        placeholders = ", ".join("?" for _ in range(len(self.fields) + 1))
+        rows = [r for r in rows if isinstance(r, dict)]
+        conn.execute("BEGIN")
+        try:
+            # unique key first: duplicate keys in the report collapse to the last row
+            conn.execute(f"CREATE UNIQUE INDEX ux_{self.key_field}_{gen} ON systems_new ({self.key_field})")
+            conn.executemany(f"INSERT OR REPLACE INTO systems_new VALUES ({placeholders})",
+                             (self._row_params(r) for r in rows))
+            for f in self.fields:
+                if f != self.key_field:
+                    conn.execute(f"CREATE INDEX ix_{f}_{gen} ON systems_new ({f})")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        # the swap: readers see the old table until this commits
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DROP TABLE IF EXISTS systems")
+            conn.execute("ALTER TABLE systems_new RENAME TO systems")
+            count = conn.execute("SELECT COUNT(*) FROM systems").fetchone()[0]
+            now = time.time()
+            hashes = self._partition_hashes(rows)
+            self._set_meta(conn, loaded_at=now, row_count=count, fields=",".join(self.fields),
+                           source_query=source_query, sync_count=0, partition_cursor=0,
+                           high_water=self._high_water(conn) or "",
+                           partition_hashes=json.dumps(hashes),
+                           partition_checked_at=json.dumps({v: now for v in hashes}),
+                           unpartitioned_checked_at=now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def _high_water(self, conn: sqlite3.Connection) -> str | None:
+        if not self.change_field:
+            return None
+        return conn.execute(f"SELECT MAX({self.change_field}) FROM systems").fetchone()[0]
+
+    def _partition_hashes(self, rows: list[dict]) -> dict:
+        if not self.partition_field:
+            return {}
+        groups: dict = {}
+        for r in rows:
+            value = _row_value(r, self.partition_field)
+            if value is not None:
+                groups.setdefault(str(value), []).append(r)
+        return {value: _partition_digest(group) for value, group in groups.items()}
+
+    # -- incremental sync --------------------------------------------------
+
+    def sync(self, timeout: float = 120) -> dict:
+        """
+        One incremental refresh cycle (delta, partition or full, see module
+        docstring). Returns what it did: rows fetched/changed/deleted and
+        the duration.
+        """
+        with self._refresh_lock:
+            start = time.time()
+            meta = self._meta()
+            cycle = int(meta.get("sync_count", 0)) + 1
+            mode = self.mode
+            # full reload when there is nothing to build on: no data yet, a table
+            # loaded with other fields (or before sync existed), or the periodic full
+            if ("sync_count" not in meta or meta.get("fields") != ",".join(self.fields)
+                    or (self.full_every and cycle % self.full_every == 0)):
+                mode = "full"
+            try:
+                if mode == "full":
+                    count = self.refresh(timeout=timeout)
+                    result = {"rows_fetched": count, "upserted": count, "deleted": 0}
+                elif mode == "delta":
+                    result = self._sync_delta(meta, cycle, start, timeout)
+                else:
+                    result = self._sync_partitions(meta, timeout)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            self.last_error = None
+            if mode != "full":
+                conn = self._conn()
+                count = conn.execute("SELECT COUNT(*) FROM systems").fetchone()[0]
+                self._set_meta(conn, sync_count=cycle, row_count=count)
+
+            seconds = time.time() - start
+            result = {"mode": mode, **result, "rows_changed": result["upserted"] + result["deleted"],
+                      "seconds": round(seconds, 3), "at": round(start, 3)}
+            self.last_sync = result
+            SYNC_SECONDS.observe(seconds, mode=mode)
+            for kind in ("rows_fetched", "upserted", "deleted"):
+                SYNC_ROWS.inc(result[kind], mode=mode, kind=kind)
+            logger.info("landscape snapshot %s sync: %d fetched, %d upserted, %d deleted in %.2fs",
+                        mode, result["rows_fetched"], result["upserted"], result["deleted"], seconds)
+            return result
+
+    def _apply(self, upserts: list[dict], deletes) -> tuple[int, int]:
+        """Upsert rows by key (unchanged rows are skipped) and delete keys, in one transaction."""
+        conn = self._conn()
+        placeholders = ", ".join("?" for _ in range(len(self.fields) + 1))
+        key_index = self.fields.index(self.key_field)
+        changed = deleted = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in upserts:
+                params = self._row_params(row)
+                if params[key_index] is None:
+                    continue
+                old = conn.execute(f"SELECT data FROM systems WHERE {self.key_field} = ?",
+                                   [params[key_index]]).fetchone()
+                if old is not None and old["data"] == params[-1]:
+                    continue
+                conn.execute(f"INSERT OR REPLACE INTO systems VALUES ({placeholders})", params)
+                changed += 1
+            for key in deletes:
+                deleted += conn.execute(f"DELETE FROM systems WHERE {self.key_field} = ?", [key]).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return changed, deleted
+
+    def _fetch(self, filters: list[str], timeout: float, fields: list[str] | None = None) -> list[dict]:
+        query = ",".join((fields or self.fields) + filters)
+        return [r for r in cockpit_utils.call_flexi(query, timeout=timeout) if isinstance(r, dict)]
+
+    def _stale_keys(self, remote_rows: list[dict], where: str = "", args=()) -> set:
+        """Local keys (optionally within `where`) that the remote rows no longer contain."""
+        remote = {str(v) for v in (_row_value(r, self.key_field) for r in remote_rows) if v is not None}
+        sql = f"SELECT {self.key_field} FROM systems"
+        if where:
+            sql += " WHERE " + where
+        local = {r[0] for r in self._conn().execute(sql, args) if r[0] is not None}
+        return local - remote
+
+    def _sync_delta(self, meta: dict, cycle: int, start: float, timeout: float) -> dict:
+        since = meta.get("high_water")
+        if not since:
+            # no change timestamps in the data yet: nothing to anchor a delta on
+            count = self.refresh(timeout=timeout)
+            return {"rows_fetched": count, "upserted": count, "deleted": 0}
+        rows = self._fetch([self.delta_filter.format(field=self.change_field, since=since)], timeout)
+        fetched = len(rows)
+
+        deletes: set = set()
+        if self.delete_check_every and cycle % self.delete_check_every == 0:
+            keys = self._fetch([], timeout, fields=[self.key_field])
+            fetched += len(keys)
+            if keys:   # an empty listing is more likely a backend hiccup than an empty landscape
+                deletes = self._stale_keys(keys)
+
+        upserted, deleted = self._apply(rows, deletes)
+        conn = self._conn()
+        self._set_meta(conn, loaded_at=start, high_water=self._high_water(conn) or since)
+        return {"rows_fetched": fetched, "upserted": upserted, "deleted": deleted}
+
+    def _list_partitions(self, timeout: float) -> tuple[list[str], list, int]:
+        """
+        The partition values the backend has now and the keys of its rows
+        without one, from a query on the key and partition field only (plus
+        the rows fetched). An empty listing is taken for a backend hiccup:
+        the local partitions are used and no NULL rows are reported.
+        """
+        pf = self.partition_field
+        listing = self._fetch([], timeout, fields=[self.key_field, pf])
+        if not listing:
+            logger.warning("landscape snapshot: empty partition listing, checking the local partitions")
+            values = [str(r[0]) for r in self._conn().execute(
+                f"SELECT DISTINCT {pf} FROM systems WHERE {pf} IS NOT NULL AND {pf} != '' ORDER BY {pf}")]
+            return values, [], 0
+        values, null_keys = set(), []
+        for r in listing:
+            value = _row_value(r, pf)
+            if value is None or value == "":
+                key = _row_value(r, self.key_field)
+                if key is not None:
+                    null_keys.append(key)
+            else:
+                values.add(str(value))
+        return sorted(values), null_keys, len(listing)
+
+    def _sync_unpartitioned(self, null_keys: list, timeout: float) -> tuple[int, int, int]:
+        """Re-fetch the rows without a partition value by key; drop local ones the backend no longer has."""
+        rows = []
+        for i in range(0, len(null_keys), 50):
+            rows += self._fetch([f"{self.key_field}|{k}" for k in null_keys[i:i + 50]], timeout)
+        pf = self.partition_field
+        upserted, deleted = self._apply(rows, self._stale_keys(rows, f"{pf} IS NULL OR {pf} = ''"))
+        return len(rows), upserted, deleted
+
+    def _sync_partitions(self, meta: dict, timeout: float) -> dict:
+        pf = self.partition_field
+        conn = self._conn()
+        fetched = upserted = deleted = changed_partitions = 0
+        cursor = int(meta.get("partition_cursor", 0))
+        values = json.loads(meta.get("partition_values") or "null")
+        if cursor == 0 or values is None or cursor >= len(values):
+            # a new round: partitions as the backend lists them now, so new ones are
+            # fetched and vanished ones dropped; rows without a partition are synced by key
+            cursor = 0
+            values, null_keys, fetched = self._list_partitions(timeout)
+            if fetched:
+                local = {str(r[0]) for r in conn.execute(
+                    f"SELECT DISTINCT {pf} FROM systems WHERE {pf} IS NOT NULL AND {pf} != ''")}
+                for value in local - set(values):
+                    deleted += self._apply([], self._stale_keys([], f"{pf} = ?", [value]))[1]
+                f, u, d = self._sync_unpartitioned(null_keys, timeout)
+                fetched, upserted, deleted = fetched + f, upserted + u, deleted + d
+                meta["unpartitioned_checked_at"] = str(time.time())
+            self._set_meta(conn, partition_values=json.dumps(values),
+                           unpartitioned_checked_at=meta.get("unpartitioned_checked_at") or time.time())
+        hashes = {v: h for v, h in json.loads(meta.get("partition_hashes") or "{}").items() if v in values}
+        # when each partition was last checked; one not checked yet (new this round)
+        # is as fresh as the snapshot was before it appeared
+        previous = float(meta.get("loaded_at") or 0)
+        checked = json.loads(meta.get("partition_checked_at") or "{}")
+        checked = {v: float(checked.get(v, previous)) for v in values}
+
+        batch = values[cursor:cursor + self.partitions_per_sync]
+        for value in batch:
+            checked_at = time.time()
+            rows = self._fetch([f"{pf}|{value}"], timeout)
+            fetched += len(rows)
+            checked[value] = checked_at
+            digest = _partition_digest(rows)
+            if hashes.get(value) == digest:
+                continue
+            changed_partitions += 1
+            u, d = self._apply(rows, self._stale_keys(rows, f"{pf} = ?", [value]))
+            upserted += u
+            deleted += d
+            hashes[value] = digest
+
+        cursor += len(batch)
+        # the snapshot is as fresh as its least recently checked part
+        loaded_at = min([*checked.values(), float(meta.get("unpartitioned_checked_at") or previous)])
+        self._set_meta(conn, partition_hashes=json.dumps(hashes), partition_checked_at=json.dumps(checked),
+                       partition_cursor=0 if cursor >= len(values) else cursor, loaded_at=loaded_at)
+        return {"rows_fetched": fetched, "upserted": upserted, "deleted": deleted,
+                "partitions_checked": len(batch), "partitions_changed": changed_partitions,
+                "partitions_total": len(values)}
+
+    # -- reading -----------------------------------------------------------
+
+    def _meta(self) -> dict:
+        return {r["key"]: r["value"] for r in self._conn().execute("SELECT key, value FROM meta")}
+
+    def age(self) -> float | None:
+        loaded_at = self._meta().get("loaded_at")
+        return time.time() - float(loaded_at) if loaded_at else None
+
+    def is_fresh(self, max_age: float | None = None) -> bool:
+        age = self.age()
+        return age is not None and age <= (self.max_age if max_age is None else max_age)
+
+    def _query(self, where: list[str], args: list) -> list[dict]:
+        sql = "SELECT data FROM systems"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return [json_codec.loads(r["data"]) for r in self._conn().execute(sql, args)]
+
+    def lookup_sid(self, sid: str) -> list[dict] | None:
+        """All rows for a SID, or None when the snapshot is stale/empty (caller goes live)."""
+        if "sid" not in self.fields or not self.is_fresh():
+            return None
+        return self._query(["sid = ?"], [sid])
+
+    def search(self, fields: list[str], filters: list[str] | None,
+               max_age: float | None = None) -> list[dict] | None:
+        """
+        Answer a Flexi-style query ('field|value' filters, OR within a field,
+        AND across fields) from the snapshot. Returns None when it cannot:
+        snapshot older than `max_age` (default: the configured max_age),
+        fields/filters outside the snapshot columns, aliases, dot notation
+        or wildcards.
+        """
+        if not self.is_fresh(max_age):
+            return None
+        wanted = [f.strip() for f in fields]
+        if any(f.lower() not in self.fields for f in wanted):
+            return None
+
+        by_field: dict = {}
+        for flt in filters or []:
+            field, sep, value = flt.partition("|")
+            field = field.strip().lower()
+            if not sep or field not in self.fields or any(c in value for c in "*%?"):
+                return None
+            by_field.setdefault(field, []).append(value.strip())
+
+        where, args = [], []
+        for field, values in by_field.items():
+            where.append(f"{field} IN ({', '.join('?' for _ in values)})")
+            args.extend(values)
+        rows = self._query(where, args)
+        return [{f: _row_value(r, f) for f in wanted} for r in rows]
+
+    def status(self) -> dict:
+        try:
+            meta = self._meta()
+        except sqlite3.Error as e:
+            return {"path": self.path, "error": str(e)}
+        age = self.age()
+        return {
+            "path": self.path,
+            "fields": self.fields,
+            "sync_mode": self.mode,
+            "rows": int(meta.get("row_count", 0)),
+            "age_seconds": round(age, 1) if age is not None else None,
+            "fresh": self.is_fresh(),
+            "max_age": self.max_age,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "last_sync": self.last_sync,
+            "last_error": self.last_error,
+        }
+
+    # -- scheduling --------------------------------------------------------
+
+    def start_refresher(self, interval: float) -> threading.Thread:
+        """Sync now and then every `interval` seconds in a daemon thread."""
+        def loop():
+            while True:
+                try:
+                    self.sync()
+                except Exception:
+                    logger.exception("landscape snapshot sync failed")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name="landscape-snapshot", daemon=True)
+        thread.start()
+        return thread
+
+
+def from_env() -> LandscapeSnapshot | None:
+    """Create (and start refreshing) the snapshot configured by LANDSCAPE_SNAPSHOT_* env vars."""
+    path = os.environ.get("LANDSCAPE_SNAPSHOT_DB")
+    if not path:
+        return None
+    fields = os.environ.get("LANDSCAPE_SNAPSHOT_FIELDS")
+    snap = LandscapeSnapshot(
+        path,
+        fields=fields.split(",") if fields else None,
+        max_age=float(os.environ.get("LANDSCAPE_SNAPSHOT_MAX_AGE", "900")),
+        key_field=os.environ.get("LANDSCAPE_SNAPSHOT_KEY", "id"),
+        change_field=os.environ.get("LANDSCAPE_SNAPSHOT_CHANGE_FIELD") or None,
+        delta_filter=os.environ.get("LANDSCAPE_SNAPSHOT_DELTA_FILTER", "{field}|>={since}"),
+        delete_check_every=int(os.environ.get("LANDSCAPE_SNAPSHOT_DELETE_CHECK_EVERY", "6")),
+        partition_field=os.environ.get("LANDSCAPE_SNAPSHOT_PARTITION_FIELD") or None,
+        partitions_per_sync=int(os.environ.get("LANDSCAPE_SNAPSHOT_PARTITIONS_PER_SYNC", "4")),
+        full_every=int(os.environ.get("LANDSCAPE_SNAPSHOT_FULL_EVERY", "0")),
+    )
+    snap.start_refresher(float(os.environ.get("LANDSCAPE_SNAPSHOT_REFRESH", "600")))
+    return snap
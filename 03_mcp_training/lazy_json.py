@@ -0,0 +1,123 @@
+# lazy_json.py
+"""
+Lazy, section-aware access to large JSON objects.
+
+LazyObject scans a JSON document once and records where each top-level value
+starts and ends, without building any Python objects for it. A value is only
+decoded when it is read (and then kept), so code that touches a handful of
+keys of a multi-megabyte Cockpit payload never materializes the rest.
+
+LazyObject is a read-only Mapping, so helpers written against dicts
+(`raw.get("Main System Info")`) work unchanged. `on_decode`, when set, is
+called with the JSON text length of every value decoded for the first time,
+so a size-bounded cache can account for what the object grows to.
+"""
+import json
+import re
+from collections.abc import Mapping
+
+import json_codec
+
+# A run of anything that cannot open/close a container: plain characters and
+# complete strings (which may contain brackets). Possessive quantifiers
+# (Python 3.11+) keep sre from saving backtracking state on every character;
+# older interpreters get the equivalent greedy pattern.
+try:
+    _SKIP_RUN = re.compile(r'[^"\[\]{}]*+(?:"[^"\\]*+(?:\\.[^"\\]*+)*+"[^"\[\]{}]*+)*+')
+    _STRING = re.compile(r'"[^"\\]*+(?:\\.[^"\\]*+)*+"')
+except re.error:
+    _SKIP_RUN = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*')
+    _STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR = re.compile(r'[^,}\]\s]+')
+_WS = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+def _skip_value(text: str, pos: int) -> int:
+    """Return the index just past the JSON value starting at `pos`."""
+    ch = text[pos]
+    if ch == '"':
+        m = _STRING.match(text, pos)
+        if m is None:
+            raise ValueError(f"Unterminated string at {pos}")
+        return m.end()
+    if ch in "[{":
+        depth = 0
+        n = len(text)
+        while pos < n:
+            c = text[pos]
+            if c in "[{":
+                depth += 1
+            elif c in "]}":
+                depth -= 1
+                if depth == 0:
+                    return pos + 1
+            pos = _SKIP_RUN.match(text, pos + 1).end()
+        raise ValueError("Unterminated array/object")
+    m = _SCALAR.match(text, pos)
+    if m is None:
+        raise ValueError(f"Expecting value at {pos}")
+    return m.end()
+
+
+def index_object(text: str) -> dict:
+    """Map each top-level key of a JSON object to the (start, end) span of its value."""
+    pos = _WS.match(text, 0).end()
+    if pos >= len(text) or text[pos] != "{":
+        raise ValueError("JSON document is not an object")
+    spans = {}
+    pos = _WS.match(text, pos + 1).end()
+    if text.startswith("}", pos):
+        return spans
+    while True:
+        m = _STRING.match(text, pos)
+        if m is None:
+            raise ValueError(f"Expecting property name at {pos}")
+        key = json.loads(m.group())
+        pos = _WS.match(text, m.end()).end()
+        if not text.startswith(":", pos):
+            raise ValueError(f"Expecting ':' at {pos}")
+        start = _WS.match(text, pos + 1).end()
+        end = _skip_value(text, start)
+        spans[key] = (start, end)
+        pos = _WS.match(text, end).end()
+        if text.startswith(",", pos):
+            pos = _WS.match(text, pos + 1).end()
+            continue
+        if text.startswith("}", pos):
+            return spans
+        raise ValueError(f"Expecting ',' or '}}' at {pos}")
+
+
+class LazyObject(Mapping):
+    """Read-only mapping over a JSON object text; values are decoded on first access."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self._spans = index_object(text)
+        self._decoded: dict = {}
+        self.on_decode = None
+
+    def __getitem__(self, key):
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        start, end = self._spans[key]
+        if json_codec.BACKEND == "stdlib":
+            value, _ = _decoder.raw_decode(self.text, start)   # no slice copy
+        else:
+            value = json_codec.loads(self.text[start:end])
+        # two threads may decode the same key; only the stored one is reported
+        if self._decoded.setdefault(key, value) is value and self.on_decode is not None:
+            self.on_decode(end - start)
+        return self._decoded[key]
+
+    def __iter__(self):
+        return iter(self._spans)
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __contains__(self, key):
+        return key in self._spans
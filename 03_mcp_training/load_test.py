@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Load generator for server.py over streamable-http.
+
+Runs N concurrent MCP sessions that call cockpit_get_view_by_sid and
+search_system_flexi in a weighted mix for a fixed duration, then reports
+throughput, p50/p95/p99 latency and error rate per tool. Several session
+counts can be given to find where latency falls apart.
+
+Against a running server (started with DLM_FLEXI_BASE pointing at
+dlm_standin.py, or at a real DLM):
+
+    python load_test.py --url http://localhost:8050/mcp --sessions 1,8,32 --duration 20
+
+Self-contained: --spawn starts an in-process DLM stand-in and server.py
+(as a subprocess pointed at it) and stops both at the end:
+
+    python load_test.py --spawn --systems 2000 --latency 0.05 --error-rate 0.01 --sessions 1,8,32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import requests
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+import dlm_standin
+
+SEARCH_FILTERS = [
+    lambda rnd: [f"cluster|Core {rnd.randint(1, 4)}", "status|Live"],
+    lambda rnd: [f"landscape|LS{rnd.randint(0, 49):02d}"],
+    lambda rnd: ["systemtype|HANADatabase", "status|Live"],
+]
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(p * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+def tool_args(tool: str, rnd: random.Random, sids: list[str]) -> dict:
+    if tool == "cockpit_get_view_by_sid":
+        return {"sid": rnd.choice(sids), "sections": ["system_details", "availability"]}
+    return {"fields": ["sid", "status", "cluster", "landscape"], "filters": rnd.choice(SEARCH_FILTERS)(rnd),
+            "limit": 50}
+
+
+def is_error(result) -> bool:
+    if result.isError:
+        return True
+    for block in result.content:
+        text = getattr(block, "text", None)
+        if text and text.lstrip().startswith("{"):
+            try:
+                return "error" in json.loads(text)
+            except ValueError:
+                return False
+    return False
+
+
+async def run_session(url: str, mix: list[tuple[str, int]], sids: list[str], deadline: float,
+                      call_timeout: float, samples: list, seed: int):
+    rnd = random.Random(seed)
+    tools, weights = zip(*mix)
+    try:
+        async with streamablehttp_client(url) as (read_stream, write_stream, _):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                while time.perf_counter() < deadline:
+                    tool = rnd.choices(tools, weights)[0]
+                    start = time.perf_counter()
+                    try:
+                        result = await asyncio.wait_for(
+                            session.call_tool(tool, tool_args(tool, rnd, sids)), call_timeout)
+                        ok = not is_error(result)
+                    except Exception:
+                        ok = False
+                    samples.append((tool, time.perf_counter() - start, ok))
+    except Exception as e:
+        samples.append(("session", 0.0, False))
+        print(f"  session {seed} failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+async def run_level(url: str, sessions: int, duration: float, mix, sids, call_timeout: float) -> dict:
+    samples: list = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[run_session(url, mix, sids, deadline, call_timeout, samples, seed=i)
+                           for i in range(sessions)])
+    elapsed = time.perf_counter() - start
+    report = {}
+    for tool in sorted({s[0] for s in samples}):
+        rows = [s for s in samples if s[0] == tool]
+        lat = [s[1] for s in rows if s[2]]
+        errors = sum(1 for s in rows if not s[2])
+        report[tool] = {
+            "calls": len(rows), "errors": errors, "error_rate": errors / len(rows),
+            "throughput": len(rows) / elapsed,
+            "p50_ms": percentile(lat, 0.5) * 1000, "p95_ms": percentile(lat, 0.95) * 1000,
+            "p99_ms": percentile(lat, 0.99) * 1000,
+        }
+    return report
+
+
+def print_report(sessions: int, report: dict):
+    print(f"\n{sessions} sessions")
+    print(f"  {'tool':<26} | {'calls':>6} | {'calls/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'errors':>7}")
+    for tool, r in report.items():
+        print(f"  {tool:<26} | {r['calls']:>6} | {r['throughput']:>8.1f} | {r['p50_ms']:>8.1f} | "
+              f"{r['p95_ms']:>8.1f} | {r['p99_ms']:>8.1f} | {r['error_rate'] * 100:>6.1f}%")
+
+
+def wait_for_server(url: str, process: subprocess.Popen, timeout: float = 60):
+    metrics_url = url.rsplit("/", 1)[0] + "/metrics"
+    end = time.time() + timeout
+    while time.time() < end:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py exited with code {process.returncode}")
+        try:
+            if requests.get(metrics_url, timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        # also after a non-2xx answer, so a starting server is not flooded
+        time.sleep(0.5)
+    raise RuntimeError(f"server did not come up at {metrics_url}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8050/mcp")
+    parser.add_argument("--sessions", default="1,8,32", help="comma-separated concurrent session counts")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per session count")
+    parser.add_argument("--mix", default="cockpit_get_view_by_sid=3,search_system_flexi=1",
+                        help="tool=weight pairs")
+    parser.add_argument("--call-timeout", type=float, default=60)
+    parser.add_argument("--sid-pool", type=int, default=200, help="distinct SIDs to draw from (smaller = hotter caches)")
+    parser.add_argument("--standin", default="http://127.0.0.1:8700/slim", help="stand-in to read SIDs from")
+    parser.add_argument("--spawn", action="store_true", help="start a stand-in and server.py for the run")
+    parser.add_argument("--systems", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the reports to this file")
+    args = parser.parse_args()
+
+    mix = [(tool, int(weight)) for tool, weight in (p.split("=") for p in args.mix.split(","))]
+    process = None
+    if args.spawn:
+        standin = dlm_standin.StandIn(dlm_standin.build_landscape(args.systems), args.latency, args.latency / 5,
+                                      args.slow_rate, 2.0, args.error_rate, clients=50, components=200)
+        standin_server = dlm_standin.serve(standin, port=0)
+        args.standin = f"http://127.0.0.1:{standin_server.server_port}/slim"
+        env = {**os.environ, "DLM_FLEXI_BASE": args.standin}
+        process = subprocess.Popen([sys.executable, "server.py"], env=env, cwd=os.path.dirname(__file__) or ".",
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_for_server(args.url, process)
+        print(f"stand-in at {args.standin} ({len(standin.rows)} rows), server.py pid {process.pid}")
+
+    try:
+        resp = requests.get(f"{args.standin}/report/flexi",
+                            params={"sw": "f", "otype": "json", "query": "sid,status|Live"}, timeout=30)
+        sids = sorted({r["sid"] for r in resp.json()["data"]["Entries"]})[:args.sid_pool]
+        print(f"{len(sids)} SIDs, mix {dict(mix)}, {args.duration:.0f}s per level")
+
+        reports = {}
+        for sessions in (int(n) for n in args.sessions.split(",")):
+            report = asyncio.run(run_level(args.url, sessions, args.duration, mix, sids, args.call_timeout))
+            print_report(sessions, report)
+            reports[sessions] = report
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as fh:
+                json.dump(reports, fh, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
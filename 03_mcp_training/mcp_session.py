@@ -0,0 +1,210 @@
+# mcp_session.py
+"""
+One long-lived MCP client session for a console session or an embedding
+application, instead of a new streamable-http connection, initialize() and
+list_tools() per query.
+
+The transport and ClientSession are opened by a holder task that lives
+until close(): anyio's task groups inside streamablehttp_client must be
+exited by the task that entered them, while the session itself can be used
+from any task on the same event loop. When the transport drops (server
+restart, network error, "Session terminated"), the next call reconnects
+and is retried once.
+
+The server's tool list is kept in a ToolCatalog, together with anything
+rendered from it (LLM tool schemas, prompt text). It is fetched once per
+connection and again only when the server sends notifications/tools/
+list_changed or after MCP_TOOL_CATALOG_TTL seconds (default 300), not on
+every query.
+
+    session = McpSession("http://localhost:8050/mcp")
+    result = await session.call_tool("cockpit_get_view_by_sid", {"sid": "ADL"})
+    print(session.stats())
+    await session.close()
+"""
+import asyncio
+import os
+import time
+
+import anyio
+import httpx
+from mcp import ClientSession, types
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+DEFAULT_URL = "http://localhost:8050/mcp"
+TOOL_CATALOG_TTL = float(os.environ.get("MCP_TOOL_CATALOG_TTL", "300"))
+
+_TRANSPORT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream,
+                     httpx.TransportError, ConnectionError)
+
+
+def _is_transport_error(e: BaseException) -> bool:
+    if isinstance(e, McpError):
+        # CONNECTION_CLOSED: the transport went away; 32600 "Session terminated": the server forgot us
+        return e.error.code == CONNECTION_CLOSED or "Session terminated" in e.error.message
+    return isinstance(e, _TRANSPORT_ERRORS)
+
+
+class ToolCatalog:
+    """A server's tool list and values rendered from it, cached until tools/list_changed or the TTL."""
+
+    def __init__(self, ttl: float = TOOL_CATALOG_TTL):
+        self.ttl = ttl
+        self.tools: list = []
+        self.version = 0
+        self.fetched_at: float | None = None
+        self._rendered: dict = {}
+        self.counts = {"hits": 0, "fetches": 0, "invalidations": 0, "renders": 0}
+
+    @property
+    def fresh(self) -> bool:
+        return self.fetched_at is not None and time.monotonic() - self.fetched_at < self.ttl
+
+    def invalidate(self):
+        if self.fetched_at is not None:
+            self.counts["invalidations"] += 1
+        self.fetched_at = None
+
+    async def handle_message(self, message):
+        """ClientSession message_handler: a tools/list_changed notification invalidates the catalog."""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            self.invalidate()
+
+    async def get(self, session: ClientSession) -> list:
+        """The tool list, fetched with list_tools() only when the cached one is stale."""
+        if self.fresh:
+            self.counts["hits"] += 1
+            return self.tools
+        tools = (await session.list_tools()).tools
+        self.counts["fetches"] += 1
+        if [t.model_dump() for t in tools] != [t.model_dump() for t in self.tools]:
+            self.tools = tools
+            self.version += 1
+            self._rendered.clear()
+        self.fetched_at = time.monotonic()
+        return self.tools
+
+    def render(self, key: str, fn):
+        """fn(tools), computed once per catalog version (e.g. LLM tool schemas, prompt text)."""
+        if key not in self._rendered:
+            self.counts["renders"] += 1
+            self._rendered[key] = fn(self.tools)
+        return self._rendered[key]
+
+    def stats(self) -> dict:
+        return {**self.counts, "tools": len(self.tools), "version": self.version, "fresh": self.fresh}
+
+
+class McpSession:
+    """A reconnecting MCP ClientSession bound to the event loop it is first used on."""
+
+    def __init__(self, url: str = DEFAULT_URL, connect_timeout: float = 30):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.catalog = ToolCatalog()
+        self._session: ClientSession | None = None
+        self._holder: asyncio.Task | None = None
+        self._closing: asyncio.Event | None = None
+        self._lock: asyncio.Lock | None = None
+        self.counts = {"connects": 0, "reconnects": 0, "reused": 0, "calls": 0}
+        self.handshake_seconds = 0.0     # cost of the last connect + initialize + list_tools
+        self.saved_seconds = 0.0         # handshakes skipped by reusing the session
+
+    @property
+    def connected(self) -> bool:
+        return self._session is not None and self._holder is not None and not self._holder.done()
+
+    async def _hold(self, ready: asyncio.Future, closing: asyncio.Event):
+        try:
+            async with streamablehttp_client(self.url) as (read_stream, write_stream, _):
+                async with ClientSession(read_stream, write_stream,
+                                         message_handler=self.catalog.handle_message) as session:
+                    await session.initialize()
+                    self.catalog.invalidate()   # a (re)started server may offer other tools
+                    await self.catalog.get(session)
+                    ready.set_result(session)
+                    await closing.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self._session = None
+
+    async def session(self) -> tuple[ClientSession, float]:
+        """
+        The connected ClientSession, connecting first when needed. Also returns
+        the seconds spent connecting now (0.0 when the session was reused).
+        Call it once per query: each reuse counts as one handshake saved.
+        """
+        session, connect_seconds = await self._connected_session()
+        if not connect_seconds:
+            self.counts["reused"] += 1
+            self.saved_seconds += self.handshake_seconds
+        return session, connect_seconds
+
+    async def _connected_session(self) -> tuple[ClientSession, float]:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.connected:
+                return self._session, 0.0
+            if self.counts["connects"]:
+                self.counts["reconnects"] += 1
+            await self._stop_holder()
+            start = time.perf_counter()
+            ready = asyncio.get_running_loop().create_future()
+            self._closing = asyncio.Event()
+            self._holder = asyncio.ensure_future(self._hold(ready, self._closing))
+            try:
+                self._session = await asyncio.wait_for(asyncio.shield(ready), self.connect_timeout)
+            except BaseException:
+                await self._stop_holder()
+                raise
+            self.counts["connects"] += 1
+            self.handshake_seconds = time.perf_counter() - start
+            return self._session, self.handshake_seconds
+
+    @property
+    def tools(self) -> list:
+        return self.catalog.tools
+
+    async def tool_catalog(self) -> ToolCatalog:
+        """The tool catalog, re-listed first if a change notification or the TTL made it stale."""
+        session, _ = await self._connected_session()
+        await self.catalog.get(session)
+        return self.catalog
+
+    async def call_tool(self, name: str, arguments: dict):
+        """session.call_tool; reconnects and retries once when the transport dropped."""
+        for attempt in (1, 2):
+            session, _ = await self._connected_session()
+            try:
+                self.counts["calls"] += 1
+                return await session.call_tool(name, arguments)
+            except Exception as e:
+                if attempt == 2 or not _is_transport_error(e):
+                    raise
+                self._session = None   # force a reconnect on the retry
+
+    async def _stop_holder(self):
+        if self._holder is None:
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(self._holder, 5)
+        except (asyncio.TimeoutError, Exception):
+            self._holder.cancel()
+        self._holder = None
+        self._session = None
+
+    async def close(self):
+        await self._stop_holder()
+
+    def stats(self) -> dict:
+        return {**self.counts, "connected": self.connected, "catalog": self.catalog.stats(),
+                "handshake_ms": round(self.handshake_seconds * 1000, 1),
+                "saved_ms": round(self.saved_seconds * 1000, 1)}
@@ -39,7 +39,10 @@ def get_search_system_flexi_schema():
             "description": (
                 "Query the SLIM Flexi Report API to search SAP system landscape data. "
                 "Select which fields to retrieve and apply filters to narrow results. "
-                "Each filter uses the pattern 'field|value'."
+                "Each filter uses the pattern 'field|value'. "
+                "Results are paged: the response has 'entries', 'total' and, when truncated, "
+                "a 'next_cursor' to pass back as 'cursor' for the next page. "
+                "Use count_only (optionally with group_by) when the user only needs numbers."
             ),
             "parameters": {
                 "type": "object",
@@ -67,9 +70,30 @@ def get_search_system_flexi_schema():
                         "type": "string",
                         "enum": ["json", "xml", "csv"],
                         "description": "Output format (default: json)."
+                    },
+                    "limit": {
+                        "type": ["integer", "null"],
+                        "description": "Maximum rows in this page, at least 1 and at most the server's row "
+                                       "budget (null: the server default budget)."
+                    },
+                    "offset": {
+                        "type": ["integer", "null"],
+                        "description": "Row offset of the page (null: 0). Ignored when cursor is set."
+                    },
+                    "cursor": {
+                        "type": ["string", "null"],
+                        "description": "The 'next_cursor' of a previous page with the same fields/filters."
+                    },
+                    "count_only": {
+                        "type": "boolean",
+                        "description": "Return only the total number of matching rows (and group counts)."
+                    },
+                    "group_by": {
+                        "type": ["string", "null"],
+                        "description": "With count_only: field to count rows per value of, e.g. 'status'."
                     }
                 },
-                "required": ["fields" , "filters" ,"otype"],
+                "required": ["fields" , "filters" ,"otype", "limit", "offset", "cursor", "count_only", "group_by"],
                 "additionalProperties": False
             },
             "strict": True
@@ -203,6 +227,55 @@ def get_cockpit_get_view_by_sid_schema():
     }
 
 
+def get_cockpit_get_views_by_sids_schema():
+    return {
+        "type": "function",
+        "function": {
+            "name": "cockpit_get_views_by_sids",
+            "description": (
+                "Return summarized System Cockpit views for SEVERAL systems in one call. "
+                "All SIDs are resolved together and fetched in parallel; each SID gets its own "
+                "result or error. Use this when the user asks for an overview of multiple named "
+                "systems (e.g., 'Overview of ERX, ADL and CC3')."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "sids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of 3-letter system SIDs, e.g. ['ERX', 'ADL', 'CC3']."
+                    },
+                    "systype": {
+                        "type": "string",
+                        "enum": ["ABAPSystem"],
+                        "description": "Optional hint to disambiguate the SIDs."
+                    },
+                    "sections": {
+                        "type": "array",
+                        "items": {
+                            "type": "string",
+                            "enum": [
+                                "system_details","availability","program_landscape","Clients","Software_Components"
+                            ]
+                        },
+                        "description": "Optional: which sections to include for every SID. If omitted, all."
+                    },
+                    "max_concurrency": {
+                        "type": ["integer", "null"],
+                        "description": "Optional: fewer cockpits fetched at the same time than the server "
+                                       "default (which is also the maximum). Use null for the default."
+                    }
+                },
+                "required": ["sids","systype","sections","max_concurrency"],
+                "additionalProperties": False
+            },
+            "strict": True
+        }
+    }
+
+
 def get_all_schemas():
-    """Convenience: return both tool schemas as a list."""
-    return [get_search_system_flexi_schema(),  get_cockpit_get_view_by_sid_schema()]
+    """Convenience: return all tool schemas as a list."""
+    return [get_search_system_flexi_schema(),  get_cockpit_get_view_by_sid_schema(),
+            get_cockpit_get_views_by_sids_schema()]
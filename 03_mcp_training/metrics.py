@@ -0,0 +1,209 @@
+# metrics.py
+"""
+In-process metrics for the MCP server, rendered in the Prometheus text
+exposition format (served at /metrics and as the metrics://server resource).
+
+Counters, gauges and histograms take labels as keyword arguments. Values
+that already live elsewhere (cache and pool statistics) are pulled in at
+scrape time through collectors instead of being mirrored on every request.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: dict = {}   # tuple(sorted label items) -> value
+
+    @staticmethod
+    def _key(labels: dict) -> tuple:
+        return tuple(sorted(labels.items()))
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(dict(k))} {_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, (list(b), s, c)) for k, (b, s, c) in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            labels = dict(key)
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': _num(bound)})} {n}")
+            lines.append(f"{self.name}_bucket{_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_num(round(total, 6))}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: list = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._add(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._add(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, fn):
+        """`fn()` returns an iterable of (name, kind, help, [(labels_dict, value), ...]) at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            try:
+                families = list(fn())
+            except Exception as e:
+                lines.append(f"# collector {getattr(fn, '__name__', fn)} failed: {_escape(e)}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_labels(labels)} {_num(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+TOOL_SECONDS = REGISTRY.histogram(
+    "mcp_tool_seconds", "End-to-end MCP tool call latency, including result serialization.")
+TOOL_STAGE_SECONDS = REGISTRY.histogram(
+    "mcp_tool_stage_seconds", "Latency of one stage (resolve, fetch, normalize, serialize) of an MCP tool.")
+TOOL_CALLS = REGISTRY.counter("mcp_tool_calls_total", "MCP tool calls by outcome.")
+TOOL_IN_FLIGHT = REGISTRY.gauge("mcp_tool_in_flight", "MCP tool calls currently executing.")
+TOOL_RESULT_BYTES = REGISTRY.histogram(
+    "mcp_tool_result_bytes", "Size of the serialized MCP tool result.", BYTES_BUCKETS)
+
+BACKEND_SECONDS = REGISTRY.histogram("dlm_backend_request_seconds", "DLM/SLIM backend request latency.")
+BACKEND_REQUESTS = REGISTRY.counter("dlm_backend_requests_total", "DLM/SLIM backend requests by status code.")
+BACKEND_BYTES = REGISTRY.histogram(
+    "dlm_backend_response_bytes", "DLM/SLIM backend response body size.", BYTES_BUCKETS)
+BACKEND_IN_FLIGHT = REGISTRY.gauge("dlm_backend_in_flight", "DLM/SLIM backend requests currently in flight.")
+BACKEND_COALESCED = REGISTRY.counter(
+    "dlm_backend_coalesced_total", "Calls that joined an identical in-flight backend call instead of making their own.")
+
+
+def backend_endpoint(url: str) -> str:
+    """Low-cardinality endpoint label for a backend URL."""
+    if "/report/flexi" in url:
+        return "flexi"
+    if "UI5CockpitDataProvider" in url:
+        return "cockpit"
+    return "other"
+
+
+@contextmanager
+def stage(tool: str, name: str):
+    """Time one stage of a tool call into mcp_tool_stage_seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        TOOL_STAGE_SECONDS.observe(time.perf_counter() - start, tool=tool, stage=name)
+
+
+@contextmanager
+def backend_request(url: str):
+    """
+    Track one backend request. The body yields a dict; set "status" and
+    "bytes" on it once the response is known.
+    """
+    endpoint = backend_endpoint(url)
+    info = {"status": "error", "bytes": None}
+    BACKEND_IN_FLIGHT.inc(endpoint=endpoint)
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        BACKEND_IN_FLIGHT.dec(endpoint=endpoint)
+        BACKEND_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        BACKEND_REQUESTS.inc(endpoint=endpoint, status=info["status"])
+        if info["bytes"] is not None:
+            BACKEND_BYTES.observe(info["bytes"], endpoint=endpoint)
+
+
+def render() -> str:
+    return REGISTRY.render()
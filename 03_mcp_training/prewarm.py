@@ -0,0 +1,280 @@
+# prewarm.py
+"""
+Cache prewarming for hot SIDs, so the first requests after a restart do not
+pay the full Flexi resolve plus Cockpit fetch.
+
+Hot SIDs come from configuration and from observed traffic: the cockpit
+tools count the SIDs they are asked for (HOT), and the counts are saved to
+DLM_PREWARM_HOT_FILE periodically and at exit, so the next start warms the
+most requested ones. Tracking is opt-in; point the file at a state directory,
+not the source tree. Only the DLM_PREWARM_HOT_KEEP most requested SIDs are
+kept, so the counts stay bounded however many SIDs are seen. A prewarm run resolves the SIDs with batched Flexi
+queries (filling the resolution cache) and fetches their cockpits into the
+payload cache in parallel: at most DLM_PREWARM_CONCURRENCY at a time and no
+more than DLM_PREWARM_RATE fetch starts per second, so a fleet restart does
+not flood DLM. Warm cockpits only help for as long as the payload cache
+keeps them (DLM_COCKPIT_CACHE_TTL / _STALE).
+
+The server runs one prewarm at startup and answers /readyz with 503 until
+it has finished (or DLM_PREWARM_READY_TIMEOUT has passed), so a load
+balancer only routes to warm instances; the cache_prewarm tool runs one on
+demand.
+
+Configuration (env vars):
+    DLM_PREWARM                1 (default) = prewarm at startup, 0 = off (ready at once)
+    DLM_PREWARM_SIDS           configured hot SIDs, "SID" or "SID:systype", comma-separated
+    DLM_PREWARM_FILE           more of them, one per line ("#" starts a comment)
+    DLM_PREWARM_HOT_FILE       observed request counts, e.g. /var/lib/dlm-mcp/hot_sids.json
+                               (default "" = not tracked)
+    DLM_PREWARM_HOT_KEEP       most requested SIDs kept in the counts (default 500)
+    DLM_PREWARM_TOP            most requested SIDs taken from the hot file (default 50)
+    DLM_PREWARM_CONCURRENCY    parallel cockpit fetches (default 4)
+    DLM_PREWARM_RATE           cockpit fetches started per second (default 5, 0 = unlimited)
+    DLM_PREWARM_READY_TIMEOUT  seconds after which startup reports ready anyway (default 120)
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+import metrics
+from cockpit_utils import _resolve_objectids_from_sids_async, _fetch_cockpit_cached_async
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+ENABLED = os.environ.get("DLM_PREWARM", "1") != "0"
+HOT_FILE = os.environ.get("DLM_PREWARM_HOT_FILE", "")
+TOP = int(_env_float("DLM_PREWARM_TOP", 50))
+HOT_KEEP = int(_env_float("DLM_PREWARM_HOT_KEEP", 500))
+CONCURRENCY = int(_env_float("DLM_PREWARM_CONCURRENCY", 4))
+RATE = _env_float("DLM_PREWARM_RATE", 5)
+READY_TIMEOUT = _env_float("DLM_PREWARM_READY_TIMEOUT", 120)
+RESOLVE_BATCH = 25   # SIDs per Flexi query
+
+logger = logging.getLogger("prewarm")
+
+PREWARM_SIDS = metrics.REGISTRY.counter("dlm_prewarm_sids_total", "SIDs warmed by prewarm runs, by result.")
+
+
+def _parse_entry(text: str) -> tuple[str, str | None] | None:
+    sid, _, systype = text.split("#", 1)[0].strip().partition(":")
+    if not sid.strip():
+        return None
+    return sid.strip().upper(), systype.strip() or None
+
+
+def configured_sids() -> list[tuple[str, str | None]]:
+    """(SID, systype) pairs from DLM_PREWARM_SIDS and DLM_PREWARM_FILE, in order."""
+    entries = os.environ.get("DLM_PREWARM_SIDS", "").split(",")
+    path = os.environ.get("DLM_PREWARM_FILE")
+    if path:
+        try:
+            with open(path, encoding="utf-8") as fh:
+                entries += fh.read().splitlines()
+        except OSError as e:
+            logger.warning("cannot read DLM_PREWARM_FILE %s: %s", path, e)
+    return [e for e in map(_parse_entry, entries) if e is not None]
+
+
+class HotSids:
+    """
+    Request counts per (SID, systype), persisted as JSON so they survive
+    restarts. At most `keep` SIDs are kept: once twice as many are counted,
+    and on every save, the least requested ones are pruned.
+    """
+
+    def __init__(self, path: str | None, keep: int = HOT_KEEP):
+        self.path = path or None
+        self.keep = max(keep, 1)
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._dirty = False
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as fh:
+                    for row in json.load(fh):
+                        self._counts[(row["sid"], row.get("systype"))] = int(row["count"])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("ignoring unreadable hot SID file %s: %s", self.path, e)
+            self._prune()
+
+    def _prune(self):
+        # callers hold the lock (or own the object, in __init__)
+        if len(self._counts) > self.keep:
+            self._counts = Counter(dict(self._counts.most_common(self.keep)))
+
+    def record(self, sid: str, systype: str | None = None):
+        if self.path is None or not sid or not sid.strip():
+            return
+        with self._lock:
+            self._counts[(sid.strip().upper(), systype or None)] += 1
+            self._dirty = True
+            if len(self._counts) > 2 * self.keep:
+                self._prune()
+
+    def top(self, n: int) -> list[tuple[str, str | None]]:
+        with self._lock:
+            return [key for key, _ in self._counts.most_common(n)]
+
+    def save(self):
+        """Write the counts (atomically) if anything changed since the last save."""
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            self._prune()
+            rows = [{"sid": sid, "systype": systype, "count": count}
+                    for (sid, systype), count in self._counts.most_common()]
+            self._dirty = False
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(rows, fh)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning("cannot save hot SIDs to %s: %s", self.path, e)
+
+
+HOT = HotSids(HOT_FILE)
+atexit.register(HOT.save)
+
+
+def hot_sids(configured: list[tuple[str, str | None]] | None = None) -> list[tuple[str, str | None]]:
+    """What a prewarm run warms: the configured SIDs first, then the most requested ones."""
+    configured = configured_sids() if configured is None else configured
+    return list(dict.fromkeys(configured + HOT.top(TOP)))
+
+
+class _RateLimiter:
+    """Spaces call starts at least 1/rate seconds apart (rate <= 0: no limit)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Prewarmer:
+    """Runs prewarms (one at a time) and tracks whether the startup prewarm is done."""
+
+    def __init__(self, concurrency: int = CONCURRENCY, rate: float = RATE, ready_timeout: float = READY_TIMEOUT):
+        self.concurrency = max(concurrency, 1)
+        self.rate = rate
+        self.ready_timeout = ready_timeout
+        self.state = "idle"            # idle -> warming -> ready (or disabled)
+        self.started_at: float | None = None
+        self.last_run: dict | None = None
+        self.configured: list[tuple[str, str | None]] | None = None   # read once, on the first run
+        self._lock: asyncio.Lock | None = None
+
+    def ready(self) -> bool:
+        if self.state in ("ready", "disabled"):
+            return True
+        # never keep the instance out of rotation forever because DLM is slow
+        return self.started_at is not None and time.time() - self.started_at > self.ready_timeout
+
+    async def run(self, sids: list[tuple[str, str | None]] | None = None) -> dict:
+        """
+        Resolve and fetch `sids` (default: hot_sids()) into the caches. Failing
+        SIDs are counted, not raised. Returns a summary of the run.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.configured is None:
+                self.configured = configured_sids()
+            sids = hot_sids(self.configured) if sids is None else list(dict.fromkeys(sids))
+            start = time.time()
+            if self.state == "idle":
+                self.state, self.started_at = "warming", start
+            ok, failed = await self._warm(sids)
+            self.last_run = {"sids": len(sids), "ok": ok, "failed": failed,
+                             "seconds": round(time.time() - start, 3),
+                             "finished_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+            if self.state == "warming":
+                self.state = "ready"
+            logger.info("prewarmed %d SIDs (%d failed) in %.1fs", len(sids), len(failed), time.time() - start)
+            return self.last_run
+
+    async def _warm(self, sids: list[tuple[str, str | None]]) -> tuple[int, dict]:
+        by_systype: dict = {}
+        for sid, systype in sids:
+            by_systype.setdefault(systype, []).append(sid)
+
+        resolved: list = []
+        for systype, group in by_systype.items():
+            for i in range(0, len(group), RESOLVE_BATCH):
+                batch = await _resolve_objectids_from_sids_async(group[i:i + RESOLVE_BATCH], systype)
+                resolved += [(sid, systype, res) for sid, res in batch.items()]
+
+        limiter = _RateLimiter(self.rate)
+        sem = asyncio.Semaphore(self.concurrency)
+        failed: dict = {}
+
+        async def one(sid: str, systype: str | None, res):
+            label = f"{sid}:{systype}" if systype else sid
+            if isinstance(res, Exception) or not res.get("objectid"):
+                failed[label] = f"resolve: {res}"
+                return
+            async with sem:
+                await limiter.wait()
+                try:
+                    await _fetch_cockpit_cached_async(res["objectid"], systype or "ABAPSystem")
+                except Exception as e:
+                    failed[label] = f"fetch: {e}"
+
+        await asyncio.gather(*(one(*r) for r in resolved))
+        PREWARM_SIDS.inc(len(resolved) - len(failed), result="ok")
+        PREWARM_SIDS.inc(len(failed), result="error")
+        return len(resolved) - len(failed), failed
+
+    async def run_startup(self, save_every: float = 300):
+        """Startup prewarm, then save the hot SID counts every `save_every` seconds."""
+        self.configured = configured_sids()
+        if not ENABLED:
+            self.state = "disabled"
+        else:
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("startup prewarm failed")
+                self.state = "ready"
+        try:
+            while True:
+                await asyncio.sleep(save_every)
+                await asyncio.to_thread(HOT.save)
+        finally:
+            HOT.save()   # server shutdown cancels this task
+
+    def status(self) -> dict:
+        return {"ready": self.ready(), "state": self.state, "enabled": ENABLED,
+                "hot_sids": len(hot_sids(self.configured or [])), "concurrency": self.concurrency,
+                "rate": self.rate, "last_run": self.last_run}
+
+
+PREWARMER = Prewarmer()
+
+
+@metrics.REGISTRY.register_collector
+def _prewarm_metrics():
+    yield ("dlm_ready", "gauge", "1 once the startup prewarm has finished (readiness).",
+           [({}, 1 if PREWARMER.ready() else 0)])
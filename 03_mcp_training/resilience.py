@@ -0,0 +1,373 @@
+# resilience.py
+"""
+Hedged requests, retries and circuit breaking for DLM/SLIM backend calls.
+
+BackendClient.get and AsyncBackendClient.get send every request through
+call() / call_async(), which add, per endpoint (flexi, cockpit, ...):
+
+    deadline   the request's timeout is the budget of the whole call,
+               attempts and backoff included
+    hedging    when an attempt is slower than the DLM_HEDGE_PERCENTILE of
+               recent latencies, a duplicate is sent and the first good
+               answer wins (all backend calls are idempotent GETs)
+    retries    transport errors and 5xx answers are retried with jittered
+               exponential backoff while the deadline allows
+    breaker    when the failure rate over the recent window crosses
+               DLM_BREAKER_FAILURE_RATE, calls fail fast with
+               CircuitOpenError until a trial call (half-open) succeeds
+
+Configuration (env vars):
+    DLM_HEDGE_PERCENTILE      latency percentile that triggers a hedge (default 0.95, 0 = off)
+    DLM_HEDGE_MIN_DELAY       never hedge earlier than this many seconds (default 0.05)
+    DLM_HEDGE_MIN_SAMPLES     latencies seen before hedging starts (default 20)
+    DLM_RETRIES               retries after the first attempt (default 2)
+    DLM_RETRY_BACKOFF         base backoff in seconds (default 0.2)
+    DLM_BREAKER_FAILURE_RATE  failure rate that opens the breaker (default 0.5)
+    DLM_BREAKER_MIN_CALLS     calls in the window before it may open (default 10)
+    DLM_BREAKER_WINDOW        seconds of history the rate is computed over (default 30)
+    DLM_BREAKER_OPEN_SECONDS  seconds it stays open before a trial call (default 30)
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+HEDGE_PERCENTILE = _env_float("DLM_HEDGE_PERCENTILE", 0.95)
+HEDGE_MIN_DELAY = _env_float("DLM_HEDGE_MIN_DELAY", 0.05)
+HEDGE_MIN_SAMPLES = int(_env_float("DLM_HEDGE_MIN_SAMPLES", 20))
+RETRY_COUNT = int(_env_float("DLM_RETRIES", 2))
+RETRY_BACKOFF = _env_float("DLM_RETRY_BACKOFF", 0.2)
+
+logger = logging.getLogger("resilience")
+
+RETRIES = metrics.REGISTRY.counter("dlm_backend_retries_total", "Backend attempts retried after an error or 5xx.")
+HEDGES = metrics.REGISTRY.counter("dlm_backend_hedges_total", "Hedged duplicate backend requests, by which attempt won.")
+BREAKER_TRANSITIONS = metrics.REGISTRY.counter("dlm_breaker_transitions_total", "Circuit breaker state changes.")
+BREAKER_REJECTED = metrics.REGISTRY.counter(
+    "dlm_breaker_rejected_total", "Backend calls failed fast because the circuit breaker was open.")
+
+
+class CircuitOpenError(RuntimeError):
+    """The endpoint's circuit breaker is open; the call was not sent."""
+
+
+class LatencyWindow:
+    """Recent successful attempt latencies of one endpoint."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(p * len(ordered)), len(ordered) - 1)]
+
+
+class CircuitBreaker:
+    """closed -> open when the failure rate crosses the threshold -> half_open after open_seconds -> closed/open."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, endpoint: str, failure_rate: float | None = None, min_calls: int | None = None,
+                 window: float | None = None, open_seconds: float | None = None):
+        self.endpoint = endpoint
+        self.failure_rate = failure_rate if failure_rate is not None else _env_float("DLM_BREAKER_FAILURE_RATE", 0.5)
+        self.min_calls = min_calls if min_calls is not None else int(_env_float("DLM_BREAKER_MIN_CALLS", 10))
+        self.window = window if window is not None else _env_float("DLM_BREAKER_WINDOW", 30)
+        self.open_seconds = open_seconds if open_seconds is not None else _env_float("DLM_BREAKER_OPEN_SECONDS", 30)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._trial = False
+        self._events: deque = deque()   # (time, ok)
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str, reason: str):
+        old, self.state = self.state, state
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+        if state == self.CLOSED:
+            self._events.clear()
+        BREAKER_TRANSITIONS.inc(endpoint=self.endpoint, to=state)
+        log = logger.info if state == self.CLOSED else logger.warning
+        log("circuit breaker %s: %s -> %s (%s)", self.endpoint, old, state, reason)
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    BREAKER_REJECTED.inc(endpoint=self.endpoint)
+                    raise CircuitOpenError(f"DLM endpoint '{self.endpoint}' is failing; circuit breaker open")
+                self._transition(self.HALF_OPEN, "trial call")
+            if self.state == self.HALF_OPEN:
+                if self._trial:
+                    BREAKER_REJECTED.inc(endpoint=self.endpoint)
+                    raise CircuitOpenError(f"DLM endpoint '{self.endpoint}' is being probed; circuit breaker half-open")
+                self._trial = True
+
+    def record(self, ok: bool | None):
+        """Outcome of an allowed call; None = abandoned (cancelled) without an answer."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial = False
+                if ok:
+                    self._transition(self.CLOSED, "trial call succeeded")
+                elif ok is False:
+                    self._transition(self.OPEN, "trial call failed")
+                return
+            if ok is None:
+                return
+            now = time.monotonic()
+            self._events.append((now, ok))
+            while self._events and self._events[0][0] < now - self.window:
+                self._events.popleft()
+            calls = len(self._events)
+            failures = sum(1 for _, good in self._events if not good)
+            if self.state == self.CLOSED and calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._transition(self.OPEN, f"{failures}/{calls} failed in {self.window:.0f}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = len(self._events)
+            failures = sum(1 for _, good in self._events if not good)
+            open_for = time.monotonic() - self.opened_at if self.state != self.CLOSED else 0.0
+        return {"state": self.state, "window_calls": calls, "window_failures": failures,
+                "open_for_seconds": round(open_for, 1)}
+
+
+_breakers: dict = {}
+_latencies: dict = {}
+_registry_lock = threading.Lock()
+_hedge_pool: ThreadPoolExecutor | None = None
+
+
+def _endpoint_state(endpoint: str) -> tuple[CircuitBreaker, LatencyWindow]:
+    with _registry_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+            _latencies[endpoint] = LatencyWindow()
+        return _breakers[endpoint], _latencies[endpoint]
+
+
+def _hedge_delay(latency: LatencyWindow) -> float | None:
+    if HEDGE_PERCENTILE <= 0:
+        return None
+    p = latency.percentile(HEDGE_PERCENTILE)
+    return None if p is None else max(p, HEDGE_MIN_DELAY)
+
+
+def _backoff(attempt: int, deadline: float) -> float | None:
+    """Jittered exponential pause before the next attempt, or None if it would not fit the deadline."""
+    pause = RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+    return pause if time.monotonic() + pause < deadline else None
+
+
+def _good(resp) -> bool:
+    return resp.status_code < 500
+
+
+# -- async -----------------------------------------------------------------
+
+async def _timed_async(latency: LatencyWindow, attempt, timeout: float):
+    start = time.monotonic()
+    resp = await attempt(timeout)
+    if _good(resp):
+        latency.observe(time.monotonic() - start)
+    return resp
+
+
+async def _hedged_async(endpoint: str, latency: LatencyWindow, attempt, remaining: float):
+    delay = _hedge_delay(latency)
+    first = asyncio.ensure_future(_timed_async(latency, attempt, remaining))
+    tasks = [first]
+    try:
+        if delay is not None and delay < remaining:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if not done:
+                tasks.append(asyncio.ensure_future(_timed_async(latency, attempt, remaining - delay)))
+        pending, resp, error = set(tasks), None, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                resp = task.result()
+                if _good(resp):
+                    if len(tasks) > 1:
+                        HEDGES.inc(endpoint=endpoint, won="hedge" if task is not first else "original")
+                    return resp
+        if resp is not None:
+            return resp
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_async(url: str, attempt, deadline: float):
+    """
+    Run `attempt(timeout)` (an async single GET returning a response) with
+    hedging, retries and the endpoint's circuit breaker, within `deadline`
+    seconds. A final 5xx response is returned as is; errors are re-raised.
+    """
+    endpoint = metrics.backend_endpoint(url)
+    breaker, latency = _endpoint_state(endpoint)
+    end = time.monotonic() + deadline
+    resp, error = None, None
+    for n in range(RETRY_COUNT + 1):
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        if n:
+            RETRIES.inc(endpoint=endpoint)
+        breaker.allow()
+        try:
+            resp, error = await _hedged_async(endpoint, latency, attempt, remaining), None
+        except asyncio.CancelledError:
+            breaker.record(None)
+            raise
+        except Exception as e:
+            resp, error = None, e
+        breaker.record(resp is not None and _good(resp))
+        if resp is not None and _good(resp):
+            return resp
+        pause = _backoff(n, end)
+        if pause is None:
+            break
+        await asyncio.sleep(pause)
+    if resp is not None:
+        return resp
+    if error is not None:
+        raise error
+    raise TimeoutError(f"DLM endpoint '{endpoint}': deadline of {deadline:.0f}s exhausted")
+
+
+# -- sync ------------------------------------------------------------------
+
+def _pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _registry_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="dlm-hedge")
+        return _hedge_pool
+
+
+def _timed(latency: LatencyWindow, attempt, timeout: float):
+    start = time.monotonic()
+    resp = attempt(timeout)
+    if _good(resp):
+        latency.observe(time.monotonic() - start)
+    return resp
+
+
+def _hedged(endpoint: str, latency: LatencyWindow, attempt, remaining: float):
+    delay = _hedge_delay(latency)
+    if delay is None or delay >= remaining:
+        return _timed(latency, attempt, remaining)
+    # a blocking attempt cannot be abandoned, so both run in the hedge pool;
+    # the loser finishes in the background and is dropped
+    first = _pool().submit(_timed, latency, attempt, remaining)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+    futures = [first, _pool().submit(_timed, latency, attempt, remaining - delay)]
+    pending, resp, error = set(futures), None, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+            resp = future.result()
+            if _good(resp):
+                HEDGES.inc(endpoint=endpoint, won="hedge" if future is not first else "original")
+                return resp
+    if resp is not None:
+        return resp
+    raise error
+
+
+def call(url: str, attempt, deadline: float):
+    """Blocking variant of call_async for BackendClient."""
+    endpoint = metrics.backend_endpoint(url)
+    breaker, latency = _endpoint_state(endpoint)
+    end = time.monotonic() + deadline
+    resp, error = None, None
+    for n in range(RETRY_COUNT + 1):
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        if n:
+            RETRIES.inc(endpoint=endpoint)
+        breaker.allow()
+        try:
+            resp, error = _hedged(endpoint, latency, attempt, remaining), None
+        except Exception as e:
+            resp, error = None, e
+        except BaseException:
+            # KeyboardInterrupt, SystemExit, a CancelledError from a worker: release a half-open trial
+            breaker.record(None)
+            raise
+        breaker.record(resp is not None and _good(resp))
+        if resp is not None and _good(resp):
+            return resp
+        pause = _backoff(n, end)
+        if pause is None:
+            break
+        time.sleep(pause)
+    if resp is not None:
+        return resp
+    if error is not None:
+        raise error
+    raise TimeoutError(f"DLM endpoint '{endpoint}': deadline of {deadline:.0f}s exhausted")
+
+
+def stats() -> dict:
+    """Breaker state, recent latency percentiles and the current hedge delay per endpoint."""
+    with _registry_lock:
+        endpoints = list(_breakers)
+    out = {}
+    for endpoint in endpoints:
+        breaker, latency = _endpoint_state(endpoint)
+        delay = _hedge_delay(latency)
+        out[endpoint] = {
+            **breaker.stats(),
+            "p50_seconds": latency.percentile(0.5),
+            "p95_seconds": latency.percentile(0.95),
+            "hedge_delay_seconds": round(delay, 3) if delay is not None else None,
+        }
+    return out
+
+
+@metrics.REGISTRY.register_collector
+def _breaker_metrics():
+    codes = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+    st = stats()
+    yield ("dlm_breaker_state", "gauge", "Circuit breaker state per endpoint (0 closed, 1 half-open, 2 open).",
+           [({"endpoint": ep}, codes[s["state"]]) for ep, s in st.items()])
+    yield ("dlm_backend_hedge_delay_seconds", "gauge", "Current latency after which a backend request is hedged.",
+           [({"endpoint": ep}, s["hedge_delay_seconds"]) for ep, s in st.items()
+            if s["hedge_delay_seconds"] is not None])
@@ -0,0 +1,171 @@
+# response_cache.py
+"""
+Response cache for the orchestrator's LLM turns.
+
+Users ask the same questions again and again ("show ERX overview"); both
+gpt-4o turns of such a query can be answered from a cache:
+
+    turn 1 (tool choice)  keyed by the normalized prompt and a hash of the
+                          LLM tool schemas; the value is the assistant
+                          message (text and/or tool calls)
+    turn 2 (answer)       keyed by the normalized prompt and a hash of the
+                          tool results, so an answer is only reused over the
+                          same data; keys starting with "_" (cache ages,
+                          resolver metadata) are left out of the hash
+
+Matching is exact on the normalized prompt (case, whitespace and trailing
+punctuation folded). With an `embed` function (text -> vector) a miss can
+still hit an entry of the same turn and context whose prompt embedding has
+cosine similarity >= `similarity`, and only if both prompts name the same
+entities (SIDs, numbers, uppercase tokens), so "status of ADL" never gets
+the answer for "status of ADM". Entries expire after `ttl` seconds; the
+least recently used ones go beyond `maxsize`.
+
+The 04 executors import this module too (through 04's utils.py). Async
+callers use aget/aput, which move the embedding call off the event loop.
+
+Configuration (env vars, for from_env):
+    LLM_CACHE               1 (default) = on, 0 = off
+    LLM_CACHE_TTL           seconds an entry is served (default 600)
+    LLM_CACHE_MAX           entries kept (default 512)
+    LLM_CACHE_SIMILARITY    cosine threshold for embedding matches (default 0.95)
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCT = re.compile(r"[\s?!.,;:]+$")
+_SPACE = re.compile(r"\s+")
+_ENTITY = re.compile(r"\b(?=\w*[A-Z0-9])\w*[A-Z0-9]\w*\b")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return _PUNCT.sub("", _SPACE.sub(" ", prompt.strip().lower()))
+
+
+def entities(prompt: str) -> frozenset:
+    """Tokens with uppercase letters or digits (SIDs, clusters, counts) that a match must share."""
+    return frozenset(t.upper() for t in _ENTITY.findall(prompt) if not (t[0].isupper() and t[1:].islower()))
+
+
+def _strip_meta(value):
+    if isinstance(value, dict):
+        return {k: _strip_meta(v) for k, v in value.items() if not str(k).startswith("_")}
+    if isinstance(value, (list, tuple)):
+        return [_strip_meta(v) for v in value]
+    return value
+
+
+def context_hash(value) -> str:
+    """Stable hash of tool schemas / tool results, ignoring "_" metadata keys."""
+    text = json.dumps(_strip_meta(value), sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """TTL + LRU cache of LLM turn results keyed by (turn, context hash, normalized prompt)."""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 600, embed=None, similarity: float = 0.95):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.embed = embed
+        self.similarity = similarity
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+        self.saved_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, embed=None) -> "ResponseCache | None":
+        if os.environ.get("LLM_CACHE", "1") == "0":
+            return None
+        return cls(maxsize=int(os.environ.get("LLM_CACHE_MAX", "512")),
+                   ttl=float(os.environ.get("LLM_CACHE_TTL", "600")),
+                   embed=embed, similarity=float(os.environ.get("LLM_CACHE_SIMILARITY", "0.95")))
+
+    def get(self, turn: str, prompt: str, context: str):
+        """The cached value for this turn, prompt and context hash, or None."""
+        key = (turn, context, normalize_prompt(prompt))
+        wanted = entities(prompt) if self.embed is not None else None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["at"] > self.ttl:
+                del self._entries[key]
+                self.counts["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counts["hits"] += 1
+                self.saved_seconds += entry["seconds"]
+                return entry["value"]
+            if self.embed is None:
+                self.counts["misses"] += 1
+                return None
+            candidates = [(k, e) for k, e in self._entries.items()
+                          if k[0] == turn and k[1] == context and e["entities"] == wanted
+                          and e["embedding"] is not None and now - e["at"] <= self.ttl]
+        if candidates:
+            vector = self.embed(prompt)
+            best_key, best = max(candidates, key=lambda c: _cosine(vector, c[1]["embedding"]))
+            if _cosine(vector, best["embedding"]) >= self.similarity:
+                with self._lock:
+                    self.counts["semantic_hits"] += 1
+                    self.saved_seconds += best["seconds"]
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                return best["value"]
+        with self._lock:
+            self.counts["misses"] += 1
+        return None
+
+    def put(self, turn: str, prompt: str, context: str, value, seconds: float = 0.0):
+        """Store a turn result; `seconds` is what producing it cost (counted as saved on hits)."""
+        embedding = self.embed(prompt) if self.embed is not None else None
+        key = (turn, context, normalize_prompt(prompt))
+        entry = {"value": value, "at": time.monotonic(), "seconds": seconds,
+                 "entities": entities(prompt), "embedding": embedding}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.counts["stores"] += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.counts["evictions"] += 1
+
+    async def aget(self, turn: str, prompt: str, context: str):
+        """get() for event-loop code: with an embed function it runs in a worker thread."""
+        if self.embed is None:
+            return self.get(turn, prompt, context)
+        return await asyncio.to_thread(self.get, turn, prompt, context)
+
+    async def aput(self, turn: str, prompt: str, context: str, value, seconds: float = 0.0):
+        """put() for event-loop code: with an embed function it runs in a worker thread."""
+        if self.embed is None:
+            self.put(turn, prompt, context, value, seconds)
+        else:
+            await asyncio.to_thread(self.put, turn, prompt, context, value, seconds)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counts["hits"] + self.counts["semantic_hits"] + self.counts["misses"]
+            hits = self.counts["hits"] + self.counts["semantic_hits"]
+            return {**self.counts, "entries": len(self._entries), "semantic": self.embed is not None,
+                    "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+                    "saved_ms": round(self.saved_seconds * 1000, 1)}
@@ -1,21 +1,105 @@
 # Test version without tools to isolate asyncio issue
 import os, json
+import asyncio
 from typing import List
 from mcp.server.fastmcp import FastMCP
 import requests
 import httpx
 from urllib.parse import quote_plus
 from typing import List, Dict, Any
+import cockpit_utils
 from cockpit_utils import _resolve_objectid_from_sid, _fetch_cockpit, _normalize_cockpit
+from cockpit_utils import _resolve_objectid_from_sid_async
+from cockpit_utils import _resolve_objectids_from_sids_async, _fetch_cockpit_cached_async
+from cockpit_utils import cockpit_cache_stats, set_landscape_snapshot, coalescing_stats
+from cockpit_utils import invalidate_resolve_cache, resolve_cache_stats, resolver_stats
+from backend_client import get_client, get_async_client, SingleFlight
+from lazy_json import LazyObject
+from collections.abc import Mapping
 import logging
 import time
 import traceback
+import metrics
+import flexi_paging
+import landscape_snapshot
+import resilience
+import fixtures
+import json_codec
+import prewarm
+from mcp.types import TextContent
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, JSONResponse
+import contextlib
 
 # configure simple logging for traceability (adjust level as needed)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 
-mcp = FastMCP( 
+def _content_bytes(content) -> int:
+    """Size of the text parts of a converted tool result."""
+    blocks = content[0] if isinstance(content, tuple) else content
+    if not isinstance(blocks, (list, tuple)):
+        blocks = getattr(blocks, "content", None) or []
+    return sum(len(getattr(b, "text", "") or "") for b in blocks)
+
+
+def _convert_result(tool, result):
+    """
+    FastMCP's result conversion, except that plain dict results are encoded
+    with json_codec: compact, non-ASCII kept, instead of indent=2.
+    """
+    if isinstance(result, dict) and tool.fn_metadata.output_schema is None:
+        return [TextContent(type="text", text=json_codec.dumps(result))]
+    return tool.fn_metadata.convert_result(result)
+
+
+class InstrumentedFastMCP(FastMCP):
+    """
+    FastMCP that records per-tool latency, outcome, in-flight calls and the
+    serialize stage (conversion of the return value into MCP content).
+    """
+
+    async def call_tool(self, name: str, arguments: dict):
+        context = self.get_context()
+        metrics.TOOL_IN_FLIGHT.inc(tool=name)
+        start = time.perf_counter()
+        outcome = "exception"
+        try:
+            result = await self._tool_manager.call_tool(name, arguments, context=context, convert_result=False)
+            with metrics.stage(name, "serialize"):
+                content = _convert_result(self._tool_manager.get_tool(name), result)
+            metrics.TOOL_RESULT_BYTES.observe(_content_bytes(content), tool=name)
+            outcome = "error" if isinstance(result, dict) and result.get("error") else "ok"
+            return content
+        finally:
+            metrics.TOOL_IN_FLIGHT.dec(tool=name)
+            metrics.TOOL_SECONDS.observe(time.perf_counter() - start, tool=name)
+            metrics.TOOL_CALLS.inc(tool=name, outcome=outcome)
+
+    def streamable_http_app(self):
+        """The HTTP app; its lifespan also runs the startup cache prewarm (prewarm.py)."""
+        app = super().streamable_http_app()
+        inner = app.router.lifespan_context
+
+        @contextlib.asynccontextmanager
+        async def lifespan(a):
+            async with inner(a):
+                task = asyncio.ensure_future(prewarm.PREWARMER.run_startup())
+                try:
+                    yield
+                finally:
+                    task.cancel()
+
+        app.router.lifespan_context = lifespan
+        return app
+
+
+# Local SQLite copy of the Flexi report (only when LANDSCAPE_SNAPSHOT_DB is set)
+_snapshot = landscape_snapshot.from_env()
+set_landscape_snapshot(_snapshot)
+
+
+mcp = InstrumentedFastMCP( 
     name="Test MCP Server",
     host="0.0.0.0",
     port=8050,
@@ -25,10 +109,7 @@ mcp = FastMCP(
 def greet(name: str) -> str:
     return f"Hello, {name}!"
 
-@mcp.tool()
-def search_system_flexi(fields: list[str], filters: list[str] = None,
-                         otype: str = "json",
-                         base_url: str = "https://dlm.wdf.sap.corp/slim"):
+def _flexi_request(fields: list[str], filters: list[str] | None, otype: str, base_url: str):
     query = ",".join(fields + (filters or []))
     url = f"{base_url}/report/flexi"
     params = {
@@ -37,18 +118,21 @@ def search_system_flexi(fields: list[str], filters: list[str] = None,
         "query": query
     }
     print("Calling Flexi:", url, "params=", params)
-    resp = requests.get(url, params=params, timeout=20, verify=False)
+    return url, params
+
 
+def _flexi_result(resp, otype: str):
+    """Shared response handling for the sync (requests) and async (httpx) Flexi tool."""
     try:
         resp.raise_for_status()
-    except requests.HTTPError as e:
+    except (requests.HTTPError, httpx.HTTPStatusError) as e:
         raise RuntimeError(
             f"HTTP error calling Flexi API: {e}, status={resp.status_code}, text={resp.text}"
         ) from e
 
     # Return parsed JSON entries if JSON was requested; otherwise raw text (XML/CSV)
     if otype.lower() == "json":
-        data = resp.json()
+        data = json_codec.loads(resp.content)
         # Prefer the typical structure data -> Entries, but fall back if different
         try:
             return data["data"]["Entries"]
@@ -56,13 +140,144 @@ def search_system_flexi(fields: list[str], filters: list[str] = None,
             return data
     else:
         return resp.text
-    
-@mcp.tool()
+
+
+# Concurrent identical tool calls (same Flexi query / same SID, systype and
+# sections) share one execution.
+_search_flight = SingleFlight("search")
+_view_flight = SingleFlight("view")
+
+
+def search_system_flexi(fields: list[str], filters: list[str] = None,
+                         otype: str = "json",
+                         base_url: str | None = None):
+    """Blocking variant, kept for scripts that call the tool function directly."""
+    url, params = _flexi_request(fields, filters, otype, base_url or cockpit_utils.FLEXI_BASE)
+    resp = get_client().get(url, params=params, timeout=20)
+    return _flexi_result(resp, otype)
+
+
+@mcp.tool(name="search_system_flexi")
+async def search_system_flexi_async(fields: list[str], filters: list[str] = None,
+                                    otype: str = "json",
+                                    base_url: str | None = None,
+                                    limit: int | None = None, offset: int | None = None,
+                                    cursor: str | None = None,
+                                    max_rows: int | None = None, max_bytes: int | None = None,
+                                    count_only: bool = False, group_by: str | None = None):
+    """
+    Query the SLIM Flexi report. JSON results come back as one page:
+    {"entries", "total", "offset", "returned", "truncated", "truncated_by",
+    "next_cursor"}. A page ends at `limit`, at `max_rows` (default
+    FLEXI_MAX_ROWS=200) or at `max_bytes` of JSON (default FLEXI_MAX_BYTES=64KB).
+    Pass `next_cursor` back as `cursor` (same fields/filters) for the next page.
+    A `limit` (given or from the cursor) outside 1..max_rows is an error.
+    `count_only` returns just the total, plus per-value counts with `group_by`.
+    Served from the local landscape snapshot when it is fresh and covers the
+    query ("source": "snapshot"), otherwise live from DLM; while DLM's
+    circuit breaker is open an older snapshot is used ("snapshot_stale").
+    """
+    base_url = base_url or cockpit_utils.FLEXI_BASE
+    key = flexi_paging.query_key(base_url, otype, "fields", *fields, "filters", *(filters or []))
+    try:
+        flexi_paging.check_limit(limit, max_rows)
+        if cursor:
+            offset, cursor_limit = flexi_paging.decode_cursor(cursor, key, max_rows)
+            limit = cursor_limit if limit is None else limit
+    except ValueError as e:
+        return {"error": str(e), "step": "paging"}
+
+    entries = flexi_paging.recall(key) if (cursor or offset) else None
+    source = "live"
+    if entries is None and _snapshot is not None and otype.lower() == "json":
+        try:
+            entries = _snapshot.search(fields, filters)
+        except Exception:
+            logging.getLogger("mcp.tool.search_system_flexi").exception("snapshot search failed")
+            entries = None
+        if entries is not None:
+            source = "snapshot"
+    if entries is None:
+        url, params = _flexi_request(fields, filters, otype, base_url)
+
+        async def fetch():
+            with metrics.stage("search_system_flexi", "fetch"):
+                resp = await get_async_client().get(url, params=params, timeout=20)
+            with metrics.stage("search_system_flexi", "normalize"):
+                return _flexi_result(resp, otype)
+
+        try:
+            entries = await _search_flight.do_async(key, fetch)
+        except resilience.CircuitOpenError:
+            # DLM is failing: answer from the snapshot however old, if it covers the query
+            entries = _snapshot.search(fields, filters, max_age=float("inf")) if _snapshot is not None else None
+            if entries is None:
+                raise
+            source = "snapshot_stale"
+        if not isinstance(entries, list):
+            # raw XML/CSV text or an unexpected JSON shape: nothing to page
+            return entries
+
+    if count_only:
+        return {**flexi_paging.aggregate(entries, group_by), "source": source}
+    page = flexi_paging.page_entries(entries, key, offset=offset or 0, limit=limit,
+                                     max_rows=max_rows, max_bytes=max_bytes)
+    if page["truncated"]:
+        flexi_paging.remember(key, entries)
+    page["source"] = source
+    return page
+
+
+def _save_debug_payload(logger, sid: str, objectid: str, raw):
+    """Persist the raw cockpit payload when DEBUG_COCKPIT_SAVE is set."""
+    if not os.environ.get("DEBUG_COCKPIT_SAVE"):
+        return
+    try:
+        debug_fn = f"cockpit_debug_{sid}_{objectid}.json"
+        with open(debug_fn, "w", encoding="utf-8") as fh:
+            if isinstance(raw, LazyObject):
+                fh.write(raw.text)   # the response body as received
+            elif isinstance(raw, dict):
+                json.dump(raw, fh, ensure_ascii=False, indent=2)
+            else:
+                fh.write(str(raw))
+        logger.info("saved raw cockpit payload to %s", debug_fn)
+    except Exception:
+        logger.exception("failed to save debug payload")
+
+
+def _build_view(logger, raw, sections: list[str] | None, res: dict, start: float,
+                tool: str = "cockpit_get_view_by_sid"):
+    """Steps 3-4 of the cockpit tool: validate payload type and normalize."""
+    # 3) validate payload type (dict, or LazyObject from the payload cache)
+    if not isinstance(raw, Mapping):
+        preview = str(raw)[:800]
+        logger.error("cockpit payload is not JSON object; preview=%s", preview)
+        return {"error": "Cockpit payload is not a JSON object", "step": "fetch", "payload_preview": preview}
+
+    # 4) normalize
+    try:
+        with metrics.stage(tool, "normalize"):
+            view = _normalize_cockpit(raw, sections)
+        logger.info("normalized cockpit view keys=%s", list(view.keys()))
+    except Exception as e:
+        tb = traceback.format_exc()
+        logger.exception("normalize failed: %s", e)
+        return {"error": f"Failed to normalize cockpit payload: {e}", "step": "normalize", "trace": tb}
+
+    view["_resolved"] = res
+    elapsed = time.time() - start
+    logger.info("completed cockpit_get_view_by_sid in %.3fs", elapsed)
+    return view
+
+
 def cockpit_get_view_by_sid(sid: str, systype: str | None = None, sections: list[str] | None = None):
     """
     Resolve SID -> objectid, fetch cockpit, normalize and return view.
     Improved traceability: logs each step, returns traceback on error and
     optionally saves raw payload when DEBUG_COCKPIT_SAVE env var is set.
+    Blocking variant, kept for scripts that call the tool function directly;
+    the MCP server registers cockpit_get_view_by_sid_async under this name.
     """
     logger = logging.getLogger("mcp.tool.cockpit_get_view_by_sid")
     start = time.time()
@@ -71,7 +286,8 @@ def cockpit_get_view_by_sid(sid: str, systype: str | None = None, sections: list
 
     # 1) resolve
     try:
-        res = _resolve_objectid_from_sid(sid=sid, systype=systype)
+        with metrics.stage("cockpit_get_view_by_sid", "resolve"):
+            res = _resolve_objectid_from_sid(sid=sid, systype=systype)
         logger.info("resolved SID -> objectid: %s", res.get("objectid"))
     except Exception as e:
         tb = traceback.format_exc()
@@ -86,7 +302,8 @@ def cockpit_get_view_by_sid(sid: str, systype: str | None = None, sections: list
 
     # 2) fetch cockpit
     try:
-        raw = _fetch_cockpit(objectid=objectid, systype=systype or "ABAPSystem")
+        with metrics.stage("cockpit_get_view_by_sid", "fetch"):
+            raw = _fetch_cockpit(objectid=objectid, systype=systype or "ABAPSystem")
         if isinstance(raw, dict):
             logger.info("fetched cockpit payload (dict) keys=%s", list(raw.keys()))
         else:
@@ -97,39 +314,211 @@ def cockpit_get_view_by_sid(sid: str, systype: str | None = None, sections: list
         return {"error": f"Failed to fetch cockpit for objectid {objectid}: {e}", "step": "fetch", "trace": tb}
 
     # optional: persist raw payload for debugging if env var set
-    if os.environ.get("DEBUG_COCKPIT_SAVE"):
+    _save_debug_payload(logger, sid, objectid, raw)
+    return _build_view(logger, raw, sections, res, start)
+
+
+@mcp.tool(name="cockpit_get_view_by_sid")
+async def cockpit_get_view_by_sid_async(sid: str, systype: str | None = None, sections: list[str] | None = None):
+    """
+    Resolve SID -> objectid, fetch cockpit, normalize and return view.
+    Improved traceability: logs each step, returns traceback on error and
+    optionally saves raw payload when DEBUG_COCKPIT_SAVE env var is set.
+    """
+    logger = logging.getLogger("mcp.tool.cockpit_get_view_by_sid")
+    start = time.time()
+    ctx = {"sid": sid, "systype": systype, "sections": sections}
+    logger.info("starting cockpit_get_view_by_sid %s", ctx)
+    prewarm.HOT.record(sid, systype)
+
+    async def build():
+        # 1) resolve
         try:
-            debug_fn = f"cockpit_debug_{sid}_{objectid}.json"
-            with open(debug_fn, "w", encoding="utf-8") as fh:
-                if isinstance(raw, dict):
-                    json.dump(raw, fh, ensure_ascii=False, indent=2)
-                else:
-                    fh.write(str(raw))
-            logger.info("saved raw cockpit payload to %s", debug_fn)
-        except Exception:
-            logger.exception("failed to save debug payload")
+            with metrics.stage("cockpit_get_view_by_sid", "resolve"):
+                res = await _resolve_objectid_from_sid_async(sid=sid, systype=systype)
+            logger.info("resolved SID -> objectid: %s", res.get("objectid"))
+        except Exception as e:
+            tb = traceback.format_exc()
+            logger.exception("resolve_objectid failed: %s", e)
+            return {"error": f"Failed to resolve object id from SID '{sid}': {e}", "step": "resolve", "trace": tb}
 
-    # 3) validate payload type
-    if not isinstance(raw, dict):
-        preview = str(raw)[:800]
-        logger.error("cockpit payload is not JSON object; preview=%s", preview)
-        return {"error": "Cockpit payload is not a JSON object", "step": "fetch", "payload_preview": preview}
+        return await _view_for_resolved_async(logger, sid, res, systype, sections, start)
 
-    # 4) normalize
+    key = (sid.strip().upper(), (systype or "").lower(), tuple(sections) if sections else None)
+    return await _view_flight.do_async(key, build)
+
+
+async def _view_for_resolved_async(logger, sid: str, res: dict, systype: str | None,
+                                   sections: list[str] | None, start: float,
+                                   tool: str = "cockpit_get_view_by_sid"):
+    """Steps 2-4 of the async cockpit tool for an already resolved SID."""
+    objectid = res.get("objectid")
+    if not objectid:
+        msg = f"Resolver returned no objectid for SID '{sid}'"
+        logger.error(msg + " resolver_result=%s", res)
+        return {"error": msg, "step": "resolve", "resolver_result": res}
+
+    # 2) fetch cockpit (through the payload cache)
     try:
-        view = _normalize_cockpit(raw, sections)
-        logger.info("normalized cockpit view keys=%s", list(view.keys()))
+        with metrics.stage(tool, "fetch"):
+            raw, cache_info = await _fetch_cockpit_cached_async(objectid=objectid, systype=systype or "ABAPSystem")
+        logger.info("fetched cockpit payload (%s, age %.1fs) keys=%s",
+                    cache_info["status"], cache_info["age_seconds"], list(raw.keys()))
     except Exception as e:
         tb = traceback.format_exc()
-        logger.exception("normalize failed: %s", e)
-        return {"error": f"Failed to normalize cockpit payload: {e}", "step": "normalize", "trace": tb}
+        logger.exception("fetch_cockpit failed: %s", e)
+        return {"error": f"Failed to fetch cockpit for objectid {objectid}: {e}", "step": "fetch", "trace": tb}
 
-    view["_resolved"] = res
-    elapsed = time.time() - start
-    logger.info("completed cockpit_get_view_by_sid in %.3fs", elapsed)
+    if cache_info["status"] == "miss":
+        _save_debug_payload(logger, sid, objectid, raw)
+    view = _build_view(logger, raw, sections, res, start, tool=tool)
+    if "error" not in view:
+        # lets the LLM tell the user how fresh the data is
+        view["_cache"] = cache_info
     return view
 
 
+@mcp.tool()
+async def cockpit_get_views_by_sids(sids: list[str], systype: str | None = None,
+                                    sections: list[str] | None = None,
+                                    max_concurrency: int | None = None):
+    """
+    Cockpit views for many SIDs in one call. All SIDs are resolved with a
+    single Flexi query; cockpits are fetched in parallel, at most
+    `max_concurrency` at a time (default and upper bound DLM_BATCH_CONCURRENCY
+    or 8, so a caller can lower but never raise the load on DLM).
+    Returns one entry per SID; a failing SID carries an "error" and does
+    not fail the batch.
+    """
+    logger = logging.getLogger("mcp.tool.cockpit_get_views_by_sids")
+    start = time.time()
+    # de-duplicate, keep the caller's order
+    sids = list(dict.fromkeys(s.strip().upper() for s in sids if s and s.strip()))
+    cap = max(1, int(os.environ.get("DLM_BATCH_CONCURRENCY", "8")))
+    limit = min(max(1, max_concurrency or cap), cap)
+    logger.info("starting cockpit_get_views_by_sids sids=%s systype=%s concurrency=%d", sids, systype, limit)
+    for sid in sids:
+        prewarm.HOT.record(sid, systype)
+
+    with metrics.stage("cockpit_get_views_by_sids", "resolve"):
+        resolved = await _resolve_objectids_from_sids_async(sids, systype)
+    sem = asyncio.Semaphore(limit)
+
+    async def one(sid: str):
+        res = resolved[sid]
+        if isinstance(res, Exception):
+            return {"error": f"Failed to resolve object id from SID '{sid}': {res}", "step": "resolve"}
+        async with sem:
+            return await _view_for_resolved_async(logger, sid, res, systype, sections, time.time(),
+                                                  tool="cockpit_get_views_by_sids")
+
+    views = await asyncio.gather(*(one(sid) for sid in sids))
+    results = dict(zip(sids, views))
+    failed = [sid for sid, v in results.items() if isinstance(v, dict) and v.get("error")]
+    logger.info("completed cockpit_get_views_by_sids for %d SIDs (%d failed) in %.3fs",
+                len(sids), len(failed), time.time() - start)
+    return {"results": results, "ok": len(sids) - len(failed), "failed": failed}
+
+
+@mcp.tool()
+async def backend_pool_stats():
+    """
+    Keep-alive pool statistics for DLM/SLIM backend calls (connections opened
+    vs. reused), how many calls were coalesced into an identical in-flight one,
+    and per-endpoint circuit breaker state, latency percentiles and hedge delay.
+    """
+    return {"sync": get_client().pool_stats(), "async": get_async_client().pool_stats(),
+            "coalescing": {**coalescing_stats(), "search": _search_flight.stats(), "view": _view_flight.stats()},
+            "resilience": resilience.stats(),
+            "fixtures": fixtures.get_store().stats() if fixtures.MODE != "off" else {"mode": "off"}}
+
+
+@mcp.tool()
+def sid_resolve_cache_stats():
+    """Hit/miss/eviction counters of the SID -> objectid resolution cache, plus resolver mode and candidate wins."""
+    return {**resolve_cache_stats(), "resolver": resolver_stats()}
+
+
+@mcp.tool()
+def cockpit_payload_cache_stats():
+    """Entries, bytes and hit/stale/revalidated counters of the cockpit payload cache."""
+    return cockpit_cache_stats()
+
+
+@mcp.tool()
+def sid_resolve_cache_invalidate(sid: str | None = None, systype: str | None = None):
+    """Drop cached SID resolutions (one SID, one SID+systype, or everything when sid is omitted)."""
+    return {"invalidated": invalidate_resolve_cache(sid=sid, systype=systype)}
+
+
+
+@mcp.tool()
+async def landscape_snapshot_status(refresh: bool = False, sync: bool = False):
+    """
+    State of the local landscape snapshot (rows, age, freshness, last sync).
+    refresh=True reloads it fully now; sync=True runs one incremental sync cycle.
+    """
+    if _snapshot is None:
+        return {"enabled": False, "hint": "set LANDSCAPE_SNAPSHOT_DB to enable"}
+    if refresh:
+        await asyncio.to_thread(_snapshot.refresh)
+    elif sync:
+        await asyncio.to_thread(_snapshot.sync)
+    return {"enabled": True, **_snapshot.status()}
+
+
+@mcp.tool()
+async def cache_prewarm(sids: list[str] | None = None, systype: str | None = None, wait: bool = True):
+    """
+    Warm the SID resolution and cockpit payload caches for the given SIDs,
+    or (default) for the configured and most requested ones. wait=False
+    starts the run in the background and returns at once.
+    """
+    targets = [(s.strip().upper(), systype) for s in sids if s and s.strip()] if sids else None
+    if wait:
+        return {**prewarm.PREWARMER.status(), "run": await prewarm.PREWARMER.run(targets)}
+    task = asyncio.ensure_future(prewarm.PREWARMER.run(targets))
+    cockpit_utils._background_tasks.add(task)
+    task.add_done_callback(cockpit_utils._background_tasks.discard)
+    return {**prewarm.PREWARMER.status(), "run": "started"}
+
+
+@metrics.REGISTRY.register_collector
+def _snapshot_metrics():
+    if _snapshot is None:
+        return
+    st = _snapshot.status()
+    yield ("landscape_snapshot_rows", "gauge", "Rows in the local landscape snapshot.", [({}, st.get("rows", 0))])
+    if st.get("age_seconds") is not None:
+        yield ("landscape_snapshot_age_seconds", "gauge", "Age of the local landscape snapshot.",
+               [({}, st["age_seconds"])])
+
+
+@mcp.resource("metrics://server", mime_type="text/plain")
+def server_metrics() -> str:
+    """Latency histograms, backend status codes/sizes, cache and pool counters (Prometheus text format)."""
+    return metrics.render()
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    # scrape target next to /mcp, e.g. http://localhost:8050/metrics
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@mcp.custom_route("/healthz", methods=["GET"])
+async def healthz(request: Request) -> JSONResponse:
+    # liveness: the process is up and serving HTTP
+    return JSONResponse({"status": "ok"})
+
+
+@mcp.custom_route("/readyz", methods=["GET"])
+async def readyz(request: Request) -> JSONResponse:
+    # readiness for the load balancer: 503 until the startup prewarm is done
+    status = prewarm.PREWARMER.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
 if __name__ == "__main__":
     # asyncio.run(print_tools())
     print("⚡ Starting server with session validation...")
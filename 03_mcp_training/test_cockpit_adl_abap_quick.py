@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 """Quick test for cockpit_get_view_by_sid('ADL', systype='ABAPSystem')
 Saves full JSON to cockpit_ADL_ABAP_test.json and prints a short summary.
+Runs offline against recorded backend responses with
+DLM_FIXTURES_MODE=replay (record them once with DLM_FIXTURES_MODE=record).
 """
 import json
 import traceback
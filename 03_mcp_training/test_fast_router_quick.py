@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Quick regression checks for fast_router: what is routed without the LLM and what is not.
+Runs offline (no server, no LLM): python test_fast_router_quick.py, or under pytest.
+"""
+from fast_router import FastRouter
+
+KNOWN_SIDS = {"ERX", "ADL", "CC3"}
+
+
+def test_known_sids_are_routed():
+    router = FastRouter(sids=KNOWN_SIDS)
+    route = router.route("show overview of ERX")
+    assert route is not None and route.tool == "cockpit_get_view_by_sid" and route.arguments == {"sid": "ERX"}
+    route = router.route("status of ERX, ADL and CC3")
+    assert route is not None and route.arguments == {"sids": ["ERX", "ADL", "CC3"]}
+
+
+def test_common_uppercase_words_are_not_routed_as_sids():
+    router = FastRouter(sids=KNOWN_SIDS)
+    for prompt in ["show KPI for ERX", "show KPI", "status of the SQL layer", "FAQ for ADL",
+                   "ETA of ERX upgrade", "show CSV of ADL"]:
+        route = router.route(prompt)
+        sids = [] if route is None else route.arguments.get("sids") or [route.arguments.get("sid")]
+        assert not set(sids) - KNOWN_SIDS, (prompt, sids)
+    # an uppercase word nobody listed is not trusted as a SID either
+    assert router.route("show XYZ for ERX") is None
+    assert router.route("show XYZ") is None
+
+
+def test_unknown_sid_goes_to_the_llm_until_learned():
+    router = FastRouter(sids=KNOWN_SIDS)
+    assert router.route("show overview of QX7") is None
+    router.learn("cockpit_get_view_by_sid", {"sid": "QX7"}, {"system_details": {"sid": "QX7"}})
+    route = router.route("show overview of QX7")
+    assert route is not None and route.arguments == {"sid": "QX7"}
+
+
+def test_filter_search_is_routed():
+    route = FastRouter().route("list live HANA systems in cluster Core 2")
+    assert route is not None and route.tool == "search_system_flexi"
+    assert route.arguments["filters"] == ["status|Live", "systemtype|HANADatabase", "cluster|Core 2"]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
@@ -0,0 +1,193 @@
+# tool_compaction.py
+"""
+Compaction of tool results before they go back to the LLM.
+
+A cockpit view carries every client and software component; a Flexi page up
+to 200 rows that repeat the same keys. Fed back verbatim as a tool message
+they inflate the second turn's prompt tokens, latency and cost. compact()
+shrinks a result in stages and stops as soon as it fits the token budget:
+
+    1. projection     drop debug keys ("trace", "payload_preview", ...) and
+                      empty values (None, "", [], {}); the cache freshness
+                      ("_cache") and the resolved system ("_resolved") stay,
+                      reduced to the fields the answer can use
+    2. tables         lists of dicts become {"columns": [...], "rows": [[...]]},
+                      so repeated keys are written once
+    3. truncation     long lists keep their first items plus a count of the
+                      rest ({"omitted": 180, "total": 200}); long strings are
+                      cut; both limits shrink until the budget is met
+    4. hard cut       as a last resort the text is cut at the budget
+
+Tokens are counted with tiktoken (the gpt-4o encoding) when it is installed
+and its encoding can be loaded, otherwise estimated at 4 characters per
+token; `TOKENIZER` says which. Every compaction returns its stats
+(tokens_before, tokens_after, saved, steps); CompactionStats adds them up
+per query.
+
+Configuration (env vars):
+    TOOL_RESULT_COMPACTION     1 (default) = on, 0 = results are sent verbatim
+    TOOL_RESULT_TOKEN_BUDGET   tokens per tool message (default 3000)
+    TOOL_RESULT_MAX_ITEMS      list items kept by the first truncation step (default 50)
+"""
+import os
+
+import json_codec
+
+ENABLED = os.environ.get("TOOL_RESULT_COMPACTION", "1") != "0"
+TOKEN_BUDGET = int(os.environ.get("TOOL_RESULT_TOKEN_BUDGET", "3000"))
+MAX_ITEMS = int(os.environ.get("TOOL_RESULT_MAX_ITEMS", "50"))
+
+# keys that only matter for debugging, never for the answer
+DROP_KEYS = {"trace", "payload_preview", "resolver_result"}
+# metadata the answer needs (how fresh the view is, which system it is), reduced to these fields
+META_FIELDS = {"_cache": ("status", "age_seconds", "backend_error"),
+               "_resolved": ("sid", "objectid", "systemtype")}
+# (max list items, max string length) tried in turn until a result fits;
+# MAX_ITEMS caps the first truncating step
+_LIMITS = [(None, None), (MAX_ITEMS, None), (20, 400), (10, 200), (5, 120), (2, 80)]
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encoding = None
+TOKENIZER = None    # "o200k_base" or "estimate", known after the first count
+
+
+def _load_encoding():
+    # loaded on first use: tiktoken downloads the encoding file the first time
+    global _encoding, TOKENIZER
+    if TOKENIZER is None:
+        try:
+            _encoding = tiktoken.encoding_for_model("gpt-4o")
+            TOKENIZER = _encoding.name
+        except Exception:   # not installed, or the encoding file cannot be downloaded
+            TOKENIZER = "estimate"
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _load_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def project(value):
+    """Drop DROP_KEYS and empty values and reduce META_FIELDS metadata, recursively."""
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            if k in DROP_KEYS:
+                continue
+            if k in META_FIELDS and isinstance(v, dict):
+                v = {f: v[f] for f in META_FIELDS[k] if f in v}
+            v = project(v)
+            if v not in (None, "", [], {}):
+                out[k] = v
+        return out
+    if isinstance(value, (list, tuple)):
+        return [project(v) for v in value]
+    return value
+
+
+def tabulate(value):
+    """Lists of two or more dicts -> {"columns", "rows"}, recursively."""
+    if isinstance(value, dict):
+        return {k: tabulate(v) for k, v in value.items()}
+    if isinstance(value, list):
+        if len(value) > 1 and all(isinstance(v, dict) for v in value):
+            columns = list(dict.fromkeys(k for row in value for k in row))
+            return {"columns": columns,
+                    "rows": [[tabulate(row.get(c)) for c in columns] for row in value]}
+        return [tabulate(v) for v in value]
+    return value
+
+
+def truncate(value, max_items: int | None, max_chars: int | None):
+    """Keep the first max_items of every list (with a count of the rest) and cut long strings."""
+    if isinstance(value, dict):
+        if set(value) >= {"columns", "rows"}:
+            rows = value["rows"]
+            kept = rows if max_items is None else rows[:max_items]
+            table = {**value, "rows": [[truncate(cell, max_items, max_chars) for cell in row] for row in kept]}
+            if len(kept) < len(rows):
+                table.update(omitted_rows=len(rows) - len(kept), total_rows=len(rows))
+            return table
+        return {k: truncate(v, max_items, max_chars) for k, v in value.items()}
+    if isinstance(value, list):
+        kept = [truncate(v, max_items, max_chars) for v in value[:max_items]]
+        if max_items is not None and len(value) > max_items:
+            kept.append({"omitted": len(value) - max_items, "total": len(value)})
+        return kept
+    if isinstance(value, str) and max_chars is not None and len(value) > max_chars:
+        return value[:max_chars] + f"… (+{len(value) - max_chars} chars)"
+    return value
+
+
+def _hard_cut(text: str, budget: int) -> str:
+    encoding = _load_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:budget]) + f" … [cut: {len(tokens) - budget} more tokens]"
+    return text[:budget * 4] + f" … [cut: ~{count_tokens(text) - budget} more tokens]"
+
+
+def compact(result, budget: int = TOKEN_BUDGET, max_items: int = MAX_ITEMS) -> tuple[str, dict]:
+    """
+    The tool message text for `result` (JSON, within `budget` tokens where
+    the data allows) and stats: tokens_before (verbatim JSON), tokens_after,
+    saved and the steps applied.
+    """
+    text = result if isinstance(result, str) else json_codec.dumps(result)
+    before = count_tokens(text)
+    stats = {"tokens_before": before, "tokens_after": before, "saved": 0, "steps": []}
+    if not ENABLED or isinstance(result, str):
+        if ENABLED and before > budget:
+            text = _hard_cut(text, budget)
+            stats["steps"].append("cut")
+            stats["tokens_after"] = count_tokens(text)
+            stats["saved"] = before - stats["tokens_after"]
+        return text, stats
+
+    value = tabulate(project(result))
+    steps = ["project", "tabulate"]
+    for items, chars in _LIMITS:
+        items = items if items is None else min(items, max_items)
+        candidate = json_codec.dumps(truncate(value, items, chars))
+        tokens = count_tokens(candidate)
+        if tokens <= budget:
+            break
+    if items is not None:
+        steps.append(f"truncate(items={items}, chars={chars})")
+    if tokens > budget:
+        candidate = _hard_cut(candidate, budget)
+        tokens = count_tokens(candidate)
+        steps.append("cut")
+    # never send more than the verbatim result
+    if tokens >= before:
+        return text, stats
+    stats.update(tokens_after=tokens, saved=before - tokens, steps=steps)
+    return candidate, stats
+
+
+class CompactionStats:
+    """Token totals of the compactions of one query (or of a whole session)."""
+
+    def __init__(self):
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.messages = 0
+
+    def add(self, stats: dict):
+        self.tokens_before += stats["tokens_before"]
+        self.tokens_after += stats["tokens_after"]
+        self.messages += 1
+
+    def as_dict(self) -> dict:
+        saved = self.tokens_before - self.tokens_after
+        return {"messages": self.messages, "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after, "saved": saved,
+                "saved_pct": round(100 * saved / self.tokens_before, 1) if self.tokens_before else 0.0,
+                "tokenizer": TOKENIZER or "estimate"}
@@ -1,5 +1,7 @@
 import json
+import time
 import asyncio
+import functools
 from mcp import ClientSession
 from mcp.client.sse import sse_client
 from gen_ai_hub.orchestration.models.llm import LLM
@@ -8,13 +10,25 @@ from gen_ai_hub.orchestration.models.template import Template
 from gen_ai_hub.orchestration.models.config import OrchestrationConfig
 from gen_ai_hub.orchestration.service import OrchestrationService
 from gen_ai_hub.orchestration.models.response_format import ResponseFormatJsonSchema
+from utils import (run_tool_calls, run_orchestration, ToolCatalog, ResponseCache, context_hash,
+                   compact_tool_result, parse_json_text, TOOL_CONCURRENCY, TOOL_TIMEOUT, TOOL_RESULT_TOKEN_BUDGET)
 
 
 class MCPAgentExecutor:
-    def __init__(self, llm, mcp_session: ClientSession, verbose=True):
+    def __init__(self, llm, mcp_session: ClientSession, verbose=True,
+                 max_concurrency=TOOL_CONCURRENCY, tool_timeouts: dict | None = None,
+                 tool_catalog: ToolCatalog | None = None, response_cache: ResponseCache | None = None):
         self.llm = llm
         self.session = mcp_session
         self.verbose = verbose
+        # repeated questions reuse the tool choice and, over the same tool results, the answer
+        self.response_cache = response_cache
+        self.last_tool_tokens = None   # tool-result tokens before/after compaction, last answer
+        # tool list + rendered instruction, re-listed only on tools/list_changed or TTL
+        self.catalog = tool_catalog or ToolCatalog()
+        # tool calls of one answer run concurrently over the (multiplexed) MCP session
+        self.max_concurrency = max_concurrency
+        self.tool_timeouts = tool_timeouts or {}   # tool name -> seconds, default TOOL_TIMEOUT
 
     def _build_dynamic_schema(self):
         return {
@@ -39,7 +53,11 @@ class MCPAgentExecutor:
         }
 
     async def _generate_instruction(self):
-        description = json.dumps(await self.list_tools(), indent=2)
+        await self.catalog.get(self.session)
+        return self.catalog.render("instruction", self._render_instruction)
+
+    def _render_instruction(self, tools):
+        description = json.dumps(self._describe_tools(tools), indent=2)
         return f"""
         You are an intelligent AI assistant capable of deciding whether to invoke tools based on the user's request.
 
@@ -81,21 +99,30 @@ class MCPAgentExecutor:
         """
 
     async def list_tools(self):
-        tools_result = await self.session.list_tools()
-        return {tool.name: {"description": tool.description} for tool in tools_result.tools}    
-
-
-    async def _execute_tool(self, decision):
-        func = decision["function"]
-        args = decision.get("parameters", {})
-
-        try:
-            result = await self.session.call_tool(func, arguments=args)
-            if self.verbose:
-                print(f"\nTool '{func}' executed. Result: {result.content[0].text}")
-            return result.content[0].text
-        except Exception as e:
-            return f"Error: {str(e)}"
+        await self.catalog.get(self.session)
+        return self.catalog.render("descriptions", self._describe_tools)
+
+    @staticmethod
+    def _describe_tools(tools):
+        return {tool.name: {"description": tool.description} for tool in tools}
+
+
+    async def _call_tool(self, func, /, **args):
+        result = await self.session.call_tool(func, arguments=args)
+        return result.content[0].text
+
+    async def _execute_tools(self, decisions):
+        """Execute the tools of `decisions` concurrently; one result per decision, in order."""
+        calls = [(d["function"], functools.partial(self._call_tool, d["function"]), d.get("parameters", {}),
+                  self.tool_timeouts.get(d["function"], TOOL_TIMEOUT)) for d in decisions]
+        results = []
+        for (func, _, _, _), (result, seconds) in zip(calls, await run_tool_calls(calls, self.max_concurrency)):
+            if isinstance(result, Exception):
+                result = f"Error: {str(result)}"
+            elif self.verbose:
+                print(f"\nTool '{func}' executed in {seconds:.2f}s. Result: {result}")
+            results.append(result)
+        return results
     
     
     async def _finalize_response(self, original_query, tool_results, messages):
@@ -113,37 +140,65 @@ class MCPAgentExecutor:
 
         messages.append(UserMessage(f"User question: {original_query}"))
 
-        # Structured, clean summary of tool outputs
+        # Structured, clean summary of tool outputs, compacted so the message stays within the token budget
+        budget = TOOL_RESULT_TOKEN_BUDGET // max(len(tool_results), 1)
+        compacted = [(name, compact_tool_result(result, budget)) for name, result in tool_results]
         tool_summary = "\n".join(
-            [f"- Tool `{name}` returned: {json.dumps(result)}" for name, result in tool_results]
+            [f"- Tool `{name}` returned: {text}" for name, (text, _, _) in compacted]
         )
         messages.append(UserMessage(f"Tool Results:\n{tool_summary}"))
-
-
-        # Final orchestration
+        self.last_tool_tokens = {"before": sum(b for _, (_, b, _) in compacted),
+                                 "after": sum(a for _, (_, _, a) in compacted)}
+        if self.verbose and compacted:
+            saved = self.last_tool_tokens["before"] - self.last_tool_tokens["after"]
+            print(f"\nTool results: {self.last_tool_tokens['before']} -> {self.last_tool_tokens['after']} tokens "
+                  f"(saved {saved}).")
+
+
+        # Final orchestration, unless this question was already answered over the same tool results
+        # parsed, so metadata inside JSON text ("_cache" ages) does not change the key
+        cache_key = context_hash([(name, parse_json_text(result)) for name, result in tool_results])
+        if (cached := await self.response_cache.aget("answer", original_query, cache_key) if self.response_cache else None) is not None:
+            return cached
         template = Template(messages=messages, response_format="text")
         config = OrchestrationConfig(template=template, llm=self.llm)
-        response = OrchestrationService(config=config).run()
-        return response.module_results.llm.choices[0].message.content    
+        start = time.perf_counter()
+        response = await run_orchestration(OrchestrationService(config=config))
+        answer = response.module_results.llm.choices[0].message.content
+        # answers over failed tools are not reused: the next attempt may succeed
+        failed = any(isinstance(result, str) and result.startswith("Error:") for _, result in tool_results)
+        if self.response_cache and not failed:
+            await self.response_cache.aput("answer", original_query, cache_key, answer, time.perf_counter() - start)
+        return answer
     
 
     async def run(self, user_query: str):
-        system_message = SystemMessage(await self._generate_instruction())
+        instruction = await self._generate_instruction()
+        system_message = SystemMessage(instruction)
         prompt = UserMessage(user_query)
         messages = [system_message, prompt]
 
-        template = Template(
-            messages=messages,
-            response_format=ResponseFormatJsonSchema(
-                name="ToolCall",
-                description="Tool execution format",
-                schema=self._build_dynamic_schema()
+        # the tool choice is reused while the question and the offered tools (the instruction) are the same
+        cache_key = context_hash(instruction)
+        decisions_json = await self.response_cache.aget("tools", user_query, cache_key) if self.response_cache else None
+        if decisions_json is None:
+            template = Template(
+                messages=messages,
+                response_format=ResponseFormatJsonSchema(
+                    name="ToolCall",
+                    description="Tool execution format",
+                    schema=self._build_dynamic_schema()
+                )
             )
-        )
-        config = OrchestrationConfig(template=template, llm=self.llm)
-        response = OrchestrationService(config=config).run()
+            config = OrchestrationConfig(template=template, llm=self.llm)
+            start = time.perf_counter()
+            response = await run_orchestration(OrchestrationService(config=config))
 
-        decisions_json = json.loads(response.module_results.llm.choices[0].message.content)
+            decisions_json = json.loads(response.module_results.llm.choices[0].message.content)
+            if self.response_cache:
+                await self.response_cache.aput("tools", user_query, cache_key, decisions_json, time.perf_counter() - start)
+        elif self.verbose:
+            print("\nTool choice from response cache.")
 
         if self.verbose:
             print("\nLLM Reasoning:")
@@ -152,24 +207,26 @@ class MCPAgentExecutor:
         tool_results = []
         messages = [system_message, prompt]
 
-        for decision in decisions_json.get("tool_calls", []):
+        decisions = decisions_json.get("tool_calls", [])
+        # all chosen tools run at once; results are used in the order the LLM gave them
+        executed = iter(await self._execute_tools([d for d in decisions if d.get("decision") == "tool"]))
+        for decision in decisions:
             if decision.get("decision") == "tool":
-                tool_response = await self._execute_tool(decision)
-                tool_results.append((decision["function"], tool_response))
-                messages.append(AssistantMessage(json.dumps(decision)))
-            else:
-                messages.append(AssistantMessage(json.dumps(decision)))
+                tool_results.append((decision["function"], next(executed)))
+            messages.append(AssistantMessage(json.dumps(decision)))
 
         return await self._finalize_response(user_query, tool_results, messages)
 
 
 async def main():
     async with sse_client("https://<your-mcp-server>/sse") as (read_stream, write_stream):
-        async with ClientSession(read_stream, write_stream) as session:
+        catalog = ToolCatalog()
+        async with ClientSession(read_stream, write_stream, message_handler=catalog.handle_message) as session:
             await session.initialize()
             
             llm = LLM(name="gpt-4o", version="latest", parameters={"max_tokens": 2000, "temperature": 0.2})
-            agent = MCPAgentExecutor(llm=llm, mcp_session=session, verbose=True)
+            agent = MCPAgentExecutor(llm=llm, mcp_session=session, verbose=True, tool_catalog=catalog,
+                                     response_cache=ResponseCache.from_env())
             
             prompt = "Can you give me a bread recipe and also tell me: how’s the weather in Brazil, what time it is now, and what is the role of SAP Datasphere in SAP Business Data Cloud?"
             print(f"Prompt: {prompt}")
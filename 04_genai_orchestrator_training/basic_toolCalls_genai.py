@@ -1,6 +1,9 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from tools import get_time_now, get_weather, retriever
-from utils import ToolRegistry
+from utils import (ToolRegistry, run_tool_calls_sync, ResponseCache, context_hash, compact_tool_result,
+                   parse_json_text, TOOL_CONCURRENCY, TOOL_RESULT_TOKEN_BUDGET)
 
 from gen_ai_hub.orchestration.models.message import SystemMessage, UserMessage, AssistantMessage
 from gen_ai_hub.orchestration.models.template import Template, TemplateValue
@@ -34,7 +37,8 @@ registry.register(
     "Retrieves an answer using RAG from documents stored in SAP HANA Cloud for SAP Business Data Cloud and SAP Generative AI Hub in SAP AI Core content",
     {
         "question": "string - The question you want to ask based on the document context."
-    }
+    },
+    timeout=120,  # RAG: embedding + retrieval + LLM
 )
 
 # description = json.dumps(registry.get_description_for_prompt(), indent=2)
@@ -42,10 +46,17 @@ registry.register(
 
 
 class AgentExecutor:
-    def __init__(self, llm, tool_registry, verbose=True):
+    def __init__(self, llm, tool_registry, verbose=True, max_concurrency=TOOL_CONCURRENCY,
+                 response_cache: ResponseCache | None = None):
         self.llm = llm
         self.tool_registry = tool_registry
         self.verbose = verbose
+        # repeated questions reuse the tool choice and, over the same tool results, the answer
+        self.response_cache = response_cache
+        self.last_tool_tokens = None   # tool-result tokens before/after compaction, last answer
+        # tool calls of one answer run concurrently in this pool, at most max_concurrency at once
+        self.max_concurrency = max_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=max(max_concurrency, 1), thread_name_prefix="tool")
 
     def _build_dynamic_schema(self):
         return {
@@ -104,23 +115,32 @@ class AgentExecutor:
                 """
 
     def run(self, user_query: str):
-        system_message = SystemMessage(self._generate_instruction())
+        instruction = self._generate_instruction()
+        system_message = SystemMessage(instruction)
         prompt = UserMessage(user_query)
         messages = [system_message, prompt]
 
-        # Step 1: Ask which tools to use
-        template = Template(
-            messages=messages,
-            response_format=ResponseFormatJsonSchema(
-                name="ToolCall",
-                description="Tool execution format",
-                schema=self._build_dynamic_schema()
+        # Step 1: Ask which tools to use (unless this question was already asked with these tools)
+        cache_key = context_hash(instruction)
+        decisions_json = self.response_cache.get("tools", user_query, cache_key) if self.response_cache else None
+        if decisions_json is None:
+            template = Template(
+                messages=messages,
+                response_format=ResponseFormatJsonSchema(
+                    name="ToolCall",
+                    description="Tool execution format",
+                    schema=self._build_dynamic_schema()
+                )
             )
-        )
-        config = OrchestrationConfig(template=template, llm=self.llm)
-        response = OrchestrationService(config=config).run()
-        
-        decisions_json = json.loads(response.module_results.llm.choices[0].message.content)
+            config = OrchestrationConfig(template=template, llm=self.llm)
+            start = time.perf_counter()
+            response = OrchestrationService(config=config).run()
+
+            decisions_json = json.loads(response.module_results.llm.choices[0].message.content)
+            if self.response_cache:
+                self.response_cache.put("tools", user_query, cache_key, decisions_json, time.perf_counter() - start)
+        elif self.verbose:
+            print("\nTool choice from response cache.")
 
         if self.verbose:
             print("\nLLM Reasoning:")
@@ -129,32 +149,40 @@ class AgentExecutor:
         tool_results = []
         messages = [system_message, prompt]
 
-        for decision in decisions_json.get("tool_calls", []):
+        decisions = decisions_json.get("tool_calls", [])
+        # all chosen tools run at once; results are used in the order the LLM gave them
+        executed = iter(self._execute_tools([d for d in decisions if d.get("decision") == "tool"]))
+        for decision in decisions:
             if decision.get("decision") == "tool":
-                tool_response = self._execute_tool(decision)
-                tool_results.append((decision["function"], tool_response))
-                messages.append(AssistantMessage(json.dumps(decision)))
-            else:
-                messages.append(AssistantMessage(json.dumps(decision)))
+                tool_results.append((decision["function"], next(executed)))
+            messages.append(AssistantMessage(json.dumps(decision)))
 
         # Step 2: Final LLM synthesis
         return self._finalize_response(user_query, tool_results, messages)
 
-    def _execute_tool(self, decision):
-        func_name = decision["function"]
-        args = decision.get("parameters", {})
-        func = self.tool_registry.get_callable(func_name)
-        
-        if callable(func):
-            try:
-                result = func(**args)
-                if self.verbose:
-                    print(f"\nTool '{func_name}' executed with args {args}. Result: {result}")
-                return result
-            except Exception as e:
-                return f"Error: {str(e)}"
-        else:
-            return f"Function '{func_name}' not found."
+    def _execute_tools(self, decisions):
+        """Execute the tools of `decisions` concurrently; one result per decision, in order."""
+        results = {}
+        calls = []
+        for i, decision in enumerate(decisions):
+            func_name = decision["function"]
+            func = self.tool_registry.get_callable(func_name)
+            if callable(func):
+                args = decision.get("parameters", {})
+                calls.append((i, (func_name, func, args, self.tool_registry.get_timeout(func_name))))
+            else:
+                results[i] = f"Function '{func_name}' not found."
+
+        if calls:
+            # straight to the pool, no event loop: run() also works when called from async code
+            outcomes = run_tool_calls_sync([c for _, c in calls], self._pool)
+            for (i, (func_name, _, args, _)), (result, seconds) in zip(calls, outcomes):
+                if isinstance(result, Exception):
+                    result = f"Error: {str(result)}"
+                elif self.verbose:
+                    print(f"\nTool '{func_name}' executed with args {args} in {seconds:.2f}s. Result: {result}")
+                results[i] = result
+        return [results[i] for i in range(len(decisions))]
 
     def _finalize_response(self, original_query, tool_results, messages):
         # Append summary and results to LLM context
@@ -171,23 +199,41 @@ class AgentExecutor:
 
         messages.append(UserMessage(f"User question: {original_query}"))
 
-        # Structured, clean summary of tool outputs
+        # Structured, clean summary of tool outputs, compacted so the message stays within the token budget
+        budget = TOOL_RESULT_TOKEN_BUDGET // max(len(tool_results), 1)
+        compacted = [(name, compact_tool_result(result, budget)) for name, result in tool_results]
         tool_summary = "\n".join(
-            [f"- Tool `{name}` returned: {json.dumps(result)}" for name, result in tool_results]
+            [f"- Tool `{name}` returned: {text}" for name, (text, _, _) in compacted]
         )
         messages.append(UserMessage(f"Tool Results:\n{tool_summary}"))
-
-
-        # Final orchestration
+        self.last_tool_tokens = {"before": sum(b for _, (_, b, _) in compacted),
+                                 "after": sum(a for _, (_, _, a) in compacted)}
+        if self.verbose and compacted:
+            saved = self.last_tool_tokens["before"] - self.last_tool_tokens["after"]
+            print(f"\nTool results: {self.last_tool_tokens['before']} -> {self.last_tool_tokens['after']} tokens "
+                  f"(saved {saved}).")
+
+
+        # Final orchestration, unless this question was already answered over the same tool results
+        # parsed, so metadata inside JSON text ("_cache" ages) does not change the key
+        cache_key = context_hash([(name, parse_json_text(result)) for name, result in tool_results])
+        if self.response_cache and (cached := self.response_cache.get("answer", original_query, cache_key)) is not None:
+            return cached
         template = Template(messages=messages, response_format="text")
         config = OrchestrationConfig(template=template, llm=self.llm)
+        start = time.perf_counter()
         response = OrchestrationService(config=config).run()
-        return response.module_results.llm.choices[0].message.content
+        answer = response.module_results.llm.choices[0].message.content
+        # answers over failed tools are not reused: the next attempt may succeed
+        failed = any(isinstance(result, str) and result.startswith(("Error:", "Function '")) for _, result in tool_results)
+        if self.response_cache and not failed:
+            self.response_cache.put("answer", original_query, cache_key, answer, time.perf_counter() - start)
+        return answer
 
 
 # to print:
 llm = LLM(name="gpt-4o", version="latest", parameters={"max_tokens": 2000, "temperature": 0.2})
-agent = AgentExecutor(llm=llm, tool_registry=registry, verbose=True)
+agent = AgentExecutor(llm=llm, tool_registry=registry, verbose=True, response_cache=ResponseCache.from_env())
 
 prompt = "How's the weather in Paris?"
 response = agent.run(prompt)
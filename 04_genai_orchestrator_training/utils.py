@@ -1,12 +1,48 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# The response cache, the MCP tool catalog and tool-result compaction are shared with the 03 orchestrator
+# (this folder already uses the 03 MCP server); appended, so local modules win.
+_MCP_TRAINING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "03_mcp_training")
+if _MCP_TRAINING not in sys.path:
+    sys.path.append(_MCP_TRAINING)
+
+from mcp_session import ToolCatalog  # noqa: E402  (re-exported)
+from response_cache import ResponseCache, context_hash  # noqa: E402  (re-exported)
+import tool_compaction  # noqa: E402
+from tool_compaction import count_tokens  # noqa: E402  (re-exported)
+
+# How many tool calls of one LLM answer run at the same time, and how long
+# one may take (seconds) unless its registry entry says otherwise.
+TOOL_CONCURRENCY = int(os.environ.get("TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "60"))
+# LLM calls in flight at once when the blocking SDK call is offloaded to threads.
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "16"))
+# Token budget for the tool results of one answer, and list items kept by the first truncation step
+# (TOOL_RESULT_TOKEN_BUDGET / TOOL_RESULT_MAX_ITEMS, read by tool_compaction).
+TOOL_RESULT_TOKEN_BUDGET = tool_compaction.TOKEN_BUDGET
+TOOL_RESULT_MAX_ITEMS = tool_compaction.MAX_ITEMS
+
+
+class ToolTimeoutError(TimeoutError):
+    """A tool call took longer than its timeout."""
+
+
 class ToolRegistry:
     def __init__(self):
         self.tools = {}
 
-    def register(self, name, function, description, parameters):
+    def register(self, name, function, description, parameters, timeout=None):
         self.tools[name] = {
             "function": function,
             "description": description,
-            "parameters": parameters
+            "parameters": parameters,
+            "timeout": timeout,
         }
 
     def get_description_for_prompt(self):
@@ -18,4 +54,116 @@ class ToolRegistry:
         }
 
     def get_callable(self, name):
-        return self.tools.get(name, {}).get("function")
\ No newline at end of file
+        return self.tools.get(name, {}).get("function")
+
+    def get_timeout(self, name):
+        return self.tools.get(name, {}).get("timeout") or TOOL_TIMEOUT
+
+
+async def run_tool_calls(calls, max_concurrency=TOOL_CONCURRENCY, executor=None):
+    """
+    Run tool calls concurrently. `calls` is a list of (name, function, kwargs,
+    timeout); coroutine functions are awaited, plain functions run in
+    `executor` (a thread pool) so they don't block the event loop. At most
+    `max_concurrency` run at once and each is bounded by its timeout from the
+    moment it starts. Returns (result or exception, seconds) per call, in
+    the order of `calls`, so the total latency is the slowest call, not the sum.
+    A timed-out sync tool keeps its thread until it returns on its own.
+    """
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(max(max_concurrency, 1))
+
+    async def one(name, function, kwargs, timeout):
+        async with sem:
+            start = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(function):
+                    pending = function(**kwargs)
+                else:
+                    pending = loop.run_in_executor(executor, lambda: function(**kwargs))
+                result = await asyncio.wait_for(pending, timeout)
+            except asyncio.TimeoutError:
+                result = ToolTimeoutError(f"tool '{name}' timed out after {timeout:g}s")
+            except Exception as e:
+                result = e
+            return result, time.perf_counter() - start
+
+    return await asyncio.gather(*(one(*call) for call in calls))
+
+
+def run_tool_calls_sync(calls, executor):
+    """
+    run_tool_calls for synchronous callers, without an event loop: the calls
+    are submitted to `executor` (whose size bounds the concurrency) and each
+    is bounded by its timeout from the moment it starts. Safe to call from
+    code that is itself running in an event loop. Coroutine functions run on
+    the worker thread under their own asyncio.run.
+    """
+    def one(started, function, kwargs):
+        started["at"] = time.perf_counter()
+        started["event"].set()
+        try:
+            if asyncio.iscoroutinefunction(function):
+                result = asyncio.run(function(**kwargs))
+            else:
+                result = function(**kwargs)
+        except Exception as e:
+            result = e
+        return result, time.perf_counter() - started["at"]
+
+    submitted = []
+    for name, function, kwargs, timeout in calls:
+        started = {"event": threading.Event()}
+        submitted.append((name, timeout, started, executor.submit(one, started, function, kwargs)))
+
+    outcomes = []
+    for name, timeout, started, future in submitted:
+        started["event"].wait()
+        try:
+            outcomes.append(future.result(timeout=max(started["at"] + timeout - time.perf_counter(), 0)))
+        except FutureTimeoutError:
+            outcomes.append((ToolTimeoutError(f"tool '{name}' timed out after {timeout:g}s"), timeout))
+    return outcomes
+
+
+
+_llm_pool = None
+_llm_pool_lock = threading.Lock()
+
+
+async def run_orchestration(service):
+    """
+    The response of an OrchestrationService without blocking the event loop:
+    the SDK's native async call when it has one (arun), otherwise the
+    blocking run() in a dedicated pool of LLM_CONCURRENCY threads, so MCP
+    traffic and other conversations keep going during the LLM turn.
+    """
+    arun = getattr(service, "arun", None)
+    if arun is not None and asyncio.iscoroutinefunction(arun):
+        return await arun()
+    global _llm_pool
+    with _llm_pool_lock:
+        if _llm_pool is None:
+            _llm_pool = ThreadPoolExecutor(max_workers=max(LLM_CONCURRENCY, 1), thread_name_prefix="llm")
+    return await asyncio.get_running_loop().run_in_executor(_llm_pool, service.run)
+
+
+def parse_json_text(result):
+    """A tool result that is JSON text (as MCP tools return it) parsed; anything else unchanged."""
+    if isinstance(result, str):
+        try:
+            return json.loads(result)
+        except ValueError:
+            return result
+    return result
+
+
+def compact_tool_result(result, budget=TOOL_RESULT_TOKEN_BUDGET, max_items=TOOL_RESULT_MAX_ITEMS):
+    """
+    `result` as text for the LLM within `budget` tokens, compacted by
+    tool_compaction.compact (the same steps and token counts as the 03
+    orchestrator). JSON text results are parsed first. Returns (text,
+    tokens_before, tokens_after).
+    """
+    text, stats = tool_compaction.compact(parse_json_text(result), budget=budget, max_items=max_items)
+    return text, stats["tokens_before"], stats["tokens_after"]